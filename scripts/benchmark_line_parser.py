@@ -0,0 +1,185 @@
+"""
+Benchmark the compiled test-line parser against the original per-pattern loop
+
+Usage: python scripts/benchmark_line_parser.py [--lines 200000] [--seed 0]
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.extraction.entity_extractor import MedicalEntityExtractor
+
+
+def legacy_parse_test_line(test_patterns, line):
+    """The original MedicalEntityExtractor._parse_test_line, kept as the baseline"""
+    line = ' '.join(line.split())
+
+    if len(line) < 10:
+        return None
+
+    test_name = None
+    for test_key, pattern in test_patterns.items():
+        if re.search(pattern, line, re.IGNORECASE):
+            name_match = re.match(r'^([a-z\s\(\)]+)', line, re.IGNORECASE)
+            if name_match:
+                test_name = name_match.group(1).strip()
+            break
+
+    if not test_name:
+        return None
+
+    value_match = re.search(r'(\d+\.?\d*)\s+', line)
+    if not value_match:
+        return None
+
+    value = float(value_match.group(1))
+
+    range_match = re.search(r'(\d+\.?\d*)\s*-\s*(\d+\.?\d*)', line)
+    if range_match:
+        min_val = float(range_match.group(1))
+        max_val = float(range_match.group(2))
+        normal_range = f"{min_val} - {max_val}"
+    else:
+        less_match = re.search(r'less than\s+(\d+\.?\d*)', line, re.IGNORECASE)
+        greater_match = re.search(r'greater than\s+(\d+\.?\d*)', line, re.IGNORECASE)
+
+        if less_match:
+            normal_range = f"< {less_match.group(1)}"
+            min_val = 0
+            max_val = float(less_match.group(1))
+        elif greater_match:
+            normal_range = f"> {greater_match.group(1)}"
+            min_val = float(greater_match.group(1))
+            max_val = float('inf')
+        else:
+            normal_range = "Not specified"
+            min_val = None
+            max_val = None
+
+    unit_match = re.search(r'([a-z/%^]+)$', line, re.IGNORECASE)
+    if unit_match:
+        unit = unit_match.group(1)
+    else:
+        unit = ""
+
+    return {
+        'test_name': test_name,
+        'value': value,
+        'normal_range': normal_range,
+        'min_normal': min_val,
+        'max_normal': max_val,
+        'unit': unit
+    }
+
+
+TEST_ROWS = [
+    ("Hemoglobin", "13.5-17.5", "g/dL"),
+    ("RBC Count", "4.5-5.9", "10^6/microL"),
+    ("WBC Count", "4.5-11.0", "10^3/microL"),
+    ("Platelets", "150-400", "10^3/microL"),
+    ("Hematocrit", "38-50", "%"),
+    ("MCV", "80-100", "fL"),
+    ("MCH", "27-33", "pg"),
+    ("MCHC", "32-36", "g/dL"),
+    ("Glucose (Fasting)", "70-100", "mg/dL"),
+    ("Cholesterol Total", "less than 200", "mg/dL"),
+    ("HDL Cholesterol", "greater than 40", "mg/dL"),
+    ("LDL Cholesterol", "< 100", "mg/dL"),
+    ("Triglycerides", "Less Than 150", "mg/dL"),
+    ("Creatinine", "0.7-1.3", "mg/dL"),
+]
+
+NOISE_LINES = [
+    "CITY GENERAL HOSPITAL",
+    "123 Medical Street, City, State 12345",
+    "Patient Name: John Doe Age: 45 Years",
+    "Remarks: All parameters are within normal limits.",
+    "Verified by: Dr. Jane Smith, MD",
+    "Page 3 of 40",
+    "Sodium 140 135-145 mmol/L",
+    "Potassium 4.1 3.5-5.1 mmol/L",
+]
+
+
+def make_lines(n_lines, seed):
+    """Build a reproducible mix of test rows and non-matching lines"""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(n_lines):
+        if rng.random() < 0.6:
+            name, normal_range, unit = rng.choice(TEST_ROWS)
+            value = round(rng.uniform(0.5, 300), rng.choice([0, 1, 2]))
+            sep = rng.choice([" ", "  ", "\t"])
+            lines.append(sep.join([name, str(value), normal_range, unit]))
+        else:
+            lines.append(rng.choice(NOISE_LINES))
+    return lines
+
+
+# Leading power-of-ten factor of a unit ("10^3/microL"), which the legacy unit pattern cut off
+UNIT_FACTOR_RE = re.compile(r'^[x*×]?10(?:(?:\^|\*\*?|e)-?\d+|[⁰¹²³⁴⁵⁶⁷⁸⁹]+)\s*', re.IGNORECASE)
+
+
+def as_legacy(result):
+    """
+    The legacy parser's view of a compiled result
+
+    Drops the canonical key it did not produce and the power-of-ten factor
+    it did not keep in the unit; everything else must be identical.
+    """
+    if result is None:
+        return None
+    result = {key: value for key, value in result.items() if key != 'test_key'}
+    result['unit'] = UNIT_FACTOR_RE.sub('', result['unit'])
+    return result
+
+
+def time_parser(parse, lines, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = [parse(line) for line in lines]
+        best = min(best, time.perf_counter() - started)
+    return best, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    extractor = MedicalEntityExtractor(analytes=False)
+    lines = make_lines(args.lines, args.seed)
+
+    legacy_time, legacy_results = time_parser(
+        lambda line: legacy_parse_test_line(extractor.test_patterns, line), lines, args.repeat)
+    compiled_time, compiled_results = time_parser(extractor._parse_test_line, lines, args.repeat)
+
+    dictionary_extractor = MedicalEntityExtractor()
+    dictionary_time, _ = time_parser(dictionary_extractor._parse_test_line, lines, args.repeat)
+
+    mismatches = sum(a != as_legacy(b) for a, b in zip(legacy_results, compiled_results))
+
+    print("=" * 50)
+    print(f"Lines:            {len(lines)} ({sum(r is not None for r in legacy_results)} matched)")
+    print(f"Legacy parser:    {len(lines) / legacy_time:,.0f} lines/sec")
+    print(f"Compiled parser:  {len(lines) / compiled_time:,.0f} lines/sec")
+    print(f"Speedup:          {legacy_time / compiled_time:.2f}x")
+    print(f"Dictionary ({len(dictionary_extractor.line_parser.analytes)} analytes): "
+          f"{len(lines) / dictionary_time:,.0f} lines/sec")
+    print(f"Output mismatches: {mismatches}")
+    print("=" * 50)
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""
+Measure model cold-start time and per-worker memory
+
+Starts N fresh worker processes that each load a model, run one inference
+and then wait until all workers have loaded, so the memory readings show how
+much of the weights the workers share. Reported per worker: import time,
+load time, first-inference time, RSS and PSS. PSS divides shared pages
+between the processes mapping them, so the PSS total is the real footprint
+of the group.
+
+Usage:
+    python scripts/benchmark_model_load.py --workers 4
+    python scripts/benchmark_model_load.py --workers 4 --from-hub   # baseline: HF cache
+    python scripts/benchmark_model_load.py --tiny                   # offline, no download
+"""
+
+import argparse
+import json
+import multiprocessing
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.config import get_setting, resolve_path
+from src.utils.model_store import ModelStore, memory_usage
+
+
+def load_worker(model_name, store_root, from_hub, barrier, results):
+    """Worker: load the model, run it once, report timings and memory"""
+    started = time.perf_counter()
+    import torch
+    import transformers
+    imported = time.perf_counter()
+
+    if from_hub:
+        tokenizer = transformers.AutoTokenizer.from_pretrained(model_name)
+        model = transformers.AutoModelForTokenClassification.from_pretrained(model_name).eval()
+    else:
+        tokenizer, model = ModelStore(store_root).load(model_name)
+    loaded = time.perf_counter()
+
+    with torch.inference_mode():
+        model(**tokenizer(["Hemoglobin 13.5 g/dL 12.0 - 16.0"], return_tensors='pt'))
+    inferred = time.perf_counter()
+
+    # Read memory only once every worker holds the model
+    barrier.wait()
+    results.put({
+        'import_s': imported - started,
+        'load_s': loaded - imported,
+        'first_inference_s': inferred - loaded,
+        'cold_start_s': inferred - started,
+        **{f'{key}_mb': value for key, value in memory_usage().items()},
+    })
+    barrier.wait()
+
+
+def run(model_name, store_root, workers, from_hub):
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=load_worker, args=(model_name, store_root, from_hub, barrier, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure model cold-start time and per-worker memory")
+    parser.add_argument("--model", default=None, help="Model name (default: models.ner_model)")
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes loading the model")
+    parser.add_argument("--from-hub", action="store_true",
+                        help="Load with from_pretrained from the Hugging Face cache instead of the store")
+    parser.add_argument("--tiny", action="store_true",
+                        help="Export and load a small random model, for running offline")
+    parser.add_argument("--output", default=None, help="Result JSON path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store_root = None
+        model_name = args.model or get_setting('models', 'ner_model')
+        if args.tiny:
+            from src.extraction.ner_engine import build_tiny_model
+
+            store_root, model_name = str(Path(tmp) / 'store'), 'local/tiny-ner'
+            ModelStore(store_root).export(model_name, task='token-classification',
+                                          source=str(build_tiny_model(Path(tmp) / 'tiny')))
+
+        measurements = run(model_name, store_root, args.workers, args.from_hub)
+
+    print("=" * 78)
+    print(f"Model: {model_name} ({'HF cache' if args.from_hub else 'model store'}), {args.workers} workers")
+    print(f"{'worker':>6} {'import s':>9} {'load s':>8} {'infer s':>8} {'cold s':>8} {'RSS MB':>8} {'PSS MB':>8}")
+    for i, m in enumerate(measurements):
+        print(f"{i:>6} {m['import_s']:>9.2f} {m['load_s']:>8.2f} {m['first_inference_s']:>8.2f} "
+              f"{m['cold_start_s']:>8.2f} {m.get('rss_mb', 0):>8.0f} {m.get('pss_mb', 0):>8.0f}")
+    total_rss = sum(m.get('rss_mb', 0) for m in measurements)
+    total_pss = sum(m.get('pss_mb', 0) for m in measurements)
+    print(f"Total RSS {total_rss:.0f} MB, total PSS {total_pss:.0f} MB, "
+          f"median cold start {statistics.median(m['cold_start_s'] for m in measurements):.2f}s")
+    print("=" * 78)
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'model': model_name,
+        'source': 'hub' if args.from_hub else 'store',
+        'workers': measurements,
+        'total_rss_mb': total_rss,
+        'total_pss_mb': total_pss,
+    }
+    output = Path(args.output) if args.output else (
+        resolve_path("data/processed/benchmarks")
+        / f"model-load-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
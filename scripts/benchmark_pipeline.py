@@ -0,0 +1,171 @@
+"""
+Benchmark PDF and entity extraction over a synthetic report corpus
+
+For each report size (page count) a seeded corpus is generated, then every
+report is run through PDFExtractor and MedicalEntityExtractor in a fresh
+worker process. Reported per size: pages/sec, lines/sec, p50/p95 latency per
+report and peak RSS of the worker. Results are saved as JSON; pass
+--compare with an earlier result file to print the change per metric.
+
+Usage: python scripts/benchmark_pipeline.py --pages 1,10,50 -n 20
+"""
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+sys.path.append(str(Path(__file__).parent))
+
+from generate_sample_report import generate_corpus
+from src.extraction.entity_extractor import EXTRACTOR_VERSION as ENTITY_VERSION
+from src.extraction.entity_extractor import MedicalEntityExtractor
+from src.preprocessing.pdf_extractor import EXTRACTOR_VERSION as PDF_VERSION
+from src.preprocessing.pdf_extractor import PDFExtractor
+from src.utils.config import resolve_path
+
+# Metrics where a higher number is better; all others are better when lower
+HIGHER_IS_BETTER = {'pages_per_sec', 'lines_per_sec', 'reports_per_sec'}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_size(corpus_dir):
+    """Worker: benchmark every report in one corpus directory"""
+    import logging
+    logging.disable(logging.INFO)
+
+    pdf_extractor = PDFExtractor()
+    entity_extractor = MedicalEntityExtractor()
+    files = sorted(Path(corpus_dir).glob("*.pdf"))
+
+    pdf_times, entity_times, latencies = [], [], []
+    pages = lines = tests = 0
+    failed = []
+
+    for path in files:
+        started = time.perf_counter()
+        result = pdf_extractor.extract_with_metadata(str(path))
+        parsed = time.perf_counter()
+        if result is None:
+            # Keep failures out of the timings, but report them
+            failed.append(path.name)
+            continue
+        entities = entity_extractor.extract_all(result['text'])
+        finished = time.perf_counter()
+
+        pdf_times.append(parsed - started)
+        entity_times.append(finished - parsed)
+        latencies.append(finished - started)
+        pages += result['num_pages']
+        lines += result['text'].count('\n') + 1
+        tests += entities['total_tests']
+
+    if not latencies:
+        raise RuntimeError(f"Every report in {corpus_dir} failed to extract")
+
+    return {
+        'reports': len(latencies),
+        'failed': failed,
+        'pages': pages,
+        'lines': lines,
+        'tests_extracted': tests,
+        'pages_per_sec': pages / sum(pdf_times),
+        'lines_per_sec': lines / sum(entity_times),
+        'reports_per_sec': len(latencies) / sum(latencies),
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p95_ms': percentile(latencies, 95) * 1000,
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def compare(current, previous):
+    """Print the relative change of every metric against an earlier run"""
+    print(f"\nChange vs {previous['timestamp']} (versions {previous['versions']}):")
+    for size, metrics in current['results'].items():
+        before = previous['results'].get(size)
+        if not before:
+            continue
+        changes = []
+        for name in ('pages_per_sec', 'lines_per_sec', 'latency_p50_ms', 'latency_p95_ms', 'peak_rss_mb'):
+            if before.get(name):
+                delta = (metrics[name] - before[name]) / before[name] * 100
+                worse = delta < 0 if name in HIGHER_IS_BETTER else delta > 0
+                flag = " ⚠️" if worse and abs(delta) > 10 else ""
+                changes.append(f"{name} {delta:+.1f}%{flag}")
+        print(f"  {size} pages: " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the extraction pipeline")
+    parser.add_argument("--pages", default="1,10,50", help="Comma-separated report sizes in pages")
+    parser.add_argument("-n", "--reports", type=int, default=20, help="Reports per size")
+    parser.add_argument("--layouts", default="row", help="Comma-separated corpus layouts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Result JSON path")
+    parser.add_argument("--compare", default=None, help="Earlier result JSON to compare against")
+    args = parser.parse_args()
+
+    sizes = [int(p) for p in args.pages.split(",")]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            corpus_dir = Path(tmp) / f"{size}p"
+            generate_corpus(corpus_dir, n_reports=args.reports, page_counts=(size,),
+                            layouts=tuple(args.layouts.split(",")), seed=args.seed)
+            # A fresh process per size keeps peak RSS attributable to that size
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                try:
+                    results[str(size)] = pool.submit(run_size, str(corpus_dir)).result()
+                except Exception as e:
+                    print(f"Skipping {size} pages: {e}")
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'versions': {'pdf_extractor': PDF_VERSION, 'entity_extractor': ENTITY_VERSION},
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {'reports_per_size': args.reports, 'layouts': args.layouts, 'seed': args.seed},
+        'results': results,
+    }
+
+    print("=" * 78)
+    print(f"{'pages':>6} {'pages/s':>10} {'lines/s':>12} {'p50 ms':>9} {'p95 ms':>9} {'RSS MB':>8} {'tests':>8}")
+    for size, metrics in results.items():
+        print(f"{size:>6} {metrics['pages_per_sec']:>10,.1f} {metrics['lines_per_sec']:>12,.0f} "
+              f"{metrics['latency_p50_ms']:>9.1f} {metrics['latency_p95_ms']:>9.1f} "
+              f"{metrics['peak_rss_mb']:>8.1f} {metrics['tests_extracted']:>8}")
+        if metrics['failed']:
+            print(f"       {len(metrics['failed'])} report(s) failed and were left out: "
+                  f"{', '.join(metrics['failed'])}")
+    print("=" * 78)
+
+    output = Path(args.output) if args.output else (
+        resolve_path("data/processed/benchmarks")
+        / f"pipeline-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Check that the lightweight modules import quickly and without heavy backends
+
+Each module is imported in a fresh interpreter, and a small extraction is run
+to make sure that using it does not load torch, transformers, easyocr or the
+other heavy dependencies either. The script exits 1 when a module goes over
+its import time or RSS budget, or when it loads a forbidden package.
+
+Usage: python scripts/check_import_budget.py [--time-ms 500] [--rss-mb 40] [--runs 3]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that batch workers and CLI tools use with only PyPDF2 and regexes
+MODULES = [
+    'src.preprocessing.pdf_extractor',
+    'src.preprocessing.batch',
+    'src.preprocessing.ocr',
+    'src.extraction.entity_extractor',
+    'src.extraction.line_parser',
+    'src.extraction.analyte_dictionary',
+    'src.extraction.results',
+    'src.extraction.ner_engine',
+]
+
+# Packages none of these modules may import, directly or indirectly
+FORBIDDEN = [
+    'torch', 'transformers', 'easyocr', 'pytesseract', 'pdf2image', 'spacy', 'scispacy',
+    'medspacy', 'shap', 'lime', 'sklearn', 'pandas', 'numpy', 'streamlit', 'plotly',
+]
+
+# Runs in the child interpreter: time the import, then exercise the extractors
+PROBE = '''
+import json, resource, sys, time
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+from src.extraction.entity_extractor import MedicalEntityExtractor
+from src.preprocessing.pdf_extractor import PDFExtractor
+PDFExtractor()
+MedicalEntityExtractor().extract_all("Patient Name: Jane Doe\\nHemoglobin 13.5 g/dL 12.0-16.0\\n")
+
+print(json.dumps({{
+    'import_ms': elapsed * 1000,
+    'rss_mb': (rss_after - rss_before) / 1024,
+    'modules': sorted({{name.split('.')[0] for name in sys.modules}}),
+}}))
+'''
+
+
+def probe(module: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE.format(module=module)],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--time-ms', type=float, default=500.0, help="Import time budget per module")
+    parser.add_argument('--rss-mb', type=float, default=40.0, help="RSS growth budget per module")
+    parser.add_argument('--runs', type=int, default=3, help="Fresh interpreters per module; best run counts")
+    args = parser.parse_args(argv)
+
+    failures = 0
+    print("=" * 72)
+    print(f"{'Module':<38}{'Import':>10}{'RSS':>10}  Status")
+    print("-" * 72)
+    for module in MODULES:
+        runs = [probe(module) for _ in range(max(args.runs, 1))]
+        import_ms = min(run['import_ms'] for run in runs)
+        rss_mb = min(run['rss_mb'] for run in runs)
+        loaded = sorted(set(runs[0]['modules']) & set(FORBIDDEN))
+
+        problems = []
+        if import_ms > args.time_ms:
+            problems.append(f"import > {args.time_ms:.0f} ms")
+        if rss_mb > args.rss_mb:
+            problems.append(f"RSS > {args.rss_mb:.0f} MB")
+        if loaded:
+            problems.append(f"loaded {', '.join(loaded)}")
+        failures += bool(problems)
+
+        print(f"{module:<38}{import_ms:>8.0f}ms{rss_mb:>8.1f}MB  {'; '.join(problems) or 'ok'}")
+    print("=" * 72)
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
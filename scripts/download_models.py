@@ -1,28 +1,90 @@
-from transformers import AutoTokenizer, AutoModel
-import os
+"""
+Export the configured models into the local model store
 
-def download_models():
-    """Download all required models"""
-    
-    models = [
-        "dmis-lab/biobert-base-cased-v1.1",
-        "microsoft/BiomedNLP-PubMedBERT-base-uncased-abstract"
-    ]
+Each model is downloaded (or read from the Hugging Face cache) once and saved
+to models/saved_models/ as safetensors with a checksum manifest; workers then
+load it from there offline.
+
+Usage: python scripts/download_models.py [--force] [--verify] [--list]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.utils.config import get_setting
+from src.utils.logging_config import setup_logging
+from src.utils.model_store import ModelStore
+
+# models.<key> in config.yaml -> task the model is exported for
+CONFIGURED_MODELS = {
+    'ner_model': 'token-classification',
+    'classification_model': 'base',
+}
+
+
+def configured_models():
+    """(model name, task) for each model named in config.yaml"""
+    for key, task in CONFIGURED_MODELS.items():
+        model_name = get_setting('models', key)
+        if model_name:
+            yield model_name, task
+
+
+def download_models(force: bool = False) -> int:
+    """Export all required models; returns the number of failures"""
+    store = ModelStore()
+    failures = 0
     
-    print("Downloading pre-trained models...")
+    print("Exporting pre-trained models...")
     print("="*50)
     
-    for model_name in models:
-        print(f"\n📥 Downloading:  {model_name}")
+    for model_name, task in configured_models():
+        print(f"\n📥 Exporting:  {model_name} ({task})")
         try:
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
-            model = AutoModel.from_pretrained(model_name)
-            print(f"✅ Successfully downloaded: {model_name}")
+            path = store.export(model_name, task=task, force=force)
+            print(f"✅ Saved to: {path}")
         except Exception as e:
-            print(f"❌ Error downloading {model_name}: {str(e)}")
+            failures += 1
+            print(f"❌ Error exporting {model_name}: {str(e)}")
     
     print("\n" + "="*50)
-    print("✨ Model download complete!")
+    print("✨ Model export complete!")
+    return failures
+
+
+def verify_models() -> int:
+    """Check every exported model against its manifest; returns the number of failures"""
+    store = ModelStore()
+    failures = 0
+    for model_name, _ in configured_models():
+        problems = store.verify(model_name)
+        failures += bool(problems)
+        print(f"{'❌' if problems else '✅'} {model_name}: {', '.join(problems) or 'ok'}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the configured models into models/saved_models/")
+    parser.add_argument('--force', action='store_true', help="Re-export models already in the store")
+    parser.add_argument('--verify', action='store_true', help="Only check exported models against their manifests")
+    parser.add_argument('--list', action='store_true', help="List exported models")
+    args = parser.parse_args(argv)
+    
+    setup_logging()
+    
+    if args.list:
+        for manifest in ModelStore().list():
+            size = sum(entry['size'] for entry in manifest['files'].values())
+            print(f"{manifest['model_name']:<55} {manifest['task']:<22} {size / 1e6:>8.1f} MB  "
+                  f"{manifest['exported_at']}")
+        return 0
+    
+    failures = verify_models() if args.verify else download_models(args.force)
+    return 1 if failures else 0
+
 
 if __name__ == "__main__":
-    download_models()
\ No newline at end of file
+    sys.exit(main())
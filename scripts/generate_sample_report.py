@@ -1,7 +1,15 @@
 """
 Generate a sample medical report PDF for testing
+
+With --corpus, generates a seeded corpus of synthetic reports instead:
+python scripts/generate_sample_report.py --corpus data/samples/corpus -n 100 --pages 1,5,20
 """
 
+import argparse
+import json
+import random
+from pathlib import Path
+
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
@@ -125,5 +133,237 @@ def generate_sample_report(filename="sample_medical_report.pdf"):
     c.save()
     print(f"✅ Sample report generated: {filename}")
 
+# Reference data for synthetic reports: (test name, low, high, unit, decimals)
+PANELS = {
+    'cbc': ("COMPLETE BLOOD COUNT (CBC)", [
+        ("Hemoglobin", 13.5, 17.5, "g/dL", 1),
+        ("RBC Count", 4.5, 5.9, "10^6/microL", 1),
+        ("WBC Count", 4.5, 11.0, "10^3/microL", 1),
+        ("Platelets", 150, 400, "10^3/microL", 0),
+        ("Hematocrit", 38, 50, "%", 0),
+        ("MCV", 80, 100, "fL", 0),
+        ("MCH", 27, 33, "pg", 0),
+        ("MCHC", 32, 36, "g/dL", 0),
+    ]),
+    'lipid': ("LIPID PROFILE", [
+        ("Cholesterol Total", 0, 200, "mg/dL", 0),
+        ("HDL Cholesterol", 40, None, "mg/dL", 0),
+        ("LDL Cholesterol", 0, 100, "mg/dL", 0),
+        ("Triglycerides", 0, 150, "mg/dL", 0),
+    ]),
+    'biochemistry': ("BIOCHEMISTRY", [
+        ("Glucose (Fasting)", 70, 100, "mg/dL", 0),
+        ("Creatinine", 0.7, 1.3, "mg/dL", 1),
+        ("Blood Urea Nitrogen", 7, 20, "mg/dL", 0),
+        ("Uric Acid", 3.5, 7.2, "mg/dL", 1),
+        ("Total Bilirubin", 0.1, 1.2, "mg/dL", 1),
+        ("Albumin", 3.5, 5.0, "g/dL", 1),
+    ]),
+    'thyroid': ("THYROID PROFILE", [
+        ("TSH", 0.4, 4.0, "mIU/L", 2),
+        ("Free T4", 0.8, 1.8, "ng/dL", 2),
+        ("Free T3", 2.3, 4.2, "pg/mL", 1),
+    ]),
+}
+
+FIRST_NAMES = ["John", "Jane", "Aarav", "Priya", "Maria", "Wei", "Omar", "Fatima", "Lucas", "Emma"]
+LAST_NAMES = ["Doe", "Smith", "Sharma", "Patel", "Garcia", "Chen", "Khan", "Silva", "Brown", "Yadav"]
+NOISE_LINES = [
+    "Sample received in good condition.",
+    "Method: Automated analyzer",
+    "Please correlate clinically.",
+    "** End of section **",
+    "Results relate only to the sample tested.",
+]
+
+
+def _format_range(low, high):
+    if high is None:
+        return f"> {low:g}"
+    if low == 0:
+        return f"< {high:g}"
+    return f"{low:g}-{high:g}"
+
+
+def _sample_value(rng, low, high, decimals, abnormal_rate):
+    """Draw a value, out of range with probability abnormal_rate"""
+    upper = high if high is not None else low * 2
+    span = upper - low or upper
+    if rng.random() < abnormal_rate:
+        if low > 0 and rng.random() < 0.5:
+            value = rng.uniform(low - 0.4 * span, low - 0.01 * span)
+        else:
+            value = rng.uniform(upper + 0.01 * span, upper + 0.5 * span)
+    else:
+        value = rng.uniform(low, upper)
+    value = max(value, 0)
+    return f"{value:.{decimals}f}"
+
+
+def _draw_page_header(c, height, patient, page_num, num_pages):
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(1*inch, height - 0.8*inch, "CITY GENERAL HOSPITAL - LABORATORY REPORT")
+    c.setFont("Helvetica", 8)
+    c.drawString(6.5*inch, height - 0.8*inch, f"Page {page_num} of {num_pages}")
+    if page_num > 1:
+        return height - 1.2*inch
+
+    c.setFont("Helvetica", 10)
+    y = height - 1.3*inch
+    c.drawString(1*inch, y, f"Patient Name: {patient['name']}")
+    y -= 0.22*inch
+    c.drawString(1*inch, y, f"Patient ID: {patient['id']}")
+    y -= 0.22*inch
+    c.drawString(1*inch, y, f"Age: {patient['age']} Years")
+    y -= 0.22*inch
+    c.drawString(1*inch, y, f"Gender: {patient['gender']}")
+    y -= 0.22*inch
+    c.drawString(1*inch, y, f"Date of Collection: {patient['collection_date']}")
+    y -= 0.22*inch
+    c.drawString(1*inch, y, f"Report Date: {patient['report_date']}")
+    return y - 0.4*inch
+
+
+def generate_report(filename, rng, num_pages=1, panels=('cbc', 'biochemistry'),
+                    layout="row", abnormal_rate=0.1, noise=0.1):
+    """
+    Generate one synthetic report and return its ground truth
+
+    Args:
+        filename (str): Output PDF path
+        rng (random.Random): Seeded random generator
+        num_pages (int): Number of pages; panels repeat to fill them
+        panels (tuple): Panel keys from PANELS
+        layout (str): "row" draws each result as one text run (one line per
+            result in the extracted text); "table" draws each cell separately
+        abnormal_rate (float): Probability that a value is outside its range
+        noise (float): Probability of a free-text line after each result
+
+    Returns:
+        dict: Patient fields and the list of drawn results
+    """
+    # invariant=1 keeps timestamps out of the file so a seed always gives identical bytes
+    c = canvas.Canvas(filename, pagesize=letter, invariant=1)
+    width, height = letter
+    patient = {
+        'name': f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        'id': f"PAT{rng.randint(100000, 999999)}",
+        'age': rng.randint(18, 90),
+        'gender': rng.choice(["Male", "Female"]),
+        'collection_date': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+    }
+    patient['report_date'] = patient['collection_date']
+    results = []
+
+    for page_num in range(1, num_pages + 1):
+        y = _draw_page_header(c, height, patient, page_num, num_pages)
+
+        while y > 1.5*inch:
+            title, tests = PANELS[rng.choice(panels)]
+            if y - (len(tests) + 3) * 0.2*inch < 1*inch:
+                break
+
+            c.setFont("Helvetica-Bold", 11)
+            c.drawString(1*inch, y, title)
+            y -= 0.25*inch
+            c.setFont("Helvetica-Bold", 9)
+            c.drawString(1*inch, y, "Test Name      Result      Normal Range      Unit")
+            y -= 0.2*inch
+            c.setFont("Helvetica", 9)
+
+            for name, low, high, unit, decimals in tests:
+                value = _sample_value(rng, low, high, decimals, abnormal_rate)
+                normal_range = _format_range(low, high)
+                if layout == "table":
+                    c.drawString(1*inch, y, name)
+                    c.drawString(3*inch, y, value)
+                    c.drawString(4*inch, y, normal_range)
+                    c.drawString(5.5*inch, y, unit)
+                else:
+                    c.drawString(1*inch, y, f"{name} {value} {normal_range} {unit}")
+                results.append({'test_name': name, 'value': float(value), 'unit': unit})
+                y -= 0.2*inch
+
+                if rng.random() < noise:
+                    c.setFont("Helvetica-Oblique", 8)
+                    c.drawString(1.2*inch, y, rng.choice(NOISE_LINES))
+                    c.setFont("Helvetica", 9)
+                    y -= 0.2*inch
+            y -= 0.2*inch
+
+        c.showPage()
+
+    c.save()
+    return {'patient': patient, 'results': results, 'num_pages': num_pages}
+
+
+def generate_corpus(out_dir, n_reports=10, page_counts=(1,), panels=tuple(PANELS),
+                    layouts=("row",), abnormal_rate=0.1, noise=0.1, seed=0):
+    """
+    Generate a reproducible corpus of synthetic reports
+
+    The same seed always yields the same files. A manifest.json with the
+    settings and per-report ground truth is written next to the PDFs.
+
+    Returns:
+        list: Manifest entries, one per report
+    """
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    entries = []
+    for index in range(n_reports):
+        num_pages = rng.choice(page_counts)
+        layout = rng.choice(layouts)
+        filename = out_dir / f"report_{index:05d}_{num_pages}p.pdf"
+        truth = generate_report(str(filename), rng, num_pages, panels, layout, abnormal_rate, noise)
+        entries.append({'file': filename.name, 'layout': layout, **truth})
+
+    manifest = {
+        'seed': seed,
+        'n_reports': n_reports,
+        'page_counts': list(page_counts),
+        'panels': list(panels),
+        'layouts': list(layouts),
+        'abnormal_rate': abnormal_rate,
+        'noise': noise,
+        'reports': entries,
+    }
+    with open(out_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"✅ Generated {n_reports} reports in {out_dir}")
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate sample medical report PDFs")
+    parser.add_argument("--corpus", metavar="DIR", help="Generate a corpus into DIR instead of one sample")
+    parser.add_argument("-n", "--reports", type=int, default=10, help="Number of reports")
+    parser.add_argument("--pages", default="1", help="Comma-separated page counts to draw from")
+    parser.add_argument("--panels", default=",".join(PANELS), help="Comma-separated panels")
+    parser.add_argument("--layouts", default="row", help="Comma-separated layouts: row, table")
+    parser.add_argument("--abnormal-rate", type=float, default=0.1)
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if not args.corpus:
+        generate_sample_report()
+        return
+
+    generate_corpus(
+        args.corpus,
+        n_reports=args.reports,
+        page_counts=tuple(int(p) for p in args.pages.split(",")),
+        panels=tuple(args.panels.split(",")),
+        layouts=tuple(args.layouts.split(",")),
+        abnormal_rate=args.abnormal_rate,
+        noise=args.noise,
+        seed=args.seed,
+    )
+
+
 if __name__ == "__main__":
-    generate_sample_report()
+    main()
@@ -0,0 +1 @@
+"""Analysis module for reference ranges and abnormal value detection"""
@@ -0,0 +1,178 @@
+"""
+Anomaly Detection Module
+Vectorized rule-based classification of test values against reference ranges
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ..utils.config import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Classification codes, indexes into LABELS
+UNKNOWN, LOW, NORMAL, HIGH, CRITICAL_LOW, CRITICAL_HIGH = range(6)
+LABELS = np.array(['unknown', 'low', 'normal', 'high', 'critical_low', 'critical_high'])
+
+# Fractions of the reference range width. `margin` is the tolerance outside the
+# range before a value is flagged; beyond `critical` it is flagged critical.
+SENSITIVITY = {
+    'low': {'margin': 0.10, 'critical': 0.75},
+    'medium': {'margin': 0.05, 'critical': 0.50},
+    'high': {'margin': 0.0, 'critical': 0.30},
+}
+
+
+def results_to_columns(reports: Iterable[List[Dict]], range_index=None,
+                       sex: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Convert `extract_test_results` output into columnar arrays
+
+    Args:
+        reports: Iterable of per-report result lists
+        range_index: Optional NormalRangeIndex used where no range was printed
+        sex (str): Patient sex for range lookups
+
+    Returns:
+        dict: 'report' (int64), 'value', 'low', 'high' (float64, NaN when missing)
+    """
+    report_ids, values, lows, highs = [], [], [], []
+    for report_id, results in enumerate(reports):
+        for result in results:
+            if range_index is not None:
+                low, high, _ = range_index.resolve(result, sex)
+            else:
+                low, high = result.get('min_normal'), result.get('max_normal')
+            report_ids.append(report_id)
+            values.append(result['value'])
+            lows.append(np.nan if low is None else low)
+            highs.append(np.nan if high is None else high)
+
+    return {
+        'report': np.asarray(report_ids, dtype=np.int64),
+        'value': np.asarray(values, dtype=np.float64),
+        'low': np.asarray(lows, dtype=np.float64),
+        'high': np.asarray(highs, dtype=np.float64),
+    }
+
+
+class AnomalyDetector:
+    """
+    Classify test values as low/normal/high/critical in bulk
+
+    All work is done with NumPy array operations, so millions of results are
+    classified without a Python loop per row. Open-ended ranges such as
+    "< 200" (low = 0) or "> 40" (high = inf) use the finite bound as the
+    scale for margins, and rows without a range come out as "unknown".
+    """
+
+    def __init__(self, sensitivity: Optional[str] = None, method: Optional[str] = None):
+        method = method or get_setting('anomaly_detection', 'method', 'rule_based')
+        if method != 'rule_based':
+            raise ValueError(f"Unsupported anomaly detection method: {method}")
+
+        sensitivity = sensitivity or get_setting('anomaly_detection', 'sensitivity', 'medium')
+        if sensitivity not in SENSITIVITY:
+            raise ValueError(f"Unknown sensitivity '{sensitivity}', expected one of {list(SENSITIVITY)}")
+
+        self.method = method
+        self.sensitivity = sensitivity
+        self.margin = SENSITIVITY[sensitivity]['margin']
+        self.critical = SENSITIVITY[sensitivity]['critical']
+
+    def classify(self, values, lows, highs) -> np.ndarray:
+        """
+        Classify values against their reference ranges
+
+        Args:
+            values: Array-like of test values
+            lows: Array-like of lower bounds (NaN when unknown)
+            highs: Array-like of upper bounds (NaN when unknown, inf when open-ended)
+
+        Returns:
+            np.ndarray: int8 codes (UNKNOWN, LOW, NORMAL, HIGH, CRITICAL_LOW, CRITICAL_HIGH)
+        """
+        values = np.asarray(values, dtype=np.float64)
+        lows = np.asarray(lows, dtype=np.float64)
+        highs = np.asarray(highs, dtype=np.float64)
+
+        with np.errstate(invalid='ignore'):
+            width = highs - lows
+            finite_bound = np.where(np.isfinite(highs), highs, lows)
+            scale = np.where(np.isfinite(width) & (width > 0), width, np.abs(finite_bound))
+
+            low_limit = lows - self.margin * scale
+            high_limit = highs + self.margin * scale
+            critical_low = lows - self.critical * scale
+            critical_high = highs + self.critical * scale
+
+            codes = np.full(values.shape, NORMAL, dtype=np.int8)
+            codes[values < low_limit] = LOW
+            codes[values > high_limit] = HIGH
+            codes[values < critical_low] = CRITICAL_LOW
+            codes[values > critical_high] = CRITICAL_HIGH
+            codes[np.isnan(values) | np.isnan(lows) | np.isnan(highs)] = UNKNOWN
+
+        return codes
+
+    def detect(self, reports: Iterable[List[Dict]], range_index=None,
+               sex: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Classify batches of `extract_test_results` output
+
+        Returns:
+            dict: The columns from `results_to_columns` plus 'code'
+        """
+        columns = results_to_columns(reports, range_index, sex)
+        columns['code'] = self.classify(columns['value'], columns['low'], columns['high'])
+        return columns
+
+    def detect_batch(self, batch) -> np.ndarray:
+        """Classify every row of a ResultBatch using its printed ranges, without copying"""
+        columns = batch.columns()
+        return self.classify(columns['value'], columns['min_normal'], columns['max_normal'])
+
+    @staticmethod
+    def labels(codes) -> np.ndarray:
+        """Map classification codes to their string labels"""
+        return LABELS[np.asarray(codes)]
+
+    @staticmethod
+    def is_abnormal(codes) -> np.ndarray:
+        """Boolean mask of values outside their range (any direction or severity)"""
+        codes = np.asarray(codes)
+        return (codes != NORMAL) & (codes != UNKNOWN)
+
+
+def flag_results(entities: Dict, detector: Optional[AnomalyDetector] = None, range_index=None) -> Dict:
+    """
+    Classify the test results of one `extract_all` output in place
+
+    Each result gets a 'flag' label. A range printed on the report wins;
+    otherwise the configured range for the test, the patient's gender and
+    the sampling context is used (see `NormalRangeIndex.resolve`).
+
+    Args:
+        entities (dict): `extract_all` output
+        detector (AnomalyDetector): Classifier (default: configured sensitivity)
+        range_index: NormalRangeIndex (default: `get_normal_range_index()`)
+
+    Returns:
+        dict: `entities`
+    """
+    results = entities.get('test_results') or []
+    if not results:
+        return entities
+    if range_index is None:
+        from .normal_ranges import get_normal_range_index
+
+        range_index = get_normal_range_index()
+    detector = detector or AnomalyDetector()
+    sex = (entities.get('patient_info') or {}).get('gender')
+
+    codes = detector.detect([results], range_index, sex)['code']
+    for result, label in zip(results, detector.labels(codes)):
+        result['flag'] = str(label)
+    return entities
@@ -0,0 +1,476 @@
+"""
+Columnar Export Module
+Append-only, partitioned Parquet (or gzipped CSV) export of extracted results
+"""
+
+import argparse
+import csv
+import gzip
+import importlib.util
+import logging
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+from .history_store import canonical_test, read_jsonl
+from ..utils.config import get_setting, resolve_path
+from ..utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Columns stored in each file; `test` and `report_date` live in the directory names
+COLUMNS = ('patient_id', 'patient_name', 'age', 'gender', 'collection_date', 'source',
+           'content_hash', 'test_name', 'value', 'unit', 'normal_range', 'min_normal', 'max_normal')
+FLOAT_COLUMNS = ('value', 'min_normal', 'max_normal')
+PARTITION_COLUMNS = ('test', 'report_date')
+
+# Partition of reports without a report or collection date
+UNKNOWN_DATE = 'unknown'
+
+SUFFIXES = {'parquet': '.parquet', 'csv': '.csv.gz'}
+
+# Held by `compact` while it rewrites a partition; hidden, so readers skip it
+LOCK_NAME = '.compact.lock'
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def pyarrow_available() -> bool:
+    """Whether Parquet can be written (checked without importing pyarrow)"""
+    return importlib.util.find_spec('pyarrow') is not None
+
+
+def _partition_name(column: str, value: str) -> str:
+    return f"{column}={quote(value, safe='')}"
+
+
+def _partition_value(path: Path) -> str:
+    return unquote(path.name.split('=', 1)[1])
+
+
+def _number(value, cast=float):
+    """`cast(value)`, or None if it is missing or not a number"""
+    if value is None:
+        return None
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def _partition_lock(directory: Path) -> Iterator[bool]:
+    """Hold a partition's compaction lock; yields False if another process holds it"""
+    with open(directory / LOCK_NAME, 'a+b') as file:
+        try:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    types = {'age': pa.int32(), **{column: pa.float64() for column in FLOAT_COLUMNS}}
+    return pa.schema([(column, types.get(column, pa.string())) for column in COLUMNS])
+
+
+def _report_rows(entities: Dict) -> Iterator[Tuple[str, str, tuple]]:
+    """
+    (test, report_date, row) for each result of one `extract_all` output
+
+    Results whose value is not a number are skipped and counted in
+    `export_skipped_rows_total`.
+    """
+    info = entities.get('patient_info') or {}
+    report_date = info.get('report_date') or info.get('collection_date') or UNKNOWN_DATE
+    report = (info.get('id'), info.get('name'), _number(info.get('age'), int),
+              info.get('gender'), info.get('collection_date'),
+              entities.get('filename') or entities.get('source'), entities.get('content_hash'))
+
+    for result in entities.get('test_results') or ():
+        test = canonical_test(result)
+        if test is None or result.get('value') is None:
+            continue
+        value = _number(result['value'])
+        if value is None:
+            logger.debug("Skipping non-numeric %s value %r", test, result['value'])
+            metrics.inc('export_skipped_rows_total', reason='non_numeric')
+            continue
+        yield test, report_date, report + (
+            result.get('test_name'), value, result.get('unit'), result.get('normal_range'),
+            _number(result.get('min_normal')), _number(result.get('max_normal')))
+
+
+class ColumnarExporter:
+    """
+    Extracted results as a partitioned columnar dataset for bulk analytics
+
+    One row per test result, carrying its report's patient fields. Files
+    are laid out Hive-style as
+
+        <root>/test=<test>/report_date=<YYYY-MM-DD>/part-<time>-<id>.parquet
+
+    (`.csv.gz` when pyarrow is not installed), so pandas, pyarrow.dataset,
+    DuckDB and Spark can all read the directory as one table. Each
+    `write` adds new part files and never touches existing ones: a file
+    is written under a hidden temporary name and renamed into place, so
+    readers only ever see complete files. Small files accumulate until
+    `compact` is run. Reading one test only lists and opens that test's
+    directory, and a date range skips whole partitions.
+
+    Rows are not de-duplicated across writes; feed the exporter from the
+    history store or the backlog output if reports may repeat.
+    """
+
+    def __init__(self, root: Optional[str] = None, format: Optional[str] = None,
+                 compression: Optional[str] = None):
+        self.root = Path(root) if root else resolve_path(
+            get_setting('export', 'dir', 'data/processed/export/'))
+        format = format or get_setting('export', 'format', 'auto')
+        if format == 'auto':
+            format = 'parquet' if pyarrow_available() else 'csv'
+        if format not in SUFFIXES:
+            raise ValueError(f"Unknown export format: {format!r} (expected 'parquet', 'csv' or 'auto')")
+        if format == 'parquet' and not pyarrow_available():
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+        self.format = format
+        self.compression = compression or get_setting('export', 'compression', 'zstd')
+
+    def write(self, reports: Iterable[Dict], batch_size: Optional[int] = None) -> int:
+        """
+        Append many `extract_all` outputs
+
+        Reports may carry 'content_hash' and 'filename' (or 'source') keys
+        as written by the ingestion service and the backlog runner. Rows
+        are grouped by partition in memory, `batch_size` reports at a time,
+        and each group becomes one new file.
+
+        Returns:
+            int: Number of result rows written
+        """
+        batch_size = batch_size or get_setting('export', 'batch_size', 50000)
+        reports = iter(reports)
+        written = 0
+        while True:
+            batch = list(islice(reports, batch_size))
+            if not batch:
+                return written
+            written += self._write_batch(batch)
+
+    def _write_batch(self, reports: List[Dict]) -> int:
+        partitions: Dict[Tuple[str, str], List[tuple]] = {}
+        for entities in reports:
+            for test, report_date, row in _report_rows(entities):
+                partitions.setdefault((test, report_date), []).append(row)
+
+        written = 0
+        with metrics.timer('export_batch_seconds', format=self.format):
+            for (test, report_date), rows in partitions.items():
+                directory = self.root / _partition_name('test', test) / _partition_name('report_date', report_date)
+                directory.mkdir(parents=True, exist_ok=True)
+                self._write_part(directory, self.format, rows)
+                written += len(rows)
+
+        metrics.inc('export_rows_total', written, format=self.format)
+        logger.info("Exported %d results from %d reports into %d partitions",
+                    written, len(reports), len(partitions))
+        return written
+
+    def _write_part(self, directory: Path, format: str, rows) -> Path:
+        """Write one part file under a temporary name and rename it into place"""
+        name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}{SUFFIXES[format]}"
+        tmp_path = directory / f".{name}.tmp"
+        try:
+            if format == 'parquet':
+                self._write_parquet(tmp_path, rows)
+            else:
+                self._write_csv(tmp_path, rows)
+            os.replace(tmp_path, directory / name)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return directory / name
+
+    def _write_parquet(self, path: Path, rows) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if isinstance(rows, pa.Table):
+            table = rows
+        else:
+            table = pa.Table.from_pydict({column: list(values) for column, values in zip(COLUMNS, zip(*rows))},
+                                         schema=_arrow_schema())
+        pq.write_table(table, path, compression=self.compression)
+
+    @staticmethod
+    def _write_csv(path: Path, rows: Iterable) -> None:
+        with gzip.open(path, 'wt', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(COLUMNS)
+            writer.writerows(rows)
+
+    @staticmethod
+    def _parts(directory: Path) -> List[Path]:
+        return sorted(path for path in directory.iterdir()
+                      if not path.name.startswith('.') and path.name.endswith(tuple(SUFFIXES.values())))
+
+    def _compact_partition(self, directory: Path) -> int:
+        """
+        Merge a partition's part files into one file per format
+
+        Runs under the partition's lock, so two compactions never merge
+        the same parts; a partition another process is compacting is
+        skipped. The merged file is renamed into place before the parts it
+        replaces are removed, so a reader listing the partition in between
+        may see those rows twice but never misses any. Parts added while
+        this runs are left alone.
+
+        Returns:
+            int: Number of part files removed
+        """
+        with _partition_lock(directory) as locked:
+            if not locked:
+                logger.info("Skipping %s: another process is compacting it", directory)
+                return 0
+            return self._merge_parts(directory)
+
+    def _merge_parts(self, directory: Path) -> int:
+        removed = 0
+        for format, suffix in SUFFIXES.items():
+            parts = [path for path in self._parts(directory) if path.name.endswith(suffix)]
+            if len(parts) < 2:
+                continue
+            if format == 'parquet':
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                rows = pa.concat_tables([pq.ParquetFile(path).read().cast(_arrow_schema()) for path in parts])
+            else:
+                rows = self._csv_rows(parts)
+            with metrics.timer('export_compact_seconds', format=format):
+                self._write_part(directory, format, rows)
+            for path in parts:
+                path.unlink(missing_ok=True)
+            removed += len(parts)
+        return removed
+
+    @staticmethod
+    def _csv_rows(paths: List[Path]) -> Iterator[List[str]]:
+        for path in paths:
+            with gzip.open(path, 'rt', encoding='utf-8', newline='') as file:
+                reader = csv.reader(file)
+                header = next(reader, None)
+                if header is None:
+                    continue
+                if tuple(header) == COLUMNS:
+                    yield from reader
+                else:
+                    positions = [header.index(column) if column in header else None for column in COLUMNS]
+                    for row in reader:
+                        yield [row[i] if i is not None else '' for i in positions]
+
+    def compact(self, test: Optional[str] = None) -> int:
+        """
+        Merge the part files of every partition (or of one test's partitions)
+
+        Each `write` adds a file per partition it touches and never
+        rewrites existing ones; run this after many small writes to keep
+        readers from opening thousands of tiny files. Only runs when
+        called.
+
+        Returns:
+            int: Number of part files removed
+        """
+        tests = [test] if test else self.tests()
+        removed = 0
+        for name in tests:
+            test_dir = self.root / _partition_name('test', name)
+            if not test_dir.is_dir():
+                continue
+            for date_dir in sorted(test_dir.iterdir()):
+                if date_dir.is_dir() and date_dir.name.startswith('report_date='):
+                    removed += self._compact_partition(date_dir)
+        metrics.inc('export_compacted_files_total', removed)
+        logger.info("Compacted %d part files", removed)
+        return removed
+
+    def tests(self) -> List[str]:
+        """Tests present in the dataset"""
+        if not self.root.is_dir():
+            return []
+        return sorted(_partition_value(path) for path in self.root.iterdir()
+                      if path.is_dir() and path.name.startswith('test='))
+
+    def files(self, test: str, since: Optional[str] = None, until: Optional[str] = None) -> List[Path]:
+        """
+        Part files of one test, optionally within a report date range (inclusive)
+
+        Only the test's own directory is listed; partitions outside the
+        range are skipped without being opened. Reports without a date are
+        included only when no range is given.
+        """
+        test_dir = self.root / _partition_name('test', test)
+        if not test_dir.is_dir():
+            return []
+        files = []
+        for date_dir in sorted(test_dir.iterdir()):
+            if not date_dir.name.startswith('report_date='):
+                continue
+            report_date = _partition_value(date_dir)
+            if since or until:
+                if report_date == UNKNOWN_DATE:
+                    continue
+                if (since and report_date < since) or (until and report_date > until):
+                    continue
+            files.extend(self._parts(date_dir))
+        return files
+
+    def read_test(self, test: str, since: Optional[str] = None, until: Optional[str] = None,
+                  columns: Optional[List[str]] = None):
+        """
+        Load every result of one test as a pandas DataFrame
+
+        With pyarrow installed, the test's Parquet files are read as one
+        `pyarrow.dataset` scan: the date range becomes a filter on the
+        `report_date` partition, so partitions outside it are pruned
+        before any file is opened. CSV parts are read with pandas.
+
+        Args:
+            test (str): Canonical test key, e.g. "hemoglobin"
+            since (str): First report date to include (YYYY-MM-DD)
+            until (str): Last report date to include
+            columns (list): Stored columns to read (default: all); Parquet
+                files only read these columns from disk
+
+        Returns:
+            DataFrame: The requested columns plus 'test' and 'report_date'
+        """
+        import pandas as pd
+
+        columns = list(columns or COLUMNS)
+        unknown = set(columns) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+
+        frames = []
+        with metrics.timer('export_read_seconds'):
+            if pyarrow_available():
+                frame = self._read_dataset(test, since, until, columns)
+                if frame is not None:
+                    frames.append(frame)
+            for path in self.files(test, since, until):
+                if path.name.endswith('.parquet'):
+                    if pyarrow_available():
+                        continue
+                    raise ImportError("Reading Parquet exports needs pyarrow (pip install pyarrow)")
+                frame = pd.read_csv(path, usecols=columns, compression='gzip',
+                                    dtype={column: 'string' for column in columns
+                                           if column not in FLOAT_COLUMNS and column != 'age'})
+                frame['report_date'] = _partition_value(path.parent)
+                frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame(columns=columns + list(PARTITION_COLUMNS))
+        data = pd.concat(frames, ignore_index=True)
+        if 'age' in data:
+            data['age'] = data['age'].astype('Int32')
+        data['test'] = test
+        return data[columns + list(PARTITION_COLUMNS)]
+
+    def _read_dataset(self, test: str, since: Optional[str], until: Optional[str], columns: List[str]):
+        """The test's Parquet rows in [since, until], or None if it has no Parquet files"""
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        test_dir = self.root / _partition_name('test', test)
+        paths = [str(path) for path in self.files(test) if path.name.endswith('.parquet')]
+        if not paths:
+            return None
+
+        # Keep dates as strings: 'unknown' is a valid partition value
+        partitioning = ds.partitioning(pa.schema([('report_date', pa.string())]), flavor='hive')
+        dataset = ds.dataset(paths, schema=_arrow_schema().append(pa.field('report_date', pa.string())),
+                             format='parquet', partitioning=partitioning, partition_base_dir=str(test_dir))
+
+        date = ds.field('report_date')
+        condition = None
+        if since or until:
+            condition = date != UNKNOWN_DATE
+            if since:
+                condition &= date >= since
+            if until:
+                condition &= date <= until
+        return dataset.to_table(columns=columns + ['report_date'], filter=condition).to_pandas()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Partitioned columnar export of extraction results")
+    parser.add_argument('--dir', default=None, help="Dataset directory (default: export.dir)")
+    parser.add_argument('--format', default=None, choices=['auto', 'parquet', 'csv'],
+                        help="File format (default: export.format)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help="Append JSONL extraction results (e.g. from the backlog runner)")
+    export.add_argument('inputs', nargs='+')
+
+    read = commands.add_parser('read', help="Print the results of one test")
+    read.add_argument('test')
+    read.add_argument('--since', default=None, help="First report date (YYYY-MM-DD)")
+    read.add_argument('--until', default=None, help="Last report date (YYYY-MM-DD)")
+    read.add_argument('--output', default=None, help="Write the rows to this CSV file instead")
+
+    commands.add_parser('tests', help="List the tests in the dataset")
+
+    compact = commands.add_parser('compact', help="Merge each partition's part files into one")
+    compact.add_argument('test', nargs='?', default=None, help="Only this test (default: all)")
+
+    args = parser.parse_args(argv)
+    from ..utils.logging_config import setup_logging
+
+    setup_logging()
+
+    exporter = ColumnarExporter(args.dir, args.format)
+    if args.command == 'export':
+        written = exporter.write(read_jsonl(args.inputs))
+        print(f"Exported {written} results to {exporter.root} ({exporter.format})")
+    elif args.command == 'read':
+        data = exporter.read_test(args.test, args.since, args.until)
+        if args.output:
+            data.to_csv(args.output, index=False)
+            print(f"Wrote {len(data)} rows to {args.output}")
+        else:
+            print(data.to_string(index=False, max_rows=50))
+    elif args.command == 'compact':
+        removed = exporter.compact(args.test)
+        print(f"Merged {removed} part files in {exporter.root}")
+    else:
+        for test in exporter.tests():
+            print(test)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Patient History Module
+Persistent SQLite store of extracted results for trend analysis
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import sqlite3
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..utils.config import get_setting, resolve_path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    report_id INTEGER PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    collection_date TEXT,
+    report_date TEXT,
+    patient_name TEXT,
+    age INTEGER,
+    gender TEXT,
+    source TEXT,
+    content_hash TEXT UNIQUE,
+    ingested_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS results (
+    report_id INTEGER NOT NULL REFERENCES reports(report_id) ON DELETE CASCADE,
+    patient_id TEXT NOT NULL,
+    test TEXT NOT NULL,
+    collection_date TEXT,
+    value REAL NOT NULL,
+    unit TEXT,
+    min_normal REAL,
+    max_normal REAL,
+    test_name TEXT
+);
+
+-- Serves both per-patient series (test = ? AND patient_id = ?) and per-test
+-- scans across patients, which it returns in window-function order
+CREATE INDEX IF NOT EXISTS results_test_patient_date
+    ON results (test, patient_id, collection_date, value);
+CREATE INDEX IF NOT EXISTS results_report ON results (report_id);
+CREATE INDEX IF NOT EXISTS reports_patient_date ON reports (patient_id, collection_date);
+"""
+
+RESULT_COLUMNS = ('report_id', 'patient_id', 'test', 'collection_date', 'value',
+                  'unit', 'min_normal', 'max_normal', 'test_name')
+INSERT_RESULT = (f"INSERT INTO results ({', '.join(RESULT_COLUMNS)}) "
+                 f"VALUES ({', '.join('?' * len(RESULT_COLUMNS))})")
+
+
+def _record_hash(entities: Dict) -> Optional[str]:
+    """
+    Content hash of a stored record
+
+    'content_hash' as written by the ingestion service and the backlog
+    runner. Records without one are keyed on a digest of their extracted
+    fields, so loading the same file twice still stores each report once.
+    """
+    digest = entities.get('content_hash')
+    if digest:
+        return digest
+    fields = {key: entities.get(key) for key in ('patient_info', 'test_results', 'filename', 'source')}
+    return 'entities:' + hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def canonical_test(result: Dict) -> Optional[str]:
+    """Canonical test key of an extracted result, falling back to its printed name"""
+    key = result.get('test_key')
+    if key:
+        return key
+    name = result.get('test_name')
+    return '_'.join(name.lower().split()) if name else None
+
+
+class HistoryStore:
+    """
+    Results of every analysed report, queryable as per-patient time series
+
+    Each report becomes one row in `reports` and one row per test in
+    `results`. The patient id and collection date are copied onto every
+    result row so the covering index on (test, patient_id, date, value)
+    answers per-patient series and per-test trend queries from the index
+    alone, which keeps them fast at tens of millions of rows.
+    Reports are de-duplicated by content hash. Reports without a
+    collection or report date are stored undated (NULL): they are listed
+    after dated ones and left out of date-bounded series and trends.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        if db_path is None:
+            db_path = resolve_path(get_setting('paths', 'history_db', 'data/processed/history.sqlite3'))
+        if str(db_path) != ':memory:':
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self.db_path = str(db_path)
+        # Autocommit; writes group themselves with `_transaction`
+        self.conn = sqlite3.connect(self.db_path, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        self.conn.execute("BEGIN")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def __enter__(self) -> 'HistoryStore':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _insert_report(self, entities: Dict, patient_id: Optional[str], content_hash: Optional[str],
+                       source: Optional[str]) -> Tuple[Optional[int], List[tuple]]:
+        """Insert one report row; returns its id and its result rows (not yet inserted)"""
+        info = entities.get('patient_info') or {}
+        patient_id = patient_id or info.get('id')
+        if not patient_id:
+            logger.warning(f"Skipping report without a patient id: {source or '<unknown>'}")
+            return None, []
+
+        if content_hash:
+            row = self.conn.execute("SELECT report_id FROM reports WHERE content_hash = ?",
+                                    (content_hash,)).fetchone()
+            if row is not None:
+                return None, []
+
+        # Trend order follows sample collection; fall back to the report date,
+        # and store undated reports as NULL rather than inventing a date
+        collection_date = info.get('collection_date') or info.get('report_date')
+        age = info.get('age')
+        report_id = self.conn.execute(
+            "INSERT INTO reports (patient_id, collection_date, report_date, patient_name, age, gender,"
+            " source, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (patient_id, collection_date, info.get('report_date'), info.get('name'),
+             int(age) if age is not None else None, info.get('gender'), source, content_hash),
+        ).lastrowid
+
+        rows = []
+        for result in entities.get('test_results') or ():
+            test = canonical_test(result)
+            if test is None or result.get('value') is None:
+                continue
+            rows.append((report_id, patient_id, test, collection_date, float(result['value']),
+                         result.get('unit'), result.get('min_normal'), result.get('max_normal'),
+                         result.get('test_name')))
+        return report_id, rows
+
+    def add_report(self, entities: Dict, patient_id: Optional[str] = None,
+                   content_hash: Optional[str] = None, source: Optional[str] = None) -> Optional[int]:
+        """
+        Store one `MedicalEntityExtractor.extract_all` result
+
+        Args:
+            entities (dict): Output of `extract_all`
+            patient_id (str): Overrides the id read from the report
+            content_hash (str): SHA-256 of the source PDF; a report already stored is skipped
+                (default: read from the record, see `_record_hash`)
+            source (str): Filename or path the report came from
+
+        Returns:
+            int: The new report id, or None if the report was skipped
+        """
+        with self._transaction():
+            report_id, rows = self._insert_report(entities, patient_id, content_hash or _record_hash(entities),
+                                                  source)
+            self.conn.executemany(INSERT_RESULT, rows)
+        return report_id
+
+    def add_reports(self, reports: Iterable[Dict], batch_size: int = 5000) -> int:
+        """
+        Bulk-load many reports
+
+        Reports are `extract_all` outputs, optionally carrying 'content_hash'
+        and 'filename' (or 'source') keys as written by the ingestion service
+        and the backlog runner. Reports already stored are skipped, so
+        loading the same file again is a no-op. Result rows are inserted
+        with executemany, one transaction per `batch_size` reports.
+
+        Returns:
+            int: Number of reports stored
+        """
+        reports = iter(reports)
+        stored = 0
+        while True:
+            with self._transaction():
+                rows, pending = [], 0
+                for entities in reports:
+                    report_id, report_rows = self._insert_report(
+                        entities, None, _record_hash(entities),
+                        entities.get('filename') or entities.get('source'))
+                    stored += report_id is not None
+                    rows.extend(report_rows)
+                    pending += 1
+                    if pending >= batch_size:
+                        break
+                self.conn.executemany(INSERT_RESULT, rows)
+            if pending < batch_size:
+                return stored
+
+    def last_values(self, patient_id: str, test: str, n: int = 10) -> List[Dict]:
+        """
+        The most recent `n` results of one test for one patient, newest first
+
+        Undated results come after all dated ones.
+
+        Returns:
+            list: {'collection_date', 'value', 'unit', 'min_normal', 'max_normal', 'report_id'}
+        """
+        rows = self.conn.execute(
+            "SELECT collection_date, value, unit, min_normal, max_normal, report_id FROM results"
+            " WHERE patient_id = ? AND test = ? ORDER BY collection_date IS NULL, collection_date DESC LIMIT ?",
+            (patient_id, test, n),
+        )
+        return [dict(row) for row in rows]
+
+    def series(self, patient_id: str, test: str, since: Optional[str] = None) -> List[Tuple[str, float]]:
+        """(collection_date, value) pairs of one test for one patient, oldest first (undated ones excluded)"""
+        rows = self.conn.execute(
+            "SELECT collection_date, value FROM results"
+            " WHERE patient_id = ? AND test = ? AND collection_date >= ? ORDER BY collection_date",
+            (patient_id, test, since or ''),
+        )
+        return [tuple(row) for row in rows]
+
+    def rising(self, test: str, min_increase_pct: float = 20.0, consecutive: bool = False,
+               since: Optional[str] = None) -> List[Dict]:
+        """
+        Patients whose value of `test` rose by more than `min_increase_pct`
+
+        By default the latest value is compared with the patient's first
+        value (since `since`, if given); with `consecutive` any rise between
+        two successive reports counts. Undated results are left out. Runs
+        as one window-function query over the per-test index.
+
+        Returns:
+            list: {'patient_id', 'from_date', 'from_value', 'to_date', 'to_value', 'increase_pct'},
+            largest increase first
+        """
+        if consecutive:
+            query = """
+                WITH ordered AS (
+                    SELECT patient_id, collection_date AS to_date, value AS to_value,
+                           LAG(collection_date) OVER w AS from_date,
+                           LAG(value) OVER w AS from_value
+                    FROM results WHERE test = ? AND collection_date >= ?
+                    WINDOW w AS (PARTITION BY patient_id ORDER BY collection_date)
+                ), rises AS (
+                    SELECT *, (to_value - from_value) * 100.0 / from_value AS increase_pct,
+                           ROW_NUMBER() OVER (PARTITION BY patient_id
+                                              ORDER BY (to_value - from_value) / from_value DESC) AS rank
+                    FROM ordered WHERE from_value > 0
+                )
+                SELECT patient_id, from_date, from_value, to_date, to_value, increase_pct
+                FROM rises WHERE rank = 1 AND increase_pct > ?
+                ORDER BY increase_pct DESC
+            """
+        else:
+            query = """
+                WITH ordered AS (
+                    SELECT patient_id, collection_date AS to_date, value AS to_value,
+                           FIRST_VALUE(collection_date) OVER w AS from_date,
+                           FIRST_VALUE(value) OVER w AS from_value,
+                           ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY collection_date DESC) AS recency
+                    FROM results WHERE test = ? AND collection_date >= ?
+                    WINDOW w AS (PARTITION BY patient_id ORDER BY collection_date)
+                )
+                SELECT patient_id, from_date, from_value, to_date, to_value,
+                       (to_value - from_value) * 100.0 / from_value AS increase_pct
+                FROM ordered
+                WHERE recency = 1 AND from_value > 0 AND to_date > from_date
+                  AND (to_value - from_value) * 100.0 / from_value > ?
+                ORDER BY increase_pct DESC
+            """
+        rows = self.conn.execute(query, (test, since or '', min_increase_pct))
+        return [dict(row) for row in rows]
+
+    def patients(self) -> List[str]:
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT patient_id FROM reports ORDER BY 1")]
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def read_jsonl(paths: Iterable[str]) -> Iterable[Dict]:
+    """Successful records of JSONL outputs, skipping backlog records superseded by a later one"""
+    from ..service.backlog import read_records
+
+    for path in paths:
+        for record in read_records(path):
+            if record.get('status', 'ok') == 'ok':
+                yield record
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Patient result history")
+    parser.add_argument('--db', default=None, help="Database path (default: paths.history_db)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="Load JSONL extraction results (e.g. from the ingestion service)")
+    ingest.add_argument('inputs', nargs='+')
+
+    last = commands.add_parser('last', help="Most recent values of a test for a patient")
+    last.add_argument('patient_id')
+    last.add_argument('test')
+    last.add_argument('-n', type=int, default=10)
+
+    rising = commands.add_parser('rising', help="Patients whose value of a test rose")
+    rising.add_argument('test')
+    rising.add_argument('--pct', type=float, default=20.0, help="Minimum increase in percent")
+    rising.add_argument('--consecutive', action='store_true', help="Compare successive reports")
+    rising.add_argument('--since', default=None, help="Only reports collected on or after this date")
+
+    args = parser.parse_args(argv)
+    from ..utils.logging_config import setup_logging
+
+    setup_logging()
+
+    with HistoryStore(args.db) as store:
+        if args.command == 'ingest':
+            stored = store.add_reports(read_jsonl(args.inputs))
+            print(f"Stored {stored} reports ({len(store)} results in {store.db_path})")
+        elif args.command == 'last':
+            for row in store.last_values(args.patient_id, args.test, args.n):
+                print(f"{row['collection_date'] or 'undated':<10}  {row['value']:g} {row['unit'] or ''}")
+        else:
+            for row in store.rising(args.test, args.pct, args.consecutive, args.since):
+                print(f"{row['patient_id']:<16} {row['from_date']} {row['from_value']:g} -> "
+                      f"{row['to_date']} {row['to_value']:g}  (+{row['increase_pct']:.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
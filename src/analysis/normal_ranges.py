@@ -0,0 +1,210 @@
+"""
+Normal Range Module
+Compiles the normal_ranges section of config.yaml into an indexed lookup
+"""
+
+import logging
+import re
+import threading
+from typing import Dict, Optional, Tuple
+
+from ..utils.config import config_generation, load_config
+
+logger = logging.getLogger(__name__)
+
+SEX_KEYS = {'male', 'female'}
+CONTEXT_KEYS = {'fasting', 'random', 'postprandial'}
+DEFAULT_KEY = 'range'
+# Sub-analyte key that refers to the parent test itself
+TOTAL_KEY = 'total'
+
+RangeKey = Tuple[str, Optional[str], Optional[str], Optional[str]]
+
+_SUPERSCRIPT_FACTOR_RE = re.compile(r'10([⁰¹²³⁴⁵⁶⁷⁸⁹⁻]+)')
+_SUPERSCRIPTS = str.maketrans('⁰¹²³⁴⁵⁶⁷⁸⁹⁻', '0123456789-')
+_FACTOR_RE = re.compile(r'^[x*×]?10(?:\^|\*\*|\*|e)(-?\d+)')
+
+
+def normalize_unit(unit: Optional[str]) -> Optional[str]:
+    """
+    Normalize a unit for comparison
+
+    Only spelling is folded: case, whitespace, the spellings of micro
+    ("μL", "µL", "microL", "mcL") and of a power-of-ten factor ("x10^3",
+    "10*3", "10³"), so "10^3/μL" from the config matches "10^3/microL" as
+    it comes out of the line parser. The factor itself is kept: "10^3/μL",
+    "10^6/μL" and "/μL" stay three different units.
+    """
+    if not unit:
+        return None
+    unit = unit.strip().lower().replace(' ', '')
+    unit = _SUPERSCRIPT_FACTOR_RE.sub(lambda match: '10^' + match.group(1).translate(_SUPERSCRIPTS), unit)
+    unit = unit.replace('micro', 'u').replace('μ', 'u').replace('µ', 'u').replace('mcl', 'ul')
+    return _FACTOR_RE.sub(r'10^\1', unit) or None
+
+
+def infer_context(test_name: str) -> Optional[str]:
+    """Read a sampling context such as "fasting" from a printed test name"""
+    lowered = test_name.lower()
+    for context in CONTEXT_KEYS:
+        if context in lowered:
+            return context
+    return None
+
+
+class NormalRangeIndex:
+    """
+    Reference ranges keyed by (canonical test, sex, context, unit)
+
+    Ranges are compiled once into a dict. Variants without a sex or context
+    are stored as well, holding the widest range across the specific ones,
+    and every range is also stored without a unit, so each lookup is a few
+    dict probes at most.
+    """
+
+    def __init__(self, normal_ranges: Dict, analytes=None):
+        self.ranges: Dict[RangeKey, Tuple[float, float]] = {}
+        self.units: Dict[str, Optional[str]] = {}
+        self._analytes = analytes
+        # Keys set directly from the config, never widened by wildcards
+        self._configured = set()
+
+        for name, spec in (normal_ranges or {}).items():
+            self._add_test(name, spec or {})
+
+    def _canonical(self, name: str, fallback: Optional[str] = None) -> str:
+        if self._analytes is not None:
+            key = self._analytes.classify(name)
+            if key:
+                return key
+        return '_'.join((fallback or name).lower().split())
+
+    def _add_test(self, name: str, spec: Dict) -> None:
+        unit = normalize_unit(spec.get('unit'))
+
+        for variant, bounds in spec.items():
+            if variant == 'unit' or not isinstance(bounds, (list, tuple)) or len(bounds) != 2:
+                continue
+            variant = variant.lower()
+
+            if variant in SEX_KEYS:
+                test, sex, context = self._canonical(name), variant, None
+            elif variant in CONTEXT_KEYS:
+                test, sex, context = self._canonical(name), None, variant
+            elif variant in (DEFAULT_KEY, TOTAL_KEY):
+                test, sex, context = self._canonical(name), None, None
+            else:
+                # Sub-analyte such as cholesterol -> ldl
+                test, sex, context = self._canonical(f"{variant} {name}", variant), None, None
+
+            self.units.setdefault(test, unit)
+            self._store(test, sex, context, unit, (float(bounds[0]), float(bounds[1])))
+
+    def _store(self, test: str, sex: Optional[str], context: Optional[str],
+               unit: Optional[str], bounds: Tuple[float, float]) -> None:
+        for s in {sex, None}:
+            for c in {context, None}:
+                for u in {unit, None}:
+                    key = (test, s, c, u)
+                    if (s, c) == (sex, context):
+                        self.ranges[key] = bounds
+                        self._configured.add(key)
+                    elif key not in self.ranges:
+                        self.ranges[key] = bounds
+                    elif key not in self._configured:
+                        # Wildcard variant: widen to cover every specific range
+                        low, high = self.ranges[key]
+                        self.ranges[key] = (min(low, bounds[0]), max(high, bounds[1]))
+
+    def lookup(self, test: str, sex: Optional[str] = None, context: Optional[str] = None,
+               unit: Optional[str] = None) -> Optional[Tuple[float, float]]:
+        """
+        Find the reference range for a test
+
+        Args:
+            test (str): Canonical test key, e.g. "hemoglobin"
+            sex (str): "male" or "female", if known
+            context (str): Sampling context such as "fasting", if known
+            unit (str): Unit of the value; a range in a different unit is never returned
+
+        Returns:
+            tuple: (low, high), or None if no range applies
+        """
+        sex = sex.lower() if sex else None
+        context = context.lower() if context else None
+        unit = normalize_unit(unit)
+        ranges = self.ranges
+
+        bounds = ranges.get((test, sex, context, unit))
+        if bounds is None and sex is not None:
+            bounds = ranges.get((test, None, context, unit))
+        if bounds is None and context is not None:
+            bounds = ranges.get((test, sex, None, unit)) or ranges.get((test, None, None, unit))
+        return bounds
+
+    def resolve(self, result: Dict, sex: Optional[str] = None,
+                context: Optional[str] = None) -> Tuple[Optional[float], Optional[float], str]:
+        """
+        Choose the range to judge an extracted test result against
+
+        The range printed on the report wins; otherwise the configured range
+        for the result's canonical test is used.
+
+        Returns:
+            tuple: (low, high, source) where source is "report", "config" or "none"
+        """
+        if result.get('min_normal') is not None:
+            return result['min_normal'], result['max_normal'], 'report'
+
+        test = result.get('test_key')
+        if test:
+            context = context or infer_context(result.get('test_name', ''))
+            bounds = self.lookup(test, sex, context, result.get('unit'))
+            if bounds:
+                return bounds[0], bounds[1], 'config'
+        return None, None, 'none'
+
+    def classify(self, result: Dict, sex: Optional[str] = None,
+                 context: Optional[str] = None) -> Optional[str]:
+        """Return "low", "normal" or "high" for a result, or None without a range"""
+        low, high, _ = self.resolve(result, sex, context)
+        if low is None:
+            return None
+        value = result['value']
+        if value < low:
+            return 'low'
+        if value > high:
+            return 'high'
+        return 'normal'
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+
+_index_lock = threading.Lock()
+_index_cache: Dict[Optional[str], Tuple[int, NormalRangeIndex]] = {}
+
+
+def get_normal_range_index(config_path: Optional[str] = None) -> NormalRangeIndex:
+    """
+    Process-wide range index for a config file
+
+    The index is compiled on first use and rebuilt only when the config file
+    has been reloaded because it changed on disk. Test names are mapped to
+    the analyte dictionary's keys, as extracted results carry them.
+    """
+    generation = config_generation(config_path)
+    cached = _index_cache.get(config_path)
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+
+    with _index_lock:
+        cached = _index_cache.get(config_path)
+        if cached is None or cached[0] != generation:
+            from ..extraction.analyte_dictionary import default_analyte_dictionary
+
+            index = NormalRangeIndex(load_config(config_path).get('normal_ranges'), default_analyte_dictionary())
+            logger.info(f"Compiled {len(index)} normal range entries")
+            cached = (generation, index)
+            _index_cache[config_path] = cached
+        return cached[1]
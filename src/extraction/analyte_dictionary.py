@@ -0,0 +1,207 @@
+"""
+Analyte Dictionary Module
+Loads test names and synonyms and matches them with an Aho-Corasick automaton
+"""
+
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import yaml
+
+from ..utils.config import get_setting, load_config, resolve_path
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_term(term: str) -> str:
+    """Lower-case a term and collapse runs of whitespace"""
+    return ' '.join(term.lower().split())
+
+
+class AhoCorasick:
+    """
+    Multi-pattern string matcher
+
+    All terms are compiled into one trie with failure links, so scanning a
+    line costs O(line length + matches) regardless of how many terms exist.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Value and length of the term ending at each node, if any
+        self._term: List[Optional[Tuple[str, int]]] = [None]
+        # Nearest node on the failure chain that ends a term
+        self._dict_link: List[int] = [0]
+        self._built = False
+
+    def add(self, term: str, value: str) -> None:
+        """Add a term; the first value added for a term wins"""
+        node = 0
+        for char in term:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._term.append(None)
+                self._dict_link.append(0)
+            node = next_node
+        if self._term[node] is None:
+            self._term[node] = (value, len(term))
+        self._built = False
+
+    def build(self) -> None:
+        """Compute failure and dictionary links breadth first"""
+        queue = list(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fallback = self._goto[fail].get(char, 0)
+                self._fail[child] = fallback if fallback != child else 0
+                target = self._fail[child]
+                self._dict_link[child] = target if self._term[target] else self._dict_link[target]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start, end, value) for every term occurrence in text"""
+        if not self._built:
+            self.build()
+        goto, fail, terms, dict_link = self._goto, self._fail, self._term, self._dict_link
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match = node if terms[node] else dict_link[node]
+            while match:
+                value, length = terms[match]
+                yield index + 1 - length, index + 1, value
+                match = dict_link[match]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+
+class AnalyteDictionary:
+    """
+    Canonical analytes with display names, LOINC codes and synonyms
+
+    Recognition picks the leftmost match on word boundaries and, among
+    matches starting there, the longest one, so "MCHC" is never read as "MCH"
+    and "Direct Bilirubin" wins over "Bilirubin".
+    """
+
+    def __init__(self, analytes: Dict[str, Dict]):
+        self.analytes = {}
+        self.automaton = AhoCorasick()
+
+        for key, entry in analytes.items():
+            if isinstance(entry, list):
+                entry = {'synonyms': entry}
+            entry = dict(entry or {})
+            entry.setdefault('name', key.replace('_', ' ').title())
+            synonyms = [key.replace('_', ' '), entry['name']] + list(entry.get('synonyms') or [])
+            entry['synonyms'] = sorted({normalize_term(term) for term in synonyms if term})
+            self.analytes[key] = entry
+            for term in entry['synonyms']:
+                self.automaton.add(term, key)
+
+        self.automaton.build()
+
+    @classmethod
+    def from_file(cls, path: str) -> 'AnalyteDictionary':
+        """Load a YAML mapping of canonical key -> {name, loinc, synonyms}"""
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(yaml.safe_load(file) or {})
+
+    def find(self, line: str) -> Optional[Tuple[int, int, str]]:
+        """
+        Find the analyte named in a line
+
+        Args:
+            line (str): Report line (matching is case-insensitive)
+
+        Returns:
+            tuple: (start, end, canonical key) of the leftmost-longest match, or None
+        """
+        text = line.lower()
+        best = None
+        for start, end, key in self.automaton.iter_matches(text):
+            if start and text[start - 1].isalnum():
+                continue
+            if end < len(text) and text[end].isalnum():
+                continue
+            if best is None or start < best[0] or (start == best[0] and end > best[1]):
+                best = (start, end, key)
+        return best
+
+    def classify(self, line: str) -> Optional[str]:
+        """Return the canonical key of the analyte named in a line"""
+        match = self.find(line)
+        return match[2] if match else None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.analytes
+
+    def __len__(self) -> int:
+        return len(self.analytes)
+
+
+def load_analyte_dictionary(path: Optional[str] = None) -> AnalyteDictionary:
+    """
+    Build the analyte dictionary from the configured data file
+
+    Entries under an `analytes` section of config.yaml are merged over the
+    file, so sites can add local aliases without editing the shared list.
+
+    Args:
+        path (str): YAML dictionary file (default: paths.analyte_dictionary)
+
+    Returns:
+        AnalyteDictionary: Compiled dictionary
+    """
+    path = Path(path) if path else resolve_path(
+        get_setting('paths', 'analyte_dictionary', 'data/analytes.yaml'))
+
+    analytes = {}
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as file:
+            analytes.update(yaml.safe_load(file) or {})
+    else:
+        logger.warning(f"Analyte dictionary not found: {path}")
+
+    analytes.update(load_config().get('analytes') or {})
+
+    dictionary = AnalyteDictionary(analytes)
+    logger.info(f"Loaded {len(dictionary)} analytes ({len(dictionary.automaton)} automaton states)")
+    return dictionary
+
+
+@lru_cache(maxsize=None)
+def _load_default(path: str) -> Optional[AnalyteDictionary]:
+    if not Path(path).exists():
+        logger.warning(f"Analyte dictionary not found: {path}; using the built-in test patterns")
+        return None
+    return load_analyte_dictionary(path)
+
+
+def default_analyte_dictionary() -> Optional[AnalyteDictionary]:
+    """
+    The dictionary at paths.analyte_dictionary, built once per process
+
+    Returns:
+        AnalyteDictionary: Compiled dictionary, or None if the file is missing
+    """
+    return _load_default(str(resolve_path(get_setting('paths', 'analyte_dictionary', 'data/analytes.yaml'))))
@@ -5,16 +5,63 @@ Extracts patient information, test names, values, and ranges from medical report
 
 import re
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .analyte_dictionary import default_analyte_dictionary
+from .line_parser import TestLineParser
+from ..utils.cache import settings_digest
+from ..utils.config import get_setting
+from ..utils.metrics import metrics
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump when a change alters extracted entities, so cached results are invalidated
+EXTRACTOR_VERSION = "1.2.0"
+
+# (field, pattern, transform) for each patient header field
+PATIENT_FIELDS = [
+    ('name', re.compile(r'patient\s+name[:\s]+([a-z\s]+)', re.IGNORECASE), lambda v: v.strip().title()),
+    ('id', re.compile(r'patient\s+id[:\s]+([a-z0-9]+)', re.IGNORECASE), lambda v: v.strip().upper()),
+    ('age', re.compile(r'age[:\s]+(\d+)', re.IGNORECASE), lambda v: v),
+    ('gender', re.compile(r'gender[:\s]+(male|female)', re.IGNORECASE), lambda v: v.capitalize()),
+    ('collection_date', re.compile(r'date\s+of\s+collection[:\s]+(\d{4}-\d{2}-\d{2})', re.IGNORECASE),
+     lambda v: v),
+    ('report_date', re.compile(r'report\s+date[:\s]+(\d{4}-\d{2}-\d{2})', re.IGNORECASE), lambda v: v),
+]
+
+# Lines containing any of these are table headers or rules, not results
+TABLE_HEADERS = ['test name', 'result', 'normal range', '===', '---']
+
+
+def iter_lines(chunks: Iterable) -> Iterator[str]:
+    """
+    Yield lines from a stream of text chunks
+    
+    Produces the same lines as `''.join(chunks).split('\\n')` while holding
+    at most one partial line in memory. Page dicts from
+    `PDFExtractor.iter_pages` are accepted as chunks.
+    """
+    carry = ''
+    for chunk in chunks:
+        if isinstance(chunk, dict):
+            chunk = chunk['text']
+        lines = (carry + chunk).split('\n')
+        carry = lines.pop()
+        yield from lines
+    yield carry
+
 
 class MedicalEntityExtractor:
-    """Extract medical entities from report text"""
+    """
+    Extract medical entities from report text
     
-    def __init__(self):
+    Tests are recognised with the analyte dictionary at
+    paths.analyte_dictionary, or with the one passed as `analytes`. The
+    built-in patterns below are used when that file is missing, or when
+    `analytes=False` is passed.
+    """
+    
+    def __init__(self, analytes=None):
         self.test_patterns = {
             'hemoglobin': r'hemoglobin|hb|hgb',
             'rbc': r'rbc\s+count|red\s+blood\s+cell',
@@ -31,113 +78,114 @@ class MedicalEntityExtractor:
             'mch': r'mch(?!\s*c)',
             'mchc': r'mchc',
         }
+        if analytes is None:
+            analytes = default_analyte_dictionary()
+        self.line_parser = TestLineParser(self.test_patterns, analytes or None)
+    
+    def settings_key(self) -> str:
+        """Digest of the patterns, analyte dictionary and settings behind the results, for caches"""
+        analytes = self.line_parser.analytes
+        return settings_digest([self.test_patterns, analytes.analytes if analytes is not None else None,
+                                get_setting('extraction', 'header_lines', 60)])
         
     def extract_patient_info(self, text):
         """Extract patient information from report"""
         patient_info = {}
         
-        name_match = re.search(r'patient\s+name[:\s]+([a-z\s]+)', text, re.IGNORECASE)
-        if name_match:
-            patient_info['name'] = name_match.group(1).strip().title()
-        
-        id_match = re.search(r'patient\s+id[:\s]+([a-z0-9]+)', text, re.IGNORECASE)
-        if id_match:
-            patient_info['id'] = id_match.group(1).strip().upper()
-        
-        age_match = re.search(r'age[:\s]+(\d+)', text, re.IGNORECASE)
-        if age_match:
-            patient_info['age'] = age_match.group(1)
-        
-        gender_match = re.search(r'gender[:\s]+(male|female)', text, re.IGNORECASE)
-        if gender_match:
-            patient_info['gender'] = gender_match.group(1).capitalize()
-        
-        date_match = re.search(r'date\s+of\s+collection[:\s]+(\d{4}-\d{2}-\d{2})', text, re.IGNORECASE)
-        if date_match:
-            patient_info['collection_date'] = date_match.group(1)
-            
-        report_date_match = re.search(r'report\s+date[:\s]+(\d{4}-\d{2}-\d{2})', text, re.IGNORECASE)
-        if report_date_match:
-            patient_info['report_date'] = report_date_match.group(1)
+        with metrics.timer('patient_info_seconds'):
+            for field, pattern, transform in PATIENT_FIELDS:
+                match = pattern.search(text)
+                if match:
+                    patient_info[field] = transform(match.group(1))
         
         return patient_info
     
     def extract_test_results(self, text):
         """Extract test results from report"""
-        test_results = []
-        lines = text.split('\n')
-        
-        for line in lines:
-            if not line.strip():
-                continue
-            if any(header in line.lower() for header in ['test name', 'result', 'normal range', '===', '---']):
-                continue
+        with metrics.timer('test_parse_seconds'):
+            return list(self.iter_test_results([text]))
+    
+    def iter_test_results(self, chunks: Iterable, patient_info: Optional[Dict] = None,
+                          header_lines: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Extract test results incrementally from a stream of pages or lines
+        
+        Chunks are joined exactly as `PDFExtractor.extract_text` joins pages,
+        so a line split across two pages is still parsed as one line. When a
+        `patient_info` dict is passed it is filled in place while the header
+        region is read; header fields are searched line by line and the search
+        stops once every field is found or `header_lines` lines have passed.
+        
+        Args:
+            chunks: Iterable of strings, or page dicts from `PDFExtractor.iter_pages`
+            patient_info (dict): Optional dict to receive patient header fields
+            header_lines (int): Lines to search for header fields
+                (default: extraction.header_lines from config.yaml)
             
-            test_data = self._parse_test_line(line)
-            if test_data:
-                test_results.append(test_data)
-        
-        return test_results
+        Yields:
+            dict: One parsed test result per matching line
+        """
+        if header_lines is None:
+            header_lines = get_setting('extraction', 'header_lines', 60)
+        pending_fields = list(PATIENT_FIELDS) if patient_info is not None else []
+        examined = matched = 0
+        
+        try:
+            for line_num, line in enumerate(iter_lines(chunks)):
+                if pending_fields:
+                    if line_num >= header_lines:
+                        pending_fields = []
+                    else:
+                        for entry in list(pending_fields):
+                            field, pattern, transform = entry
+                            match = pattern.search(line)
+                            if match:
+                                patient_info[field] = transform(match.group(1))
+                                pending_fields.remove(entry)
+                
+                if not line.strip():
+                    continue
+                lowered = line.lower()
+                if any(header in lowered for header in TABLE_HEADERS):
+                    continue
+                
+                examined += 1
+                test_data = self._parse_test_line(line)
+                if test_data:
+                    matched += 1
+                    yield test_data
+        finally:
+            # Counted once per report rather than per line
+            metrics.inc('test_lines_examined_total', examined)
+            metrics.inc('test_lines_matched_total', matched)
     
     def _parse_test_line(self, line):
         """Parse a single line to extract test information"""
-        line = ' '.join(line.split())
-        
-        if len(line) < 10:
-            return None
-        
-        test_name = None
-        for test_key, pattern in self.test_patterns.items():
-            if re.search(pattern, line, re.IGNORECASE):
-                name_match = re.match(r'^([a-z\s\(\)]+)', line, re.IGNORECASE)
-                if name_match:
-                    test_name = name_match.group(1).strip()
-                break
-        
-        if not test_name:
-            return None
-        
-        value_match = re.search(r'(\d+\.?\d*)\s+', line)
-        if not value_match:
-            return None
-        
-        value = float(value_match.group(1))
+        return self.line_parser.parse(line)
+    
+    def extract_all_stream(self, chunks: Iterable) -> Dict:
+        """
+        Extract all entities from a stream of pages or lines
+        
+        Same test results as `extract_all`, without joining the report into
+        one string. Patient fields differ in one way: they are searched line
+        by line and only within the first `extraction.header_lines` lines
+        (see `iter_test_results`). `extract_all` searches the whole text, so
+        it also finds a field printed further down, and its patterns can run
+        on past the end of a line.
+        """
+        logger.info("Extracting entities from medical report stream...")
         
-        range_match = re.search(r'(\d+\.?\d*)\s*-\s*(\d+\.?\d*)', line)
-        if range_match:
-            min_val = float(range_match.group(1))
-            max_val = float(range_match.group(2))
-            normal_range = f"{min_val} - {max_val}"
-        else:
-            less_match = re.search(r'less than\s+(\d+\.?\d*)', line, re.IGNORECASE)
-            greater_match = re.search(r'greater than\s+(\d+\.?\d*)', line, re.IGNORECASE)
-            
-            if less_match:
-                normal_range = f"< {less_match.group(1)}"
-                min_val = 0
-                max_val = float(less_match.group(1))
-            elif greater_match:
-                normal_range = f"> {greater_match.group(1)}"
-                min_val = float(greater_match.group(1))
-                max_val = float('inf')
-            else:
-                normal_range = "Not specified"
-                min_val = None
-                max_val = None
+        patient_info = {}
+        # Not timed: the chunks may be pages still being extracted
+        test_results = list(self.iter_test_results(chunks, patient_info))
         
-        unit_match = re.search(r'([a-z/%^]+)$', line, re.IGNORECASE)
-        if unit_match:
-            unit = unit_match.group(1)
-        else:
-            unit = ""
+        logger.info("Extracted %d test results", len(test_results))
         
         return {
-            'test_name': test_name,
-            'value': value,
-            'normal_range': normal_range,
-            'min_normal': min_val,
-            'max_normal': max_val,
-            'unit': unit
+            'patient_info': patient_info,
+            'test_results': test_results,
+            'total_tests': len(test_results)
         }
     
     def extract_all(self, text):
@@ -147,7 +195,7 @@ class MedicalEntityExtractor:
         patient_info = self.extract_patient_info(text)
         test_results = self.extract_test_results(text)
         
-        logger.info(f"Extracted {len(test_results)} test results")
+        logger.info("Extracted %d test results", len(test_results))
         
         return {
             'patient_info': patient_info,
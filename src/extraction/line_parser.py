@@ -0,0 +1,111 @@
+"""
+Test Line Parser Module
+Precompiled matcher that turns one report line into a test result
+"""
+
+import re
+from typing import Dict, Optional
+
+NAME_RE = re.compile(r'^([a-z\s\(\)]+)', re.IGNORECASE)
+VALUE_RE = re.compile(r'(\d+\.?\d*)\s+')
+RANGE_RE = re.compile(r'(\d+\.?\d*)\s*-\s*(\d+\.?\d*)')
+LESS_RE = re.compile(r'less than\s+(\d+\.?\d*)', re.IGNORECASE)
+GREATER_RE = re.compile(r'greater than\s+(\d+\.?\d*)', re.IGNORECASE)
+# A unit with its power-of-ten factor, e.g. "g/dL", "10^3/microL", "x10^9/L", "10³/µL"
+UNIT_RE = re.compile(r'((?:[x*×]?10(?:(?:\^|\*\*?|e)-?\d+|[⁰¹²³⁴⁵⁶⁷⁸⁹]+)\s*)?[a-zµμ/%^]+)$', re.IGNORECASE)
+
+
+class TestLineParser:
+    """
+    Parse test lines with patterns compiled once per extractor
+
+    All test patterns are combined into one alternation, so recognising the
+    test costs a single regex scan per line instead of one scan per pattern.
+    The value, range and unit patterns are compiled at import time, and the
+    "less than" / "greater than" patterns only run when the line contains
+    those words. Compared with matching each pattern separately, the test,
+    value and range are identical; each result also carries a `test_key`,
+    and the unit keeps its power-of-ten factor ("10^3/microL" rather than
+    "/microL").
+
+    When an `AnalyteDictionary` is given, tests are recognised with its
+    automaton instead of the regex patterns, which keeps the cost per line
+    independent of the number of analytes.
+    """
+
+    __test__ = False  # not a pytest test class
+
+    def __init__(self, test_patterns: Dict[str, str], analytes=None):
+        self.test_patterns = dict(test_patterns)
+        self.analytes = analytes
+        self.classifier = re.compile(
+            '|'.join(f'(?P<{key}>{pattern})' for key, pattern in self.test_patterns.items()),
+            re.IGNORECASE
+        )
+
+    def classify(self, line: str) -> Optional[str]:
+        """Return the canonical key of the test named in the line"""
+        if self.analytes is not None:
+            return self.analytes.classify(line)
+        match = self.classifier.search(line)
+        return match.lastgroup if match else None
+
+    def parse(self, line: str) -> Optional[Dict]:
+        """Parse a single line to extract test information"""
+        line = ' '.join(line.split())
+
+        if len(line) < 10:
+            return None
+
+        test_key = self.classify(line)
+        if test_key is None:
+            return None
+
+        name_match = NAME_RE.match(line)
+        if not name_match:
+            return None
+        test_name = name_match.group(1).strip()
+        if not test_name:
+            return None
+
+        value_match = VALUE_RE.search(line)
+        if not value_match:
+            return None
+
+        value = float(value_match.group(1))
+
+        range_match = RANGE_RE.search(line) if '-' in line else None
+        if range_match:
+            min_val = float(range_match.group(1))
+            max_val = float(range_match.group(2))
+            normal_range = f"{min_val} - {max_val}"
+        else:
+            lowered = line.lower()
+            less_match = LESS_RE.search(line) if 'less than' in lowered else None
+            greater_match = GREATER_RE.search(line) if 'greater than' in lowered else None
+
+            if less_match:
+                normal_range = f"< {less_match.group(1)}"
+                min_val = 0
+                max_val = float(less_match.group(1))
+            elif greater_match:
+                normal_range = f"> {greater_match.group(1)}"
+                min_val = float(greater_match.group(1))
+                max_val = float('inf')
+            else:
+                normal_range = "Not specified"
+                min_val = None
+                max_val = None
+
+        unit_match = UNIT_RE.search(line)
+        unit = unit_match.group(1) if unit_match else ""
+
+        return {
+            'test_name': test_name,
+            'value': value,
+            'normal_range': normal_range,
+            'min_normal': min_val,
+            'max_normal': max_val,
+            'unit': unit,
+            'test_key': test_key
+        }
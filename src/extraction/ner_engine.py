@@ -0,0 +1,299 @@
+"""
+NER Inference Engine
+Batched CPU token classification with the configured transformer model
+"""
+
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..utils.config import get_setting, resolve_path
+from ..utils.metrics import metrics
+from ..utils.model_store import ModelStore
+from ..utils.registry import backends
+
+logger = logging.getLogger(__name__)
+
+# Labels of the tiny offline model, in BIO form like a fine-tuned medical NER head
+TINY_LABELS = ['O', 'B-TEST', 'I-TEST', 'B-VALUE', 'I-VALUE', 'B-UNIT', 'I-UNIT']
+
+# (document index, token ids, token char offsets, token word ids, first and last content token)
+Window = Tuple[int, List[int], List[Tuple[int, int]], List[Optional[int]], int, int]
+
+
+class NEREngine:
+    """
+    Token-classification NER over long reports, batched for CPU inference
+
+    Each report is tokenized into windows of at most `max_length` tokens
+    that overlap by `stride` tokens, so nothing is truncated. Windows from
+    all reports in a call are sorted by length and packed into batches of
+    similar size, which keeps padding small; a batch holds at most
+    `batch_size` full-length windows' worth of tokens. Where windows
+    overlap, each token takes the prediction from the window in which it
+    has the most surrounding context.
+
+    The model is expected to be a token-classification checkpoint (a
+    BioBERT fine-tuned for NER, or one built with `build_tiny_model`); a
+    bare encoder gets a randomly initialised head and meaningless labels.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, max_length: Optional[int] = None,
+                 stride: Optional[int] = None, batch_size: Optional[int] = None,
+                 num_threads: Optional[int] = None, warmup: bool = True):
+        import torch
+        from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+        model_name = str(model_name or get_setting('models', 'ner_model'))
+
+        num_threads = num_threads or get_setting('models', 'num_threads')
+        if num_threads:
+            torch.set_num_threads(int(num_threads))
+
+        started = time.perf_counter()
+        store = ModelStore()
+        if model_name in store:
+            # Exported copy: offline, with memory-mapped weights
+            self.tokenizer, self.model = store.load(model_name, task='token-classification')
+        else:
+            # A local directory (relative to the project root) or a hub model id
+            if resolve_path(model_name).exists():
+                model_name = str(resolve_path(model_name))
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+            self.model = AutoModelForTokenClassification.from_pretrained(model_name)
+            self.model.eval()
+        self.torch = torch
+
+        model_max = getattr(self.model.config, 'max_position_embeddings', None) or 512
+        self.model_name = model_name
+        self.max_length = min(int(max_length or get_setting('models', 'max_length', 512)), model_max)
+        self.stride = int(stride if stride is not None else get_setting('models', 'ner_stride', 64))
+        self.stride = min(self.stride, self.max_length // 2)
+        self.batch_size = int(batch_size or get_setting('models', 'batch_size', 16))
+        self.max_batch_tokens = self.batch_size * self.max_length
+        self.id2label = {int(i): label for i, label in self.model.config.id2label.items()}
+
+        logger.info(f"Loaded NER model {model_name} in {time.perf_counter() - started:.2f}s "
+                    f"({torch.get_num_threads()} threads)")
+        if warmup:
+            self.predict(["warm up"])
+
+    def _windows(self, texts: Sequence[str]) -> List[Window]:
+        """Tokenize all texts into overlapping windows"""
+        encoded = self.tokenizer(
+            list(texts),
+            max_length=self.max_length,
+            stride=self.stride,
+            truncation=True,
+            return_overflowing_tokens=True,
+            return_offsets_mapping=True,
+            return_special_tokens_mask=True,
+        )
+
+        windows = []
+        for i, input_ids in enumerate(encoded['input_ids']):
+            content = [j for j, special in enumerate(encoded['special_tokens_mask'][i]) if not special]
+            if not content:
+                continue
+            windows.append((
+                encoded['overflow_to_sample_mapping'][i],
+                input_ids,
+                [tuple(offset) for offset in encoded['offset_mapping'][i]],
+                encoded.word_ids(i),
+                content[0],
+                content[-1],
+            ))
+        return windows
+
+    def _batches(self, windows: List[Window]) -> Iterable[List[Window]]:
+        """Group windows by length so each batch is padded as little as possible"""
+        batch: List[Window] = []
+        for window in sorted(windows, key=lambda window: len(window[1])):
+            # Sorted ascending, so this window is the longest in the batch
+            if batch and (len(batch) + 1) * len(window[1]) > self.max_batch_tokens:
+                yield batch
+                batch = []
+            batch.append(window)
+        if batch:
+            yield batch
+
+    def _infer(self, batch: List[Window]):
+        """Run the model on one batch; returns (label ids, scores) per window"""
+        torch = self.torch
+        width = max(len(window[1]) for window in batch)
+        pad_id = self.tokenizer.pad_token_id or 0
+
+        input_ids = torch.full((len(batch), width), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+        for row, window in enumerate(batch):
+            input_ids[row, :len(window[1])] = torch.tensor(window[1], dtype=torch.long)
+            attention_mask[row, :len(window[1])] = 1
+
+        with torch.inference_mode():
+            logits = self.model(input_ids=input_ids, attention_mask=attention_mask).logits
+            scores, labels = torch.softmax(logits, dim=-1).max(dim=-1)
+        return labels.tolist(), scores.tolist()
+
+    def _group(self, text: str, tokens: List[Tuple[int, int, int, float, Optional[int]]]) -> List[Dict]:
+        """
+        Merge BIO-tagged tokens (start, end, label id, score, word id) into entity spans
+
+        A word is labelled by its first sub-word token; the rest of the word
+        follows it whatever their own labels.
+        """
+        entities: List[Dict] = []
+        current = None
+        previous_word = None
+        for start, end, label_id, score, word in tokens:
+            label = self.id2label.get(label_id, 'O')
+            prefix, _, group = label.partition('-') if '-' in label else ('', '', label)
+
+            if word is not None and word == previous_word:
+                if current is not None:
+                    current['end'] = end
+                    current['scores'].append(score)
+            elif label != 'O' and prefix == 'I' and current is not None and current['entity_group'] == group:
+                current['end'] = end
+                current['scores'].append(score)
+            elif label != 'O':
+                current = {'entity_group': group, 'start': start, 'end': end, 'scores': [score]}
+                entities.append(current)
+            else:
+                current = None
+            previous_word = word
+
+        for entity in entities:
+            scores = entity.pop('scores')
+            entity['score'] = sum(scores) / len(scores)
+            entity['text'] = text[entity['start']:entity['end']]
+        return entities
+
+    def predict(self, texts: Sequence[str]) -> List[List[Dict]]:
+        """
+        Tag entities in many reports at once
+
+        Args:
+            texts: Report texts of any length
+
+        Returns:
+            list: Per report, entities as {'entity_group', 'start', 'end', 'score', 'text'}
+            with character offsets into that report's text
+        """
+        with metrics.timer('ner_tokenize_seconds'):
+            windows = self._windows(texts)
+        metrics.inc('ner_texts_total', len(texts))
+        metrics.inc('ner_windows_total', len(windows))
+        # Per document: (start, end) -> (context, label id, score, word id)
+        tokens: List[Dict[Tuple[int, int], Tuple[int, int, float, Optional[int]]]] = [{} for _ in texts]
+
+        for batch in self._batches(windows):
+            with metrics.timer('ner_batch_seconds'):
+                labels, scores = self._infer(batch)
+            for (doc, _, offsets, words, first, last), window_labels, window_scores in zip(batch, labels, scores):
+                best = tokens[doc]
+                for j in range(first, last + 1):
+                    span = offsets[j]
+                    context = min(j - first, last - j)
+                    if span not in best or best[span][0] < context:
+                        best[span] = (context, window_labels[j], window_scores[j], words[j])
+
+        return [
+            self._group(text, [(start, end, label, score, word)
+                               for (start, end), (_, label, score, word) in sorted(doc_tokens.items())])
+            for text, doc_tokens in zip(texts, tokens)
+        ]
+
+    def predict_one(self, text: str) -> List[Dict]:
+        return self.predict([text])[0]
+
+
+backends.register('ner.transformers', NEREngine, requires=('torch', 'transformers'))
+
+
+def get_ner_engine(model_name: Optional[str] = None, **options) -> NEREngine:
+    """
+    Process-wide NER engine, loaded and warmed up on first use
+
+    Later calls with the same arguments return the same instance, so a
+    service or worker process pays the model load once.
+    """
+    return backends.get('ner.transformers', model_name=model_name, **options)
+
+
+def build_tiny_model(output_dir, labels: Optional[List[str]] = None, vocab: Optional[Iterable[str]] = None,
+                     seed: int = 0) -> Path:
+    """
+    Build a tiny, randomly initialised BERT token classifier for offline use
+
+    The model has the same interface as a real NER checkpoint but only a few
+    thousand parameters, so the engine can be exercised without downloading
+    anything. Its predictions are meaningless.
+
+    Args:
+        output_dir: Directory to save the model and tokenizer to
+        labels: BIO labels (default: TINY_LABELS)
+        vocab: Extra whole-word tokens; characters are always included
+        seed (int): Seed for the random weights
+
+    Returns:
+        Path: The output directory, loadable with `NEREngine(model_name=...)`
+    """
+    import string
+
+    import torch
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import BertConfig, BertForTokenClassification, PreTrainedTokenizerFast
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    labels = labels or TINY_LABELS
+
+    specials = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]']
+    characters = list(string.ascii_lowercase + string.digits + string.punctuation)
+    words = sorted(set(vocab or ['hemoglobin', 'glucose', 'cholesterol', 'mg', 'dl', 'patient']))
+    tokens = specials + characters + ['##' + char for char in characters] + words
+    token_ids = {token: i for i, token in enumerate(dict.fromkeys(tokens))}
+
+    backend = Tokenizer(models.WordPiece(token_ids, unk_token='[UNK]'))
+    backend.normalizer = normalizers.BertNormalizer(lowercase=True)
+    backend.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    backend.post_processor = processors.TemplateProcessing(
+        single='[CLS] $A [SEP]',
+        pair='[CLS] $A [SEP] $B:1 [SEP]:1',
+        special_tokens=[('[CLS]', token_ids['[CLS]']), ('[SEP]', token_ids['[SEP]'])],
+    )
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, unk_token='[UNK]', pad_token='[PAD]', cls_token='[CLS]',
+        sep_token='[SEP]', mask_token='[MASK]', model_max_length=512,
+    )
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(token_ids), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=512,
+        id2label=dict(enumerate(labels)), label2id={label: i for i, label in enumerate(labels)},
+    )
+    BertForTokenClassification(config).save_pretrained(output_dir)
+    tokenizer.save_pretrained(output_dir)
+    return output_dir
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    from ..utils.logging_config import setup_logging
+
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description="Tag entities in text with the NER engine")
+    parser.add_argument('text', nargs='?', default="Hemoglobin 13.5 g/dL 12.0 - 16.0\nGlucose 95 mg/dL")
+    parser.add_argument('--model', help="Model directory or hub id (default: models.ner_model)")
+    parser.add_argument('--tiny', action='store_true', help="Use a tiny offline model with random weights")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = str(build_tiny_model(tmp)) if args.tiny else args.model
+        for entity in get_ner_engine(model).predict_one(args.text):
+            print(f"{entity['entity_group']:<8} {entity['score']:.2f}  {entity['text']}")
@@ -0,0 +1,196 @@
+"""
+Test Result Containers
+Compact row and columnar representations of extracted test results
+"""
+
+import math
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+# Fields of a test result dict, in the order `_parse_test_line` produces them
+FIELDS = ('test_name', 'value', 'normal_range', 'min_normal', 'max_normal', 'unit', 'test_key')
+
+
+@dataclass
+class TestResult:
+    """A single extracted test result without a per-row __dict__"""
+
+    __slots__ = FIELDS
+    __test__ = False  # not a pytest test class
+
+    test_name: str
+    value: float
+    normal_range: str
+    min_normal: Optional[float]
+    max_normal: Optional[float]
+    unit: str
+    test_key: Optional[str]
+
+    @classmethod
+    def from_dict(cls, result: Dict) -> 'TestResult':
+        return cls(*(result.get(field) for field in FIELDS))
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in FIELDS}
+
+
+class _Categories:
+    """
+    Interned string column: one code per row plus the list of distinct values
+
+    None is stored as code -1, which pandas also reads as a missing value.
+    """
+
+    __slots__ = ('values', 'index', 'codes')
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.codes = array('i')
+
+    def append(self, value: Optional[str]) -> None:
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, row: int) -> Optional[str]:
+        code = self.codes[row]
+        return None if code < 0 else self.values[code]
+
+
+def _to_float(value: Optional[float]) -> float:
+    return math.nan if value is None else float(value)
+
+
+def _from_float(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+
+class ResultBatch:
+    """
+    Columnar, array-backed store of many test results
+
+    Strings (test names, canonical keys, units, printed ranges) are stored
+    once per distinct value with an integer code per row; values and bounds
+    live in float64 arrays with NaN for "no bound". A row costs a few dozen
+    bytes instead of a seven-key dict, and the numeric columns can be
+    exposed to NumPy and pandas as views without copying.
+    """
+
+    def __init__(self):
+        self.report = array('q')
+        self.value = array('d')
+        self.min_normal = array('d')
+        self.max_normal = array('d')
+        self.test_name = _Categories()
+        self.test_key = _Categories()
+        self.unit = _Categories()
+        self.normal_range = _Categories()
+
+    def append(self, result: Union[Dict, TestResult], report: int = 0) -> None:
+        """Add one result (dict or TestResult) belonging to report number `report`"""
+        if isinstance(result, TestResult):
+            result = result.to_dict()
+        self.report.append(report)
+        self.value.append(float(result['value']))
+        self.min_normal.append(_to_float(result.get('min_normal')))
+        self.max_normal.append(_to_float(result.get('max_normal')))
+        self.test_name.append(result.get('test_name'))
+        self.test_key.append(result.get('test_key'))
+        self.unit.append(result.get('unit'))
+        self.normal_range.append(result.get('normal_range'))
+
+    def extend(self, results: Iterable[Union[Dict, TestResult]], report: int = 0) -> None:
+        for result in results:
+            self.append(result, report)
+
+    @classmethod
+    def from_reports(cls, reports: Iterable[Union[Dict, List]]) -> 'ResultBatch':
+        """
+        Build a batch from `extract_all` outputs or plain result lists
+
+        Each report gets a report number equal to its position in `reports`.
+        """
+        batch = cls()
+        for report, results in enumerate(reports):
+            if isinstance(results, dict):
+                results = results['test_results']
+            batch.extend(results, report)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    def row(self, index: int) -> TestResult:
+        """Materialize one row as a TestResult"""
+        return TestResult(
+            self.test_name[index],
+            self.value[index],
+            self.normal_range[index],
+            _from_float(self.min_normal[index]),
+            _from_float(self.max_normal[index]),
+            self.unit[index],
+            self.test_key[index],
+        )
+
+    def __iter__(self) -> Iterator[TestResult]:
+        return (self.row(index) for index in range(len(self)))
+
+    def to_dicts(self, report: Optional[int] = None) -> List[Dict]:
+        """Convert back to the list-of-dicts format, optionally for one report only"""
+        return [
+            self.row(index).to_dict()
+            for index in range(len(self))
+            if report is None or self.report[index] == report
+        ]
+
+    def columns(self) -> Dict:
+        """
+        NumPy views of the numeric and code columns (no copies)
+
+        Returns:
+            dict: 'report', 'value', 'min_normal', 'max_normal' and '<column>_code'
+            arrays (-1 for None), plus '<column>_categories' lists for the string columns
+        """
+        import numpy as np
+
+        columns = {
+            'report': np.frombuffer(self.report, dtype=np.int64),
+            'value': np.frombuffer(self.value, dtype=np.float64),
+            'min_normal': np.frombuffer(self.min_normal, dtype=np.float64),
+            'max_normal': np.frombuffer(self.max_normal, dtype=np.float64),
+        }
+        for name in ('test_name', 'test_key', 'unit', 'normal_range'):
+            categories = getattr(self, name)
+            columns[f'{name}_code'] = np.frombuffer(categories.codes, dtype=np.int32)
+            columns[f'{name}_categories'] = categories.values
+        return columns
+
+    def to_pandas(self):
+        """
+        Build a pandas DataFrame over the batch
+
+        Numeric columns are views of the batch's buffers, not copies; string
+        columns become pandas Categoricals from the stored codes. While the
+        DataFrame (or any array from `columns`) is alive the buffers are
+        exported, and appending to the batch raises BufferError.
+        """
+        import pandas as pd
+
+        columns = self.columns()
+        data = {
+            'report': columns['report'],
+            'value': columns['value'],
+            'min_normal': columns['min_normal'],
+            'max_normal': columns['max_normal'],
+        }
+        for name in ('test_name', 'test_key', 'unit', 'normal_range'):
+            data[name] = pd.Categorical.from_codes(columns[f'{name}_code'],
+                                                   columns[f'{name}_categories'])
+        return pd.DataFrame(data, copy=False)
@@ -0,0 +1,205 @@
+"""
+Batch PDF Extraction Module
+Spreads PDF text extraction across a process pool
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .pdf_extractor import PDFExtractor
+from ..utils.config import get_setting
+from ..utils.logging_config import correlation
+
+logger = logging.getLogger(__name__)
+
+
+def _error_record(pdf_path: str, error: str, elapsed: float = 0.0) -> Dict:
+    return {'path': pdf_path, 'status': 'error', 'error': error, 'result': None, 'elapsed': elapsed}
+
+
+def _extract_range(pdf_path: str, start_page: int = 0, end_page: Optional[int] = None) -> Dict:
+    """Worker: extract a whole file or one page range of it"""
+    started = time.perf_counter()
+    extractor = PDFExtractor()
+    path = Path(pdf_path)
+
+    error = extractor._path_error(path)
+    if error:
+        return _error_record(pdf_path, error)
+
+    try:
+        with correlation(path.name):
+            result = extractor._extract_document(path, path.name, start_page, end_page)
+    except Exception as e:
+        return _error_record(pdf_path, f"{type(e).__name__}: {e}", time.perf_counter() - started)
+
+    return {
+        'path': pdf_path,
+        'status': 'ok',
+        'error': None,
+        'result': result,
+        'start_page': start_page,
+        'elapsed': time.perf_counter() - started,
+    }
+
+
+def _finish(record: Dict) -> Dict:
+    """Turn an empty extraction into an error record, as extract_text does"""
+    if record['status'] == 'ok' and not record['result']['text'].strip():
+        return _error_record(record['path'], "No text extracted", record['elapsed'])
+    return record
+
+
+def _merge_ranges(pdf_path: str, parts: List[Dict]) -> Dict:
+    """Combine the page-range records of one file into a single file record"""
+    elapsed = sum(part['elapsed'] for part in parts)
+    failed = [part for part in parts if part['status'] != 'ok']
+    if failed:
+        return _error_record(pdf_path, failed[0]['error'], elapsed)
+
+    parts = sorted(parts, key=lambda part: part['start_page'])
+    result = dict(parts[0]['result'])
+    text = "".join(part['result']['text'] for part in parts)
+    pages, offset = [], 0
+    for part in parts:
+        for page in part['result'].get('pages', ()):
+            pages.append(dict(page, start_offset=page['start_offset'] + offset,
+                              end_offset=page['end_offset'] + offset))
+        offset += len(part['result']['text'])
+    result.update(text=text, char_count=len(text), word_count=len(text.split()), pages=pages)
+
+    return _finish({'path': pdf_path, 'status': 'ok', 'error': None, 'result': result, 'elapsed': elapsed})
+
+
+def _plan_tasks(pdf_paths: Iterable[str], page_chunk_size: int, extractor: PDFExtractor):
+    """Yield (path, start_page, end_page, n_parts) work items"""
+    for pdf_path in pdf_paths:
+        pdf_path = str(pdf_path)
+        if page_chunk_size <= 0:
+            yield pdf_path, 0, None, 1
+            continue
+
+        info = extractor.probe(pdf_path)
+        num_pages = info['num_pages'] if info else 0
+        if num_pages <= page_chunk_size:
+            yield pdf_path, 0, None, 1
+            continue
+
+        starts = range(0, num_pages, page_chunk_size)
+        for start in starts:
+            yield pdf_path, start, start + page_chunk_size, len(starts)
+
+
+def extract_many(pdf_paths: Iterable[str], max_workers: Optional[int] = None,
+                 max_in_flight: Optional[int] = None,
+                 page_chunk_size: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Extract text from many PDFs on a process pool
+
+    Files are yielded as soon as they finish, so the output order is the
+    completion order, not the input order. Failures are reported as records
+    with status "error" and an error message instead of None.
+
+    Args:
+        pdf_paths: Paths of the PDF files to process (may be a lazy iterable)
+        max_workers (int): Worker processes (default: processing.workers from config.yaml,
+            or one per CPU core)
+        max_in_flight (int): Maximum tasks submitted but not yet collected; bounds memory
+            (default: processing.max_in_flight)
+        page_chunk_size (int): Split files with more pages than this into page ranges
+            handled by different workers; 0 disables splitting
+            (default: processing.page_chunk_size)
+
+    Yields:
+        dict: {'path', 'status', 'error', 'result', 'elapsed'} where result has the
+        same shape as `PDFExtractor.extract_with_metadata`
+    """
+    max_workers = max_workers or get_setting('processing', 'workers') or os.cpu_count() or 1
+    max_in_flight = max(max_in_flight or get_setting('processing', 'max_in_flight', 4 * max_workers), 1)
+    if page_chunk_size is None:
+        page_chunk_size = get_setting('processing', 'page_chunk_size', 0)
+
+    tasks = _plan_tasks(pdf_paths, page_chunk_size, PDFExtractor())
+    pending: Dict[Future, tuple] = {}
+    partial: Dict[str, List[Dict]] = {}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                task = next(tasks, None)
+                if task is None:
+                    exhausted = True
+                    break
+                pdf_path, start_page, end_page, n_parts = task
+                future = pool.submit(_extract_range, pdf_path, start_page, end_page)
+                pending[future] = (pdf_path, n_parts)
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pdf_path, n_parts = pending.pop(future)
+                try:
+                    record = future.result()
+                except Exception as e:
+                    record = _error_record(pdf_path, f"{type(e).__name__}: {e}")
+                    record['start_page'] = 0
+
+                if n_parts == 1:
+                    yield _finish(record)
+                    continue
+
+                parts = partial.setdefault(pdf_path, [])
+                parts.append(record)
+                if len(parts) == n_parts:
+                    yield _merge_ranges(pdf_path, partial.pop(pdf_path))
+
+
+def _expand_inputs(inputs: Iterable[str]) -> Iterator[str]:
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            yield from (str(p) for p in sorted(path.rglob('*.pdf')))
+        else:
+            yield str(path)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m src.preprocessing.batch data/raw/"""
+    parser = argparse.ArgumentParser(description="Extract text from many PDF reports in parallel")
+    parser.add_argument('inputs', nargs='+', help="PDF files or directories to scan for *.pdf")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes")
+    parser.add_argument('--max-in-flight', type=int, default=None, help="Maximum pending tasks")
+    parser.add_argument('--page-chunk-size', type=int, default=None,
+                        help="Split larger PDFs into page ranges of this size (0 = never)")
+    parser.add_argument('--output', '-o', default=None, help="JSONL output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    failures = 0
+    try:
+        for record in extract_many(_expand_inputs(args.inputs), args.workers,
+                                   args.max_in_flight, args.page_chunk_size):
+            failures += record['status'] != 'ok'
+            out.write(json.dumps(record) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    from ..utils.logging_config import setup_logging
+
+    setup_logging()
+    sys.exit(main())
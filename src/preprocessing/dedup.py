@@ -0,0 +1,349 @@
+"""
+Near-Duplicate Detection Module
+MinHash fingerprints of report text with an in-memory LSH index
+"""
+
+import hashlib
+import logging
+import re
+import zlib
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from ..utils.config import get_setting
+
+logger = logging.getLogger(__name__)
+
+# Odd 64-bit multipliers combining the token hashes of a shingle
+_SHINGLE_MULTIPLIERS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+                        0xD6E8FEB86659FD93, 0xFF51AFD7ED558CCD)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+(?:[./][a-z0-9]+)*')
+
+
+def normalize_text(text: str) -> List[str]:
+    """
+    Lowercased word tokens of a report
+
+    Punctuation, spacing and line breaks are dropped, so the same report
+    re-exported with different layout or metadata yields the same tokens,
+    while numbers such as "13.5" and units such as "mg/dl" stay intact.
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+
+def text_digest(text: str) -> str:
+    """SHA-256 of the normalized text: equal for reports that differ only in layout"""
+    return hashlib.sha256(' '.join(normalize_text(text)).encode()).hexdigest()
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles
+
+    The similarity of two signatures (the fraction of equal positions)
+    estimates the Jaccard similarity of the two texts' shingle sets.
+    Tokens are hashed with CRC-32 rather than Python's salted `hash`, so
+    signatures are stable across processes and runs. Each distinct token
+    is hashed once; shingle hashes and the `num_perm` multiply-shift hash
+    functions are then computed in bulk with NumPy.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 1):
+        import numpy as np
+
+        if not 1 <= shingle_size <= len(_SHINGLE_MULTIPLIERS):
+            raise ValueError(f"shingle_size must be between 1 and {len(_SHINGLE_MULTIPLIERS)}")
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # (a * x + b) mod 2^64, top 32 bits: a random hash function per position
+        # (a odd), with uint64 arithmetic wrapping instead of a costly modulo
+        self._a = rng.randint(0, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.randint(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+        self._multipliers = np.array(_SHINGLE_MULTIPLIERS[:shingle_size], dtype=np.uint64)
+        self._np = np
+
+    @classmethod
+    def from_config(cls) -> 'MinHasher':
+        """Hasher with the `dedup` settings of config.yaml, as `NearDuplicateDetector` uses by default"""
+        return cls(int(get_setting('dedup', 'num_perm', 128)), int(get_setting('dedup', 'shingle_size', 3)))
+
+    def shingles(self, text: str):
+        """
+        32-bit hashes of the text's distinct overlapping word n-grams
+
+        Returns:
+            np.ndarray: Sorted unique uint64 values below 2^32
+        """
+        np = self._np
+        tokens = normalize_text(text)
+        if not tokens:
+            return np.empty(0, dtype=np.uint64)
+
+        # CRC-32 of each distinct token once; map and dict lookups stay in C
+        distinct = dict.fromkeys(tokens)
+        for token in distinct:
+            distinct[token] = zlib.crc32(token.encode())
+        hashes = np.fromiter(map(distinct.__getitem__, tokens), dtype=np.uint64, count=len(tokens))
+
+        k = min(self.shingle_size, len(hashes))
+        count = len(hashes) - k + 1
+        combined = np.zeros(count, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for offset in range(k):
+                combined += hashes[offset:offset + count] * self._multipliers[offset]
+        return np.unique(combined >> np.uint64(32))
+
+    def signature(self, text: str):
+        """
+        MinHash signature of a text
+
+        Returns:
+            np.ndarray: uint32 array of length num_perm (all max values for empty text)
+        """
+        np = self._np
+        values = self.shingles(text)
+        if not len(values):
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+        # In blocks of shingles, so the intermediate matrix stays in cache
+        minimum = np.full(self.num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+        block = np.empty((min(len(values), 512), self.num_perm), dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            for start in range(0, len(values), 512):
+                chunk = values[start:start + 512]
+                out = block[:len(chunk)]
+                np.multiply(chunk[:, None], self._a, out=out)
+                out += self._b
+                np.minimum(minimum, out.min(axis=0), out=minimum)
+        return (minimum >> np.uint64(32)).astype(np.uint32)
+
+    @staticmethod
+    def similarity(first, second) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        return float((first == second).mean())
+
+
+class LSHIndex:
+    """
+    Banded locality-sensitive hashing over MinHash signatures
+
+    Each signature is cut into `bands` bands; two reports become
+    candidates when any band matches exactly, which happens with high
+    probability above a similarity of roughly (1 / bands) ** (1 / rows).
+    Candidates are then checked against the full signature.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.signatures: Dict[Hashable, object] = {}
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [{} for _ in range(bands)]
+
+    def _band_keys(self, signature) -> Iterable[Tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: Hashable, signature) -> None:
+        if key in self.signatures:
+            self.remove(key)
+        self.signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def remove(self, key: Hashable) -> None:
+        signature = self.signatures.pop(key)
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band][band_key]
+            bucket.remove(key)
+            if not bucket:
+                del self._buckets[band][band_key]
+
+    def query(self, signature, threshold: float = 0.0) -> List[Tuple[Hashable, float]]:
+        """
+        Indexed reports similar to a signature
+
+        Returns:
+            list: (key, estimated similarity) at or above `threshold`, most similar first
+        """
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+
+        matches = [(key, MinHasher.similarity(signature, self.signatures[key])) for key in candidates]
+        return sorted((match for match in matches if match[1] >= threshold),
+                      key=lambda match: match[1], reverse=True)
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.signatures
+
+
+def diff_entities(previous: Dict, current: Dict) -> Dict:
+    """
+    Compare two `MedicalEntityExtractor.extract_all` results
+
+    Test rows are matched by canonical key (or printed name when there is
+    none) and occurrence, so a test reported twice is compared row by row:
+    the first Hemoglobin row with the first, the second with the second.
+
+    Returns:
+        dict: 'patient_info' {field: (old, new)}, 'changed' {(test, occurrence): (old value, new value)},
+        'added' and 'removed' lists of (test, occurrence), occurrences counted from 1
+    """
+    def by_row(entities):
+        rows, seen = {}, {}
+        for result in entities.get('test_results') or ():
+            test = result.get('test_key') or result['test_name']
+            seen[test] = seen.get(test, 0) + 1
+            rows[(test, seen[test])] = result
+        return rows
+
+    old_info, new_info = previous.get('patient_info') or {}, current.get('patient_info') or {}
+    old_rows, new_rows = by_row(previous), by_row(current)
+    return {
+        'patient_info': {field: (old_info.get(field), new_info.get(field))
+                         for field in sorted(set(old_info) | set(new_info))
+                         if old_info.get(field) != new_info.get(field)},
+        'changed': {row: (old_rows[row]['value'], new_rows[row]['value'])
+                    for row in sorted(old_rows.keys() & new_rows.keys())
+                    if old_rows[row]['value'] != new_rows[row]['value']},
+        'added': sorted(new_rows.keys() - old_rows.keys()),
+        'removed': sorted(old_rows.keys() - new_rows.keys()),
+    }
+
+
+def fingerprint(text: str, hasher: MinHasher) -> Optional[Tuple[str, object]]:
+    """
+    What `NearDuplicateDetector.check` needs to know about a report
+
+    Computed where the text is, e.g. in the worker that extracted it, so
+    only the fingerprint travels to the process holding the index.
+
+    Returns:
+        tuple: (`text_digest`, MinHash signature), or None for a report without text
+    """
+    if not text.strip():
+        return None
+    return text_digest(text), hasher.signature(text)
+
+
+class NearDuplicateDetector:
+    """
+    Recognise reports that were seen before, even when not byte-identical
+
+    Reports whose normalized text is identical to an earlier one (such as
+    a re-export with new PDF metadata) are duplicates, and the earlier
+    result can be reused as is. Reports whose MinHash similarity to an
+    earlier one reaches `threshold` (re-scans, a corrected value) are
+    near-duplicates, whose new result is diffed against the earlier one.
+    Settings default to the `dedup` section of config.yaml.
+
+    `process` runs in one place from text to result. Pipelines that
+    extract in worker processes send each report's `fingerprint` back
+    and call `check` instead.
+    """
+
+    def __init__(self, threshold: Optional[float] = None, num_perm: Optional[int] = None,
+                 bands: Optional[int] = None, shingle_size: Optional[int] = None):
+        num_perm = int(num_perm or get_setting('dedup', 'num_perm', 128))
+        self.hasher = MinHasher(num_perm, int(shingle_size or get_setting('dedup', 'shingle_size', 3)))
+        self.index = LSHIndex(num_perm, int(bands or get_setting('dedup', 'bands', 16)))
+        self.threshold = float(threshold if threshold is not None
+                               else get_setting('dedup', 'threshold', 0.8))
+        self.digests: Dict[str, Hashable] = {}
+        self.results: Dict[Hashable, Dict] = {}
+
+    def _match(self, signature, key: Optional[Hashable] = None) -> Optional[Tuple[Hashable, float]]:
+        matches = self.index.query(signature, self.threshold)
+        return next(((k, similarity) for k, similarity in matches if k != key), None)
+
+    def find(self, text: str) -> Optional[Tuple[Hashable, float]]:
+        """The most similar earlier report at or above the threshold, as (key, similarity)"""
+        duplicate = self.digests.get(text_digest(text))
+        if duplicate is not None:
+            return duplicate, 1.0
+        return self._match(self.hasher.signature(text))
+
+    def add(self, key: Hashable, text: str, result: Optional[Dict] = None) -> None:
+        """Index a report's text, with its extraction result for later reuse or diffing"""
+        if text.strip():
+            self._add(key, text_digest(text), self.hasher.signature(text), result)
+
+    def _add(self, key: Hashable, digest: str, signature, result: Optional[Dict]) -> None:
+        self.digests.setdefault(digest, key)
+        self.index.add(key, signature)
+        if result is not None:
+            self.results[key] = result
+
+    def check(self, key: Hashable, report_fingerprint: Optional[Tuple[str, object]],
+              result: Optional[Dict] = None) -> Dict:
+        """
+        Classify an already extracted report by its `fingerprint`, then index it
+
+        Args:
+            key: Identifier of this report (e.g. its path)
+            report_fingerprint: `fingerprint(text, hasher)` with this detector's
+                settings (see `MinHasher.from_config`); None for a report without text
+            result (dict): Its entity result, kept for diffing later near-duplicates;
+                omit it to keep only the fingerprint in memory
+
+        Returns:
+            dict: 'status' ("new", "duplicate" or "near_duplicate"), 'duplicate_of',
+            'similarity', and 'diff' from `diff_entities` when the earlier
+            result and `result` are both known
+        """
+        outcome = {'status': 'new', 'duplicate_of': None, 'similarity': None}
+        if report_fingerprint is None:
+            return outcome
+        digest, signature = report_fingerprint
+
+        duplicate = self.digests.get(digest)
+        if duplicate is not None and duplicate != key:
+            outcome.update(status='duplicate', duplicate_of=duplicate, similarity=1.0)
+        else:
+            match = self._match(signature, key)
+            if match is not None:
+                outcome.update(status='near_duplicate', duplicate_of=match[0], similarity=match[1])
+        if outcome['duplicate_of'] in self.results and result is not None:
+            outcome['diff'] = diff_entities(self.results[outcome['duplicate_of']], result)
+
+        self._add(key, digest, signature, result)
+        return outcome
+
+    def process(self, key: Hashable, text: str, extract: Callable[[str], Dict]) -> Dict:
+        """
+        Check a report, running `extract` only when its earlier result can't be reused
+
+        Args:
+            key: Identifier of this report (e.g. content hash or filename)
+            text (str): Report text from `PDFExtractor.extract_text`
+            extract: Produces the entity result for a text, e.g. `MedicalEntityExtractor().extract_all`
+
+        Returns:
+            dict: 'status' ("new", "duplicate" or "near_duplicate"), 'duplicate_of',
+            'similarity', 'result', and for near-duplicates 'diff' from `diff_entities`
+        """
+        duplicate = self.digests.get(text_digest(text))
+        if duplicate is not None and duplicate != key and duplicate in self.results:
+            logger.info("%s duplicates %s, reusing its result", key, duplicate)
+            return {'status': 'duplicate', 'duplicate_of': duplicate, 'similarity': 1.0,
+                    'result': self.results[duplicate]}
+
+        signature = self.hasher.signature(text)
+        match = self._match(signature, key) if text.strip() else None
+
+        result = extract(text)
+        outcome = {'status': 'new', 'duplicate_of': None, 'similarity': None, 'result': result}
+        if match is not None:
+            outcome.update(status='near_duplicate', duplicate_of=match[0], similarity=match[1])
+            if match[0] in self.results:
+                outcome['diff'] = diff_entities(self.results[match[0]], result)
+
+        if text.strip():
+            self._add(key, text_digest(text), signature, result)
+        return outcome
@@ -0,0 +1,312 @@
+"""
+OCR Fallback Module
+Recovers text from scanned pages and images that have no usable text layer
+"""
+
+import functools
+import importlib.util
+import io
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ..utils.config import get_setting
+from ..utils.metrics import metrics
+from ..utils.registry import backends
+
+logger = logging.getLogger(__name__)
+
+# Rasterizing above this resolution costs memory and time without helping OCR
+MAX_DPI = 300
+DEFAULT_DPI = 200
+
+# Text layers made of glyph ids or replacement characters are not real text
+_GARBAGE_RE = re.compile(r'\(cid:\d+\)|[�\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# What the OCR backends need to read one page: (pdf path, page index), or
+# (single-page PDF bytes, 0) for documents that only exist in memory
+PagePayload = Tuple[Union[str, bytes], int]
+
+ENGINE_ALIASES = {'easyocr': 'easyocr', 'tesseract': 'tesseract', 'pytesseract': 'tesseract'}
+
+
+def needs_ocr(text: Optional[str], min_chars: int = 20, min_printable_ratio: float = 0.8) -> bool:
+    """
+    Decide whether a page's text layer is missing or unusable
+
+    A page needs OCR when it has fewer than `min_chars` non-space characters,
+    or when too few of its characters are letters, digits, punctuation or
+    spaces, which is what broken font encodings produce.
+    """
+    if not text:
+        return True
+    stripped = ''.join(text.split())
+    if len(stripped) < min_chars:
+        return True
+
+    garbage = sum(len(match) for match in _GARBAGE_RE.findall(stripped))
+    printable = sum(1 for char in stripped if char.isprintable() and (char.isalnum() or char.isascii()))
+    return (printable - garbage) / len(stripped) < min_printable_ratio
+
+
+def _group_lines(words: List[Tuple[float, float, float, str]]) -> str:
+    """
+    Join OCR'd words (top, bottom, left, text) into lines of text
+
+    Words whose vertical centre falls within the current line's extent share
+    a line and are ordered left to right, so a row like "Hemoglobin 14.5 g/dL"
+    comes out on one line as the entity extractor expects.
+    """
+    lines: List[List[Tuple[float, float, float, str]]] = []
+    bottom = None
+    for word in sorted(words):
+        top, low, _, _ = word
+        if lines and (top + low) / 2 <= bottom:
+            lines[-1].append(word)
+            bottom = max(bottom, low)
+        else:
+            lines.append([word])
+            bottom = low
+    return '\n'.join(' '.join(w[3] for w in sorted(line, key=lambda w: w[2])) for line in lines)
+
+
+def _easyocr_reader(languages: Tuple[str, ...], gpu: bool, threads: int):
+    import easyocr
+    import torch
+
+    torch.set_num_threads(max(threads, 1))
+    return easyocr.Reader(list(languages), gpu=gpu, verbose=False)
+
+
+def _tesseract(languages: Tuple[str, ...], gpu: bool, threads: int):
+    import pytesseract
+
+    return pytesseract
+
+
+backends.register('ocr.easyocr', _easyocr_reader, requires=('easyocr', 'torch'))
+backends.register('ocr.tesseract', _tesseract, requires=('pytesseract',))
+
+
+def _read_image(image, engine: str, languages: Tuple[str, ...], gpu: bool,
+                confidence_threshold: float, threads: int = 1) -> Dict:
+    """Run OCR on one PIL image, keeping words at or above the confidence threshold"""
+    reader = backends.get(f'ocr.{engine}', languages=languages, gpu=gpu, threads=threads)
+    words, confidences = [], []
+
+    if engine == 'easyocr':
+        import numpy as np
+
+        for box, text, confidence in reader.readtext(np.asarray(image.convert('RGB'))):
+            if confidence < confidence_threshold:
+                continue
+            ys = [point[1] for point in box]
+            xs = [point[0] for point in box]
+            words.append((min(ys), max(ys), min(xs), text))
+            confidences.append(confidence)
+    else:
+        data = reader.image_to_data(image, lang='+'.join(_tesseract_languages(languages)),
+                                    output_type=reader.Output.DICT)
+        for text, confidence, top, height, left in zip(data['text'], data['conf'], data['top'],
+                                                       data['height'], data['left']):
+            confidence = float(confidence) / 100
+            if not text.strip() or confidence < confidence_threshold:
+                continue
+            words.append((top, top + height, left, text))
+            confidences.append(confidence)
+
+    return {
+        'text': _group_lines(words),
+        'confidence': sum(confidences) / len(confidences) if confidences else 0.0,
+    }
+
+
+def _tesseract_languages(languages: Iterable[str]) -> List[str]:
+    # easyocr-style codes in config.yaml; tesseract wants ISO 639-2
+    codes = {'en': 'eng', 'de': 'deu', 'fr': 'fra', 'es': 'spa', 'hi': 'hin'}
+    return [codes.get(language, language) for language in languages]
+
+
+def _ocr_page(payload: PagePayload, dpi: int, engine: str, languages: Tuple[str, ...],
+              gpu: bool, confidence_threshold: float, threads: int) -> Dict:
+    """Worker: rasterize one PDF page and OCR it; 'seconds' is the time taken"""
+    from pdf2image import convert_from_bytes, convert_from_path
+
+    started = time.perf_counter()
+    document, page_num = payload
+    convert = convert_from_path if isinstance(document, str) else convert_from_bytes
+    images = convert(document, dpi=dpi, first_page=page_num + 1, last_page=page_num + 1)
+    if not images:
+        return {'text': '', 'confidence': 0.0, 'seconds': time.perf_counter() - started}
+    result = _read_image(images[0], engine, languages, gpu, confidence_threshold, threads)
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def backend_available(engine: str) -> bool:
+    """Whether pdf2image and the given OCR backend are installed (warns once per process)"""
+    missing = backends.missing(f'ocr.{engine}')
+    if importlib.util.find_spec('pdf2image') is None:
+        missing.insert(0, 'pdf2image')
+    if missing:
+        logger.warning(f"OCR fallback disabled, missing packages: {', '.join(missing)}")
+    return not missing
+
+
+_pool_lock = threading.Lock()
+_pools: Dict[int, ProcessPoolExecutor] = {}
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Process-wide OCR pool, so OCR models stay loaded between documents"""
+    with _pool_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return _pools[workers]
+
+
+class OCRFallback:
+    """
+    OCR for the pages of a document that lack a usable text layer
+
+    Pages with a good text layer pass straight through. The others are
+    rasterized one page at a time at a bounded DPI and OCR'd on a shared
+    process pool, while pages are still yielded in document order. Settings
+    default to the `ocr` section of config.yaml.
+    """
+
+    def __init__(self, engine: Optional[str] = None, languages: Optional[List[str]] = None,
+                 gpu: Optional[bool] = None, confidence_threshold: Optional[float] = None,
+                 dpi: Optional[int] = None, workers: Optional[int] = None,
+                 min_text_chars: Optional[int] = None, min_printable_ratio: Optional[float] = None):
+        engine = (engine or get_setting('ocr', 'engine', 'easyocr')).lower()
+        if engine not in ENGINE_ALIASES:
+            raise ValueError(f"Unsupported OCR engine '{engine}', expected one of {list(ENGINE_ALIASES)}")
+
+        self.engine = ENGINE_ALIASES[engine]
+        self.languages = tuple(languages or get_setting('ocr', 'languages', ['en']))
+        self.gpu = bool(get_setting('ocr', 'gpu', False) if gpu is None else gpu)
+        self.confidence_threshold = float(confidence_threshold if confidence_threshold is not None
+                                          else get_setting('ocr', 'confidence_threshold', 0.5))
+        self.dpi = min(int(dpi or get_setting('ocr', 'dpi', DEFAULT_DPI)), MAX_DPI)
+        self.workers = int(workers or get_setting('ocr', 'workers') or max((os.cpu_count() or 2) // 2, 1))
+        self.min_text_chars = int(min_text_chars if min_text_chars is not None
+                                  else get_setting('ocr', 'min_text_chars', 20))
+        self.min_printable_ratio = float(min_printable_ratio if min_printable_ratio is not None
+                                         else get_setting('ocr', 'min_printable_ratio', 0.8))
+
+    def available(self) -> bool:
+        return backend_available(self.engine)
+
+    def needs_ocr(self, text: Optional[str]) -> bool:
+        return needs_ocr(text, self.min_text_chars, self.min_printable_ratio)
+
+    def _task_args(self, threads: int) -> tuple:
+        return (self.dpi, self.engine, self.languages, self.gpu, self.confidence_threshold, threads)
+
+    def _fan_out(self) -> bool:
+        # Workers of another pool (e.g. batch extraction) are already parallel
+        return self.workers > 1 and multiprocessing.parent_process() is None
+
+    def ocr_image(self, image) -> Dict:
+        """
+        OCR a standalone image (JPG/PNG upload)
+
+        Args:
+            image: PIL image, image bytes or a path
+
+        Returns:
+            dict: 'text' and mean word 'confidence'
+        """
+        from PIL import Image
+
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = Image.open(io.BytesIO(image))
+        elif not isinstance(image, Image.Image):
+            image = Image.open(image)
+        with metrics.timer('ocr_image_seconds'):
+            return _read_image(image, self.engine, self.languages, self.gpu,
+                               self.confidence_threshold, os.cpu_count() or 1)
+
+    def process(self, pages: Iterable[Dict], page_payload: Callable[[int], PagePayload]) -> Iterator[Dict]:
+        """
+        Fill in pages without a usable text layer
+
+        Args:
+            pages: Page dicts from `PDFExtractor._iter_reader_pages`
+            page_payload: Returns what a worker needs to rasterize a page index
+
+        Yields:
+            dict: The pages in order, with 'source' set to "text_layer", "ocr", or
+            "none" when OCR failed or is unavailable, 'ocr_confidence' for OCR'd
+            pages, and offsets recomputed for the replaced text
+        """
+        fan_out = self._fan_out()
+        args = self._task_args(1 if fan_out else os.cpu_count() or 1)
+        pool = None
+        # Pages waiting for an earlier OCR'd page to finish, bounded so a long
+        # run of text pages after a slow scan does not pile up in memory
+        pending: Deque[Tuple[Dict, Optional[Future]]] = deque()
+        max_pending = 4 * self.workers
+        offset = 0
+
+        def finish(page: Dict, future: Optional[Future]) -> Dict:
+            nonlocal offset
+            if future is not None:
+                self._apply(page, future.result)
+            page['start_offset'] = offset
+            offset += len(page['text'])
+            page['end_offset'] = offset
+            return page
+
+        for page in pages:
+            future = None
+            if page.get('skipped') or not self.needs_ocr(page['text']):
+                # Pages skipped by a size or time guard are not worth rasterizing either
+                pass
+            elif not self.available():
+                page['source'] = 'none'
+                metrics.inc('ocr_failures_total', reason='unavailable')
+            else:
+                payload = page_payload(page['page_num'])
+                if fan_out:
+                    pool = pool or _get_pool(self.workers)
+                    future = pool.submit(_ocr_page, payload, *args)
+                else:
+                    future = Future()
+                    try:
+                        future.set_result(_ocr_page(payload, *args))
+                    except Exception as e:
+                        future.set_exception(e)
+            pending.append((page, future))
+
+            while pending and (pending[0][1] is None or pending[0][1].done()
+                               or len(pending) > max_pending):
+                yield finish(*pending.popleft())
+
+        while pending:
+            yield finish(*pending.popleft())
+
+    @staticmethod
+    def _apply(page: Dict, result: Callable[[], Dict]) -> None:
+        try:
+            ocr = result()
+        except Exception as e:
+            logger.warning("OCR failed for page %d: %s: %s", page['page_num'] + 1, type(e).__name__, e)
+            page['source'] = 'none'
+            metrics.inc('ocr_failures_total', reason=type(e).__name__)
+            return
+        # Measured in the worker, so queueing behind other pages is not counted
+        metrics.observe('ocr_page_seconds', ocr['seconds'])
+        if ocr['text'].strip():
+            page.update(text=ocr['text'] + '\n', source='ocr', ocr_confidence=ocr['confidence'])
+        else:
+            page['source'] = 'none'
+            metrics.inc('ocr_failures_total', reason='no_text')
@@ -4,105 +4,633 @@ Extracts text from PDF medical reports
 """
 
 import PyPDF2
+import io
 import logging
+import re
+import signal
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Optional, Callable, Dict, Iterable, Iterator, BinaryIO, List, Tuple, Union
+
+from .ocr import OCRFallback, PagePayload
+from .spool import PageSpool
+from ..utils.cache import settings_digest
+from ..utils.config import get_setting
+from ..utils.metrics import metrics
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump when a change alters extracted text, so cached results are invalidated
+EXTRACTOR_VERSION = "1.3.0"
+
+# A path, or the PDF itself held in memory
+PDFSource = Union[str, Path, bytes, bytearray, memoryview, BinaryIO]
+
+# Inclusive 1-based page ranges; None as the end means "to the last page"
+PageRanges = List[Tuple[int, Optional[int]]]
+
+# Called after each page with (pages done, pages in the document); may raise ExtractionCancelled
+ProgressCallback = Callable[[int, int], None]
+
+_PAGE_RANGE_RE = re.compile(r'^(\d*)\s*(?:(-)\s*(\d*))?$')
+
+
+class ExtractionCancelled(Exception):
+    """Raised by a progress callback to stop an extraction; never counted as a failure"""
+
+
+def parse_page_ranges(spec: Optional[str]) -> Optional[PageRanges]:
+    """
+    Parse a page selection such as "1-2,10-40"
+    
+    Pages are 1-based and ranges inclusive, as printed on a report. "10-"
+    runs to the last page and "-5" starts at the first.
+    
+    Args:
+        spec (str): Comma-separated pages and ranges, or None for every page
+        
+    Returns:
+        list: (first, last) pairs with last None for open ranges, or None
+        
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    if spec is None or not str(spec).strip():
+        return None
+    
+    ranges = []
+    for part in str(spec).split(','):
+        match = _PAGE_RANGE_RE.match(part.strip())
+        if not match or not (match.group(1) or match.group(3)):
+            raise ValueError(f"Invalid page range '{part.strip()}' in '{spec}'")
+        first = int(match.group(1)) if match.group(1) else 1
+        if match.group(2):
+            last = int(match.group(3)) if match.group(3) else None
+        else:
+            last = first
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"Invalid page range '{part.strip()}' in '{spec}'")
+        ranges.append((first, last))
+    return ranges
+
+
+def select_pages(num_pages: int, page_ranges: Optional[PageRanges] = None, start_page: int = 0,
+                 end_page: Optional[int] = None) -> List[int]:
+    """Sorted 0-based indices of the pages in [start_page, end_page) that the ranges select"""
+    end_page = num_pages if end_page is None else min(end_page, num_pages)
+    if page_ranges is None:
+        return list(range(start_page, end_page))
+    
+    selected = set()
+    for first, last in page_ranges:
+        last = end_page if last is None else min(last, end_page)
+        selected.update(range(max(first - 1, start_page), last))
+    return sorted(selected)
+
+
+class _PageTimeout(Exception):
+    pass
+
+
+@contextmanager
+def _page_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Raise _PageTimeout if the block runs longer than `seconds`
+    
+    Uses SIGALRM, so it only applies in a process's main thread on Unix,
+    which is where batch and service workers extract; elsewhere (such as
+    Streamlit's script threads) the block runs unguarded.
+    """
+    if (not seconds or not hasattr(signal, 'setitimer')
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+    
+    def on_alarm(signum, frame):
+        raise _PageTimeout()
+    
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _content_size(page: PyPDF2.PageObject) -> int:
+    """Encoded size in bytes of a page's content streams, without decompressing them"""
+    contents = page.get('/Contents')
+    if contents is None:
+        return 0
+    contents = contents.get_object()
+    streams = contents if isinstance(contents, PyPDF2.generic.ArrayObject) else [contents]
+    # PyPDF2 keeps the raw stream bytes in _data and drops /Length once read
+    return sum(len(getattr(stream.get_object(), '_data', b'') or b'') for stream in streams)
+
+
+class _BufferReader(io.RawIOBase):
+    """Read-only, seekable stream over a bytes-like object, without copying it"""
+    
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return pos
+    
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else self._pos + size
+        data = self._view[self._pos:end].tobytes()
+        self._pos += len(data)
+        return data
+    
+    def readinto(self, buffer) -> int:
+        data = self._view[self._pos:self._pos + len(buffer)]
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
 
 class PDFExtractor:
-    """Extract text from PDF files"""
+    """
+    Extract text from PDF files
     
-    def __init__(self):
+    Every method accepts either a path or the PDF itself: bytes, a bytearray,
+    a memoryview or a binary file object such as BytesIO. In-memory sources
+    are parsed in place, without writing a temporary file or copying the
+    buffer; pass `filename` to name them in results and logs.
+    
+    Pages without a usable text layer (scans, broken font encodings) are
+    OCR'd when `ocr` is enabled; every page records which path produced
+    its text.
+    
+    Every method takes a `pages` selection such as "1-2,10-40". Each page
+    is guarded: a page whose content streams exceed `max_page_content_mb`,
+    or whose extraction runs past `page_timeout` seconds, is skipped with
+    'skipped' set to the reason, and page text beyond `max_page_chars` is
+    cut off. Settings default to the `pdf` section of config.yaml.
+    """
+    
+    def __init__(self, ocr: Optional[bool] = None, page_timeout: Optional[float] = None,
+                 max_page_content_mb: Optional[float] = None, max_page_chars: Optional[int] = None):
         self.supported_formats = ['.pdf']
+        
+        if ocr is None:
+            ocr = get_setting('ocr', 'enabled', True)
+        self.ocr = OCRFallback() if ocr else None
+        
+        self.page_timeout = (page_timeout if page_timeout is not None
+                             else get_setting('pdf', 'page_timeout', 30))
+        self.max_page_content_bytes = int((max_page_content_mb if max_page_content_mb is not None
+                                           else get_setting('pdf', 'max_page_content_mb', 50)) * 1024 * 1024)
+        self.max_page_chars = int(max_page_chars if max_page_chars is not None
+                                  else get_setting('pdf', 'max_page_chars', 1_000_000))
+    
+    def settings_key(self) -> str:
+        """Digest of the settings that change extracted text, for keying cached results"""
+        ocr = None
+        if self.ocr is not None:
+            ocr = [self.ocr.available(), self.ocr.engine, list(self.ocr.languages), self.ocr.dpi,
+                   self.ocr.confidence_threshold, self.ocr.min_text_chars, self.ocr.min_printable_ratio]
+        return settings_digest([ocr, self.page_timeout, self.max_page_content_bytes, self.max_page_chars])
+    
+    def _path_error(self, pdf_path: Path) -> Optional[str]:
+        """Describe why a path cannot be processed, or None if it can"""
+        if not pdf_path.exists():
+            return f"File not found: {pdf_path}"
+        
+        if pdf_path.suffix.lower() not in self.supported_formats:
+            return f"Unsupported file format: {pdf_path.suffix}"
+        
+        return None
+    
+    def _validate_path(self, pdf_path: str) -> Optional[Path]:
+        """Return the path if it points to a supported, existing file"""
+        pdf_path = Path(pdf_path)
+        
+        error = self._path_error(pdf_path)
+        if error:
+            logger.error(error)
+            metrics.inc('pdf_failures_total', reason='not_found' if not pdf_path.exists() else 'unsupported_format')
+            return None
+        
+        return pdf_path
+    
+    def _resolve_source(self, source: PDFSource,
+                        filename: Optional[str] = None) -> Optional[Tuple[PDFSource, str]]:
+        """Validate a source and return it with a display name, or None"""
+        if isinstance(source, (bytes, bytearray, memoryview)) or hasattr(source, 'read'):
+            name = filename or getattr(source, 'name', None)
+            return source, Path(name).name if isinstance(name, str) else '<memory>'
+        
+        pdf_path = self._validate_path(source)
+        if pdf_path is None:
+            return None
+        return pdf_path, filename or pdf_path.name
+    
+    @staticmethod
+    @contextmanager
+    def _open_stream(source: PDFSource) -> Iterator[BinaryIO]:
+        """Open a validated source as a binary stream"""
+        if isinstance(source, bytes):
+            # BytesIO shares the bytes object's memory until it is written to
+            yield io.BytesIO(source)
+        elif isinstance(source, (bytearray, memoryview)):
+            yield _BufferReader(source)
+        elif hasattr(source, 'read'):
+            source.seek(0)
+            yield source
+        else:
+            with open(source, 'rb') as file:
+                yield file
+    
+    @staticmethod
+    def _open_reader(stream: BinaryIO) -> PyPDF2.PdfReader:
+        with metrics.timer('pdf_open_seconds'):
+            return PyPDF2.PdfReader(stream)
+    
+    @staticmethod
+    def _source_size(source: PDFSource, stream: BinaryIO) -> int:
+        if isinstance(source, Path):
+            return source.stat().st_size
+        if isinstance(source, memoryview):
+            return source.nbytes
+        if isinstance(source, (bytes, bytearray)):
+            return len(source)
+        return stream.seek(0, io.SEEK_END)
+    
+    @staticmethod
+    def _read_metadata(pdf_reader: PyPDF2.PdfReader) -> Dict:
+        """Read document information from an open reader"""
+        metadata = pdf_reader.metadata
+        if not metadata:
+            return {}
+        
+        return {
+            'author': metadata.get('/Author', 'Unknown'),
+            'creator': metadata.get('/Creator', 'Unknown'),
+            'producer': metadata.get('/Producer', 'Unknown'),
+            'subject': metadata.get('/Subject', 'Unknown'),
+            'title': metadata.get('/Title', 'Unknown'),
+        }
+    
+    def _extract_page(self, page: PyPDF2.PageObject, page_num: int) -> Dict:
+        """Text of one page, within the size and time guards"""
+        skipped = None
+        page_text = ""
+        try:
+            if self.max_page_content_bytes and _content_size(page) > self.max_page_content_bytes:
+                skipped = 'too_large'
+            else:
+                with metrics.timer('pdf_page_seconds'), _page_deadline(self.page_timeout):
+                    page_text = page.extract_text() or ""
+        except _PageTimeout:
+            skipped = 'timeout'
+        
+        result = {'page_num': page_num, 'text': page_text, 'source': 'text_layer'}
+        if skipped:
+            logger.warning("Skipped page %d: %s", page_num + 1, skipped)
+            metrics.inc('pdf_pages_skipped_total', reason=skipped)
+            result.update(source='none', skipped=skipped)
+        elif self.max_page_chars and len(page_text) > self.max_page_chars:
+            logger.warning("Truncated page %d from %d characters", page_num + 1, len(page_text))
+            metrics.inc('pdf_pages_truncated_total')
+            result.update(text=page_text[:self.max_page_chars], truncated=True)
+        return result
+    
+    def _iter_reader_pages(self, pdf_reader: PyPDF2.PdfReader, start_page: int = 0,
+                           end_page: Optional[int] = None,
+                           page_ranges: Optional[PageRanges] = None) -> Iterator[Dict]:
+        """
+        Yield the text of the selected pages in [start_page, end_page) of a parsed document
+        
+        Offsets are character positions of the page text within the
+        concatenated text of the selected pages, as returned by `extract_text`.
+        """
+        offset = 0
+        for page_num in select_pages(len(pdf_reader.pages), page_ranges, start_page, end_page):
+            page = self._extract_page(pdf_reader.pages[page_num], page_num)
+            page['start_offset'] = offset
+            offset += len(page['text'])
+            page['end_offset'] = offset
+            yield page
+    
+    @staticmethod
+    def _page_payload(source: PDFSource, pdf_reader: PyPDF2.PdfReader, page_num: int) -> PagePayload:
+        """What an OCR worker needs to rasterize one page"""
+        if isinstance(source, Path):
+            return str(source), page_num
+        # Ship only the page itself, not the whole in-memory document
+        writer = PyPDF2.PdfWriter()
+        writer.add_page(pdf_reader.pages[page_num])
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue(), 0
+    
+    def _iter_document_pages(self, source: PDFSource, pdf_reader: PyPDF2.PdfReader,
+                             start_page: int = 0, end_page: Optional[int] = None,
+                             page_ranges: Optional[PageRanges] = None) -> Iterator[Dict]:
+        """Text-layer pages, with OCR filling in the ones that have no usable text"""
+        pages = self._iter_reader_pages(pdf_reader, start_page, end_page, page_ranges)
+        if self.ocr is not None:
+            pages = self.ocr.process(pages, lambda page_num: self._page_payload(source, pdf_reader, page_num))
+        return self._count_pages(pages) if metrics.enabled else pages
+    
+    @staticmethod
+    def _count_pages(pages: Iterator[Dict]) -> Iterator[Dict]:
+        for page in pages:
+            metrics.inc('pdf_pages_total', source=page['source'])
+            yield page
     
-    def extract_text(self, pdf_path: str) -> Optional[str]:
+    @staticmethod
+    def _report_progress(pages: Iterator[Dict], total: int, progress: ProgressCallback) -> Iterator[Dict]:
+        for done, page in enumerate(pages, 1):
+            yield page
+            progress(done, total)
+    
+    def iter_pages(self, source: PDFSource, start_page: int = 0,
+                   end_page: Optional[int] = None, filename: Optional[str] = None,
+                   pages: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Parse a PDF once and yield its pages one at a time
+        
+        Args:
+            source: Path to the PDF file, or the PDF as bytes/memoryview/file object
+            start_page (int): Index of the first page to extract
+            end_page (int): Index one past the last page to extract (default: all)
+            filename (str): Name to report for in-memory sources
+            pages (str): Page selection such as "1-2,10-40" (see `parse_page_ranges`)
+            
+        Yields:
+            dict: Page index, page text, the page's start/end offsets within
+            the concatenated text of the selected pages, 'source': "text_layer",
+            "ocr" or "none", and 'skipped'/'truncated' when a guard tripped
+        """
+        page_ranges = parse_page_ranges(pages)
+        resolved = self._resolve_source(source, filename)
+        if resolved is None:
+            return
+        source, name = resolved
+        
+        with self._open_stream(source) as stream:
+            pdf_reader = self._open_reader(stream)
+            logger.info("Processing %d pages from %s", len(pdf_reader.pages), name)
+            yield from self._iter_document_pages(source, pdf_reader, start_page, end_page, page_ranges)
+    
+    def probe(self, source: PDFSource, filename: Optional[str] = None) -> Optional[Dict]:
+        """
+        Read page count and metadata without extracting any text
+        
+        Args:
+            source: Path to the PDF file, or the PDF as bytes/memoryview/file object
+            filename (str): Name to report for in-memory sources
+            
+        Returns:
+            dict: Filename, page count and metadata, or None on failure
+        """
+        try:
+            resolved = self._resolve_source(source, filename)
+            if resolved is None:
+                return None
+            source, name = resolved
+            
+            with self._open_stream(source) as stream:
+                pdf_reader = self._open_reader(stream)
+                return {
+                    'filename': name,
+                    'num_pages': len(pdf_reader.pages),
+                    'file_size': self._source_size(source, stream),
+                    'metadata': self._read_metadata(pdf_reader),
+                }
+                
+        except Exception as e:
+            logger.error("Error probing PDF: %s", e)
+            metrics.inc('pdf_failures_total', reason=type(e).__name__)
+            return None
+    
+    def extract_text(self, source: PDFSource, filename: Optional[str] = None,
+                     pages: Optional[str] = None) -> Optional[str]:
         """
         Extract text from a PDF file
         
         Args: 
-            pdf_path (str): Path to the PDF file
+            source: Path to the PDF file, or the PDF as bytes/memoryview/file object
+            filename (str): Name to report for in-memory sources
+            pages (str): Page selection such as "1-2,10-40" (default: every page)
             
         Returns:
             str: Extracted text or None if extraction fails
+            
+        Raises:
+            ValueError: If `pages` is malformed
         """
+        parse_page_ranges(pages)
         try: 
-            pdf_path = Path(pdf_path)
-            
-            # Validate file exists
-            if not pdf_path.exists():
-                logger.error(f"File not found: {pdf_path}")
-                return None
-            
-            # Validate file format
-            if pdf_path.suffix. lower() not in self.supported_formats:
-                logger.error(f"Unsupported file format: {pdf_path.suffix}")
+            resolved = self._resolve_source(source, filename)
+            if resolved is None:
                 return None
+            source, name = resolved
             
-            # Extract text
-            text = ""
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                num_pages = len(pdf_reader.pages)
-                
-                logger.info(f"Processing {num_pages} pages from {pdf_path. name}")
-                
-                for page_num in range(num_pages):
-                    page = pdf_reader.pages[page_num]
-                    text += page.extract_text()
+            text = "".join(page['text'] for page in self.iter_pages(source, filename=name, pages=pages))
             
-            if not text. strip():
-                logger.warning(f"No text extracted from {pdf_path.name}")
+            if not text.strip():
+                logger.warning("No text extracted from %s", name)
+                metrics.inc('pdf_failures_total', reason='no_text')
                 return None
             
-            logger.info(f"Successfully extracted {len(text)} characters")
+            logger.info("Successfully extracted %d characters", len(text))
             return text
             
         except Exception as e:
-            logger.error(f"Error extracting text from PDF:  {str(e)}")
+            logger.error("Error extracting text from PDF: %s", e)
+            metrics.inc('pdf_failures_total', reason=type(e).__name__)
             return None
     
-    def extract_with_metadata(self, pdf_path: str) -> Dict:
+    def _extract_document(self, source: PDFSource, name: str, start_page: int = 0,
+                          end_page: Optional[int] = None, page_ranges: Optional[PageRanges] = None,
+                          spool: Optional[PageSpool] = None,
+                          progress: Optional[ProgressCallback] = None) -> Dict:
+        """
+        Parse a validated source once; errors propagate to the caller
+        
+        With a `spool`, page text goes into it instead of a 'text' string.
+        `progress` is called after each page has been collected, with the
+        number of selected pages as the total.
+        """
+        with self._open_stream(source) as stream:
+            pdf_reader = self._open_reader(stream)
+            num_pages = len(pdf_reader.pages)
+            
+            logger.info("Processing %d pages from %s", num_pages, name)
+            
+            pages = self._iter_document_pages(source, pdf_reader, start_page, end_page, page_ranges)
+            if progress is not None:
+                total = len(select_pages(num_pages, page_ranges, start_page, end_page))
+                pages = self._report_progress(pages, total, progress)
+            result = {
+                'filename': name,
+                'num_pages': num_pages,
+                'metadata': self._read_metadata(pdf_reader),
+            }
+            if spool is not None:
+                for page in pages:
+                    spool.append(page)
+                return {**result, 'char_count': spool.char_count, 'word_count': spool.word_count,
+                        'pages': spool.pages, 'spool': spool}
+            
+            texts, page_info = [], []
+            for page in pages:
+                texts.append(page['text'])
+                page_info.append({key: value for key, value in page.items() if key != 'text'})
+            text = "".join(texts)
+            
+            return {'text': text, **result, 'char_count': len(text), 'word_count': len(text.split()),
+                    'pages': page_info}
+    
+    def extract_many(self, pdf_paths: Iterable[str], max_workers: Optional[int] = None,
+                     max_in_flight: Optional[int] = None,
+                     page_chunk_size: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Extract many PDFs in parallel on a process pool
+        
+        See `src.preprocessing.batch.extract_many` for the arguments.
+        
+        Yields:
+            dict: One record per file, in completion order
+        """
+        from .batch import extract_many
+        
+        return extract_many(pdf_paths, max_workers=max_workers, max_in_flight=max_in_flight,
+                            page_chunk_size=page_chunk_size)
+    
+    def extract_with_metadata(self, source: PDFSource, filename: Optional[str] = None,
+                              pages: Optional[str] = None,
+                              progress: Optional[ProgressCallback] = None) -> Dict:
         """
         Extract text along with metadata
         
+        The document is parsed once; text, page count and metadata
+        all come from the same reader.
+        
         Args:
-            pdf_path (str): Path to the PDF file
+            source: Path to the PDF file, or the PDF as bytes/memoryview/file object
+            filename (str): Name to report for in-memory sources
+            pages (str): Page selection such as "1-2,10-40" (default: every page)
+            progress (callable): Called with (pages done, pages selected) after
+                each page; raising ExtractionCancelled stops the extraction
             
         Returns: 
-            dict: Dictionary containing text and metadata
+            dict: Dictionary containing text and metadata, with 'pages' giving
+            each page's offsets and the path ("text_layer"/"ocr"/"none") that
+            produced its text
+            
+        Raises:
+            ValueError: If `pages` is malformed
+            ExtractionCancelled: If `progress` cancelled the extraction
         """
+        page_ranges = parse_page_ranges(pages)
         try:
-            pdf_path = Path(pdf_path)
-            text = self.extract_text(str(pdf_path))
+            resolved = self._resolve_source(source, filename)
+            if resolved is None:
+                return None
+            source, name = resolved
             
-            if text is None:
+            result = self._extract_document(source, name, page_ranges=page_ranges, progress=progress)
+            
+            if not result['text'].strip():
+                logger.warning("No text extracted from %s", name)
+                metrics.inc('pdf_failures_total', reason='no_text')
                 return None
             
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                metadata = pdf_reader.metadata
-                
-                return {
-                    'text':  text,
-                    'filename': pdf_path.name,
-                    'num_pages': len(pdf_reader.pages),
-                    'char_count': len(text),
-                    'word_count': len(text.split()),
-                    'metadata': {
-                        'author': metadata.get('/Author', 'Unknown'),
-                        'creator': metadata.get('/Creator', 'Unknown'),
-                        'producer': metadata.get('/Producer', 'Unknown'),
-                        'subject': metadata.get('/Subject', 'Unknown'),
-                        'title': metadata.get('/Title', 'Unknown'),
-                    } if metadata else {}
-                }
+            logger.info("Successfully extracted %d characters", result['char_count'])
+            return result
                 
+        except ExtractionCancelled:
+            logger.info("Extraction of %s cancelled", name)
+            raise
         except Exception as e: 
-            logger.error(f"Error extracting metadata:  {str(e)}")
+            logger.error("Error extracting metadata: %s", e)
+            metrics.inc('pdf_failures_total', reason=type(e).__name__)
+            return None
+
+    
+    def extract_spooled(self, source: PDFSource, filename: Optional[str] = None,
+                        pages: Optional[str] = None, memory_budget_mb: Optional[float] = None) -> Optional[Dict]:
+        """
+        Extract a document of any size within a memory budget
+        
+        Like `extract_with_metadata`, but the text is collected in a
+        `PageSpool` under 'spool' instead of a 'text' string: once it grows
+        past the budget it is spilled to chunk files under data/processed/,
+        and is read back page by page. Close the spool when done with it.
+        
+        Example:
+            result = extractor.extract_spooled("bundle.pdf", pages="1-2,10-40")
+            with result['spool'] as spool:
+                entities = MedicalEntityExtractor().extract_all_stream(spool)
+        
+        Args:
+            source: Path to the PDF file, or the PDF as bytes/memoryview/file object
+            filename (str): Name to report for in-memory sources
+            pages (str): Page selection such as "1-2,10-40" (default: every page)
+            memory_budget_mb (float): Page text held in memory before spilling
+                (default: pdf.memory_budget_mb)
+            
+        Returns:
+            dict: As `extract_with_metadata` with 'spool' in place of 'text', or None on failure
+            
+        Raises:
+            ValueError: If `pages` is malformed
+        """
+        page_ranges = parse_page_ranges(pages)
+        budget = None if memory_budget_mb is None else int(memory_budget_mb * 1024 * 1024)
+        spool = None
+        try:
+            resolved = self._resolve_source(source, filename)
+            if resolved is None:
+                return None
+            source, name = resolved
+            
+            spool = PageSpool(memory_budget=budget)
+            result = self._extract_document(source, name, page_ranges=page_ranges, spool=spool)
+            
+            if not result['char_count'] or not any(page['text'].strip() for page in spool):
+                logger.warning("No text extracted from %s", name)
+                metrics.inc('pdf_failures_total', reason='no_text')
+                spool.close()
+                return None
+            
+            logger.info("Successfully extracted %d characters%s", result['char_count'],
+                        " (spooled to disk)" if spool.spilled else "")
+            return result
+            
+        except Exception as e:
+            logger.error("Error extracting PDF: %s", e)
+            metrics.inc('pdf_failures_total', reason=type(e).__name__)
+            if spool is not None:
+                spool.close()
             return None
 
 
@@ -122,6 +650,10 @@ def extract_text_from_pdf(pdf_path: str) -> str:
 
 # Example usage
 if __name__ == "__main__":
+    from ..utils.logging_config import setup_logging
+    
+    setup_logging()
+    
     # Test the extractor
     extractor = PDFExtractor()
     
@@ -0,0 +1,156 @@
+"""
+Page Spool Module
+Holds the extracted pages of one document within a memory budget
+"""
+
+import logging
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..utils.config import get_setting, resolve_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BUDGET_MB = 64
+DEFAULT_CHUNK_MB = 16
+
+
+class PageSpool:
+    """
+    Page texts of one document, kept in memory up to a budget and spilled to disk beyond it
+
+    Pages are appended in order as they are extracted. While their text
+    fits in `memory_budget` bytes it stays in memory; once it does not,
+    every page (held and following) is written to numbered chunk files of
+    about `chunk_bytes` each under `directory`, and only page metadata and
+    file positions stay in memory. Iterating yields the page dicts with
+    their text either way, reading back one page at a time, so a spooled
+    document can be fed to `MedicalEntityExtractor.extract_all_stream`.
+
+    Use as a context manager, or call `close`, to delete the chunk files.
+    """
+
+    def __init__(self, memory_budget: Optional[int] = None, directory: Optional[str] = None,
+                 chunk_bytes: Optional[int] = None):
+        self.memory_budget = int(memory_budget if memory_budget is not None else
+                                 get_setting('pdf', 'memory_budget_mb', DEFAULT_MEMORY_BUDGET_MB) * 1024 * 1024)
+        self.chunk_bytes = int(chunk_bytes or get_setting('pdf', 'spool_chunk_mb', DEFAULT_CHUNK_MB) * 1024 * 1024)
+        self._root = Path(directory) if directory else resolve_path(
+            get_setting('pdf', 'spool_dir', 'data/processed/spool/'))
+        self.directory: Optional[Path] = None
+
+        self.pages: List[Dict] = []
+        self._texts: List[Optional[str]] = []
+        # Per spilled page: (chunk index, byte offset, byte length)
+        self._locations: List[Optional[Tuple[int, int, int]]] = []
+        self._held_bytes = 0
+        self._chunk = None
+        self._chunk_index = -1
+        self.char_count = 0
+        self.word_count = 0
+        self._closed = False
+
+    @property
+    def spilled(self) -> bool:
+        return self.directory is not None
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def append(self, page: Dict) -> None:
+        """Add the next page dict (with 'text'); the spool keeps its own copy of the metadata"""
+        if self._closed:
+            raise ValueError("PageSpool is closed")
+        text = page.get('text') or ''
+        self.pages.append({key: value for key, value in page.items() if key != 'text'})
+        self.char_count += len(text)
+        self.word_count += len(text.split())
+
+        if self.spilled:
+            self._texts.append(None)
+            self._locations.append(self._write(text))
+            return
+
+        self._texts.append(text)
+        self._locations.append(None)
+        # Characters, which is bytes for the mostly-ASCII text of lab reports
+        self._held_bytes += len(text)
+        if self._held_bytes > self.memory_budget:
+            self._spill()
+
+    def _spill(self) -> None:
+        self.directory = self._root / uuid.uuid4().hex
+        self.directory.mkdir(parents=True, exist_ok=True)
+        logger.info("Page text over the %.0f MB budget, spooling to %s",
+                    self.memory_budget / (1024 * 1024), self.directory)
+        for i, text in enumerate(self._texts):
+            self._locations[i] = self._write(text)
+            self._texts[i] = None
+        self._held_bytes = 0
+
+    def _write(self, text: str) -> Tuple[int, int, int]:
+        if self._chunk is None or self._chunk.tell() >= self.chunk_bytes:
+            if self._chunk is not None:
+                self._chunk.close()
+            self._chunk_index += 1
+            self._chunk = open(self._chunk_path(self._chunk_index), 'wb')
+        data = text.encode('utf-8')
+        offset = self._chunk.tell()
+        self._chunk.write(data)
+        return self._chunk_index, offset, len(data)
+
+    def _chunk_path(self, index: int) -> Path:
+        return self.directory / f"chunk-{index:05d}.txt"
+
+    def __iter__(self) -> Iterator[Dict]:
+        """The pages in order, each with its 'text'"""
+        if self._closed:
+            raise ValueError("PageSpool is closed")
+        if self._chunk is not None:
+            self._chunk.flush()
+        file, file_index = None, None
+        try:
+            for meta, text, location in zip(self.pages, self._texts, self._locations):
+                if location is not None:
+                    index, offset, length = location
+                    if index != file_index:
+                        if file is not None:
+                            file.close()
+                        file, file_index = open(self._chunk_path(index), 'rb'), index
+                    file.seek(offset)
+                    text = file.read(length).decode('utf-8')
+                yield {**meta, 'text': text}
+        finally:
+            if file is not None:
+                file.close()
+
+    def iter_text(self) -> Iterator[str]:
+        for page in self:
+            yield page['text']
+
+    def text(self) -> str:
+        """The whole document text (loads everything into memory)"""
+        return "".join(self.iter_text())
+
+    def close(self) -> None:
+        """Delete the chunk files"""
+        if self._chunk is not None:
+            self._chunk.close()
+            self._chunk = None
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+        self._texts = []
+        self._closed = True
+
+    def __enter__(self) -> 'PageSpool':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __del__(self):
+        # Chunk files are temporary; don't leave them behind for a spool nobody closed
+        if getattr(self, 'directory', None) is not None and not self._closed:
+            self.close()
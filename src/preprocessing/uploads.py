@@ -0,0 +1,102 @@
+"""
+Upload Analysis Module
+Extracts one uploaded report (PDF or image) in a worker process, reporting progress
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+
+from .ocr import OCRFallback
+from .pdf_extractor import ExtractionCancelled, PDFExtractor
+from ..analysis.anomaly_detector import flag_results
+from ..extraction.entity_extractor import MedicalEntityExtractor
+from ..utils.logging_config import correlation
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png'}
+
+# Per-process extractors and OCR, created on first use in each worker
+_pdf_extractor = None
+_entity_extractor = None
+_ocr = None
+
+
+class UploadCancelled(ExtractionCancelled):
+    """Raised in the worker when the user cancelled the upload it is extracting"""
+
+
+def _extract_image(data: bytes, filename: str) -> Optional[Dict]:
+    global _ocr
+    if _ocr is None:
+        _ocr = OCRFallback()
+    if not _ocr.available():
+        return None
+
+    page = _ocr.ocr_image(data)
+    if not page['text'].strip():
+        return None
+
+    text = page['text']
+    return {
+        'text': text,
+        'filename': filename,
+        'num_pages': 1,
+        'char_count': len(text),
+        'word_count': len(text.split()),
+        'pages': [{'page_num': 0, 'start_offset': 0, 'end_offset': len(text),
+                   'source': 'ocr', 'ocr_confidence': page['confidence']}],
+    }
+
+
+def _extract_pdf(data: bytes, filename: str, job_id: Optional[str], progress, cancelled) -> Optional[Dict]:
+    global _pdf_extractor
+
+    def on_page(done: int, total: int) -> None:
+        if progress is not None:
+            progress[job_id] = (done, total)
+        if cancelled is not None and cancelled.get(job_id):
+            raise UploadCancelled(filename)
+
+    if _pdf_extractor is None:
+        _pdf_extractor = PDFExtractor()
+    return _pdf_extractor.extract_with_metadata(data, filename=filename, progress=on_page)
+
+
+def analyze_upload(data: bytes, filename: str, job_id: Optional[str] = None,
+                   progress=None, cancelled=None) -> Optional[Dict]:
+    """
+    Worker: extract an uploaded report
+
+    PDFs go through `PDFExtractor.extract_with_metadata`; after each page
+    the number of pages done and the total are stored in
+    `progress[job_id]`, and the job stops with `UploadCancelled` once
+    `cancelled[job_id]` is set. Both are shared dicts (e.g. from a
+    `multiprocessing.Manager`) and may be omitted.
+
+    Args:
+        data (bytes): The uploaded file
+        filename (str): Upload name; its extension selects PDF or image OCR
+        job_id (str): Key of this upload in `progress` and `cancelled`
+
+    Returns:
+        dict: Same shape as `PDFExtractor.extract_with_metadata` plus
+        'entities', the flagged `extract_all` output, or None if no text
+        could be extracted
+
+    Raises:
+        UploadCancelled: If the upload was cancelled mid-extraction
+    """
+    global _entity_extractor
+    with correlation(job_id):
+        if Path(filename).suffix.lower() in IMAGE_SUFFIXES:
+            result = _extract_image(data, filename)
+        else:
+            result = _extract_pdf(data, filename, job_id, progress, cancelled)
+        if result is not None:
+            if _entity_extractor is None:
+                _entity_extractor = MedicalEntityExtractor()
+            result['entities'] = flag_results(_entity_extractor.extract_all(result['text']))
+        return result
+
@@ -0,0 +1 @@
+"""Service module for long-running ingestion"""
@@ -0,0 +1,411 @@
+"""
+Backlog Processing Module
+Resumable batch extraction of a report directory, checkpointed per file
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..analysis.anomaly_detector import flag_results
+from ..extraction.entity_extractor import EXTRACTOR_VERSION as ENTITY_VERSION, MedicalEntityExtractor
+from ..preprocessing.dedup import MinHasher, NearDuplicateDetector, fingerprint
+from ..preprocessing.pdf_extractor import EXTRACTOR_VERSION as PDF_VERSION, PDFExtractor
+from ..utils.cache import ResultCache, hash_file
+from ..utils.config import get_setting, resolve_path
+from ..utils.logging_config import correlation
+from .ingest_service import json_safe
+
+logger = logging.getLogger(__name__)
+
+# Results of a file are redone when either extractor changes
+PIPELINE_VERSION = f"{PDF_VERSION}-{ENTITY_VERSION}"
+
+# Per-process extractors and cache, created on first use in each worker
+_pdf_extractor = None
+_entity_extractor = None
+_cache = None
+_hasher = None
+
+
+def _process_file(path: str, name: str, use_cache: bool, dedup: bool = False) -> Dict:
+    """
+    Worker: extract one report and return its output record
+
+    With `dedup`, the record also carries the text's '_fingerprint' for the
+    parent's duplicate check; the parent removes it before writing.
+    """
+    global _pdf_extractor, _entity_extractor, _cache, _hasher
+    if _pdf_extractor is None:
+        _pdf_extractor, _entity_extractor = PDFExtractor(), MedicalEntityExtractor()
+        _cache = ResultCache() if use_cache else None
+    if dedup and _hasher is None:
+        _hasher = MinHasher.from_config()
+
+    timings = {}
+    record = {'path': name, 'filename': Path(path).name, 'content_hash': None, 'status': 'ok', 'error': None}
+    started = time.perf_counter()
+    with correlation(name):
+        try:
+            if _cache is not None:
+                document = _cache.extract_with_metadata(path, _pdf_extractor)
+                record['content_hash'] = document['content_hash'] if document else hash_file(path)
+            else:
+                record['content_hash'] = hash_file(path)
+                document = _pdf_extractor.extract_with_metadata(path)
+            timings['extract'] = time.perf_counter() - started
+
+            if document is None:
+                record.update(status='error', error="Failed to extract text from PDF")
+            else:
+                entity_started = time.perf_counter()
+                if _cache is not None:
+                    entities = _cache.extract_all(record['content_hash'], document['text'], _entity_extractor,
+                                                  _pdf_extractor)
+                else:
+                    entities = _entity_extractor.extract_all(document['text'])
+                flag_results(entities)
+                timings['entities'] = time.perf_counter() - entity_started
+                record.update(num_pages=document['num_pages'], **entities)
+                if dedup:
+                    record['_fingerprint'] = fingerprint(document['text'], _hasher)
+        except Exception as e:
+            record.update(status='error', error=f"{type(e).__name__}: {e}")
+
+    timings['total'] = time.perf_counter() - started
+    record['timings'] = timings
+    return record
+
+
+class Checkpoint:
+    """
+    Append-only manifest of the files a backlog run has finished
+
+    One JSON line per finished file: its path relative to the input
+    directory, size and mtime, content hash, status, timing, pipeline
+    version, and the length of the output file once its record was
+    written. Lines are appended and flushed as files finish, so after a
+    crash the manifest lists exactly the files whose records are safely
+    in the output; the latest line for a path wins. `compact` rewrites the
+    file with one line per path.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict] = {}
+        self._file = None
+
+    def load(self) -> 'Checkpoint':
+        self.entries.clear()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line torn by a crash mid-write
+                        continue
+                    self.entries[entry['path']] = entry
+        except FileNotFoundError:
+            pass
+        return self
+
+    @property
+    def output_end(self) -> int:
+        """Output length covered by the manifest; anything after it was never checkpointed"""
+        return max((entry.get('output_end', 0) for entry in self.entries.values()), default=0)
+
+    def record(self, entry: Dict) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        self.entries[entry['path']] = entry
+
+    def compact(self) -> None:
+        """Rewrite the manifest with only the latest entry per path"""
+        self.close()
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            for entry in self.entries.values():
+                file.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BacklogRunner:
+    """
+    Process every PDF under a directory, resuming where the last run stopped
+
+    Results are appended as JSONL to `output`, one record per file in the
+    shape the ingestion service writes (and `HistoryStore.add_reports`
+    reads), plus the file's 'path'. A file is skipped when the checkpoint
+    shows it finished with the current pipeline version and its size and
+    mtime are unchanged, or, if they changed, its content hash is still
+    the same. Anything new or modified is (re)processed; files that failed
+    are retried only when they change or with `retry_failed`.
+
+    A redone file's new record is appended after the old one and carries
+    'supersedes' (the content hash of the record it replaces, None if that
+    one failed). Only the last record per 'path' is current: `read_records`
+    yields just those, and the history store and exporter read the output
+    that way.
+
+    On start, the output is truncated to the length the checkpoint
+    vouches for, so a record written just before a crash but never
+    checkpointed is not duplicated when its file is redone.
+
+    With `dedup` (`dedup.enabled` in config.yaml), a report whose text
+    repeats, exactly or nearly, one processed earlier in the same run is
+    still written, with 'dedup': its 'status' ("duplicate" or
+    "near_duplicate"), the 'path' it repeats as 'duplicate_of', and the
+    estimated 'similarity'. Reports from earlier runs are not compared.
+    """
+
+    def __init__(self, input_dir: Optional[str] = None, output: Optional[str] = None,
+                 manifest: Optional[str] = None, workers: Optional[int] = None,
+                 max_in_flight: Optional[int] = None, use_cache: Optional[bool] = None,
+                 retry_failed: bool = False, dedup: Optional[bool] = None):
+        self.input_dir = resolve_path(input_dir or get_setting('backlog', 'input_dir', 'data/raw/'))
+        self.output = resolve_path(output or get_setting('backlog', 'output', 'data/processed/reports.jsonl'))
+        self.checkpoint = Checkpoint(resolve_path(
+            manifest or get_setting('backlog', 'manifest', 'models/checkpoints/backlog.jsonl')))
+        self.workers = workers or get_setting('backlog', 'workers') or os.cpu_count() or 1
+        self.max_in_flight = max(max_in_flight or get_setting('backlog', 'max_in_flight', 4 * self.workers), 1)
+        self.use_cache = bool(get_setting('cache', 'enabled', True) if use_cache is None else use_cache)
+        self.retry_failed = retry_failed
+        self.detector = (NearDuplicateDetector() if (get_setting('dedup', 'enabled', True) if dedup is None
+                                                     else dedup) else None)
+        self.stats = {'processed': 0, 'failed': 0, 'skipped': 0, 'duplicates': 0}
+
+    def _relative(self, path: Path) -> str:
+        return path.relative_to(self.input_dir).as_posix()
+
+    def _is_done(self, path: Path, stat: os.stat_result) -> Tuple[bool, Optional[Dict]]:
+        """
+        Whether the checkpoint already covers this file as it is now
+
+        Returns:
+            tuple: (done, updated checkpoint entry to record for a file that
+            was touched or copied but not changed, else None)
+        """
+        entry = self.checkpoint.entries.get(self._relative(path))
+        if entry is None or entry.get('version') != PIPELINE_VERSION:
+            return False, None
+        if entry['status'] != 'ok' and self.retry_failed:
+            return False, None
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return True, None
+        # Touched or copied but not changed: re-stamp instead of redoing it
+        if entry['size'] == stat.st_size and hash_file(path) == entry.get('content_hash'):
+            return True, {**entry, 'mtime_ns': stat.st_mtime_ns}
+        return False, None
+
+    def pending(self, restamp: bool = False) -> Iterator[Tuple[Path, os.stat_result]]:
+        """
+        Files under the input directory that still need processing, in path order
+
+        Args:
+            restamp (bool): Record the new mtime of unchanged files that were
+                touched, so later runs skip them without hashing (`run` does;
+                `status` only lists)
+        """
+        for path in sorted(self.input_dir.rglob('*.pdf')):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            done, entry = self._is_done(path, stat)
+            if done:
+                self.stats['skipped'] += 1
+                if restamp and entry is not None:
+                    self.checkpoint.record(entry)
+            else:
+                yield path, stat
+
+    def _check_duplicate(self, record: Dict) -> None:
+        """Compare a finished report with the earlier ones of this run and note a repeat"""
+        report_fingerprint = record.pop('_fingerprint', None)
+        if self.detector is None or record['status'] != 'ok':
+            return
+        outcome = self.detector.check(record['path'], report_fingerprint)
+        if outcome['status'] != 'new':
+            record['dedup'] = outcome
+            self.stats['duplicates'] += 1
+            logger.info("%s repeats %s (%s, similarity %.2f)", record['path'], outcome['duplicate_of'],
+                        outcome['status'], outcome['similarity'])
+
+    def _finish(self, out, path: Path, stat: os.stat_result, record: Dict) -> None:
+        self._check_duplicate(record)
+        previous = self.checkpoint.entries.get(record['path'])
+        if previous is not None:
+            record['supersedes'] = previous.get('content_hash')
+        out.write(json.dumps(json_safe(record), allow_nan=False) + "\n")
+        out.flush()
+        self.checkpoint.record({
+            'path': record['path'],
+            'content_hash': record['content_hash'],
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'status': record['status'],
+            'error': record['error'],
+            'elapsed': record['timings']['total'],
+            'version': PIPELINE_VERSION,
+            'finished_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'output_end': out.tell(),
+        })
+        self.stats['processed' if record['status'] == 'ok' else 'failed'] += 1
+        if record['status'] != 'ok':
+            logger.warning("Failed %s: %s", record['path'], record['error'])
+
+    def _open_output(self):
+        """Open the output for appending, dropping records the checkpoint does not cover"""
+        self.output.parent.mkdir(parents=True, exist_ok=True)
+        out = open(self.output, 'a+', encoding='utf-8')
+        end = self.checkpoint.output_end
+        if out.tell() > end:
+            logger.info("Dropping %d bytes of unfinished output after the last checkpoint",
+                        out.tell() - end)
+            out.truncate(end)
+            out.seek(end)
+        return out
+
+    def run(self) -> Dict:
+        """
+        Process the backlog
+
+        Returns:
+            dict: Counts of files 'processed', 'failed' and 'skipped' (already done),
+            and of processed files flagged as 'duplicates'
+        """
+        self.checkpoint.load()
+        started = time.perf_counter()
+        pending: Dict[Future, Tuple[Path, os.stat_result]] = {}
+        tasks = self.pending(restamp=True)
+
+        with self._open_output() as out, ProcessPoolExecutor(max_workers=self.workers) as pool:
+            try:
+                exhausted = False
+                while pending or not exhausted:
+                    while not exhausted and len(pending) < self.max_in_flight:
+                        task = next(tasks, None)
+                        if task is None:
+                            exhausted = True
+                            break
+                        path, stat = task
+                        future = pool.submit(_process_file, str(path), self._relative(path), self.use_cache,
+                                             self.detector is not None)
+                        pending[future] = task
+
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path, stat = pending.pop(future)
+                        try:
+                            record = future.result()
+                        except Exception as e:
+                            record = {'path': self._relative(path), 'filename': path.name, 'content_hash': None,
+                                      'status': 'error', 'error': f"{type(e).__name__}: {e}",
+                                      'timings': {'total': 0.0}}
+                        self._finish(out, path, stat, record)
+            except KeyboardInterrupt:
+                for future in pending:
+                    future.cancel()
+                self.checkpoint.close()
+                logger.warning("Interrupted after %d files; run again to resume", self.stats['processed'])
+                raise
+
+        self.checkpoint.compact()
+        logger.info("Backlog done in %.1fs: %d processed (%d duplicates), %d failed, %d already done",
+                    time.perf_counter() - started, self.stats['processed'], self.stats['duplicates'],
+                    self.stats['failed'], self.stats['skipped'])
+        return dict(self.stats)
+
+    def status(self) -> Dict:
+        """Checkpoint summary without processing anything"""
+        self.checkpoint.load()
+        entries = list(self.checkpoint.entries.values())
+        return {
+            'files': len(entries),
+            'ok': sum(entry['status'] == 'ok' for entry in entries),
+            'failed': sum(entry['status'] != 'ok' for entry in entries),
+            'stale': sum(entry.get('version') != PIPELINE_VERSION for entry in entries),
+            'pending': sum(1 for _ in self.pending()),
+        }
+
+
+def read_records(path) -> Iterator[Dict]:
+    """
+    The current records of a JSONL output: for each 'path', only its last record
+
+    Records without a 'path' (e.g. from the ingestion service) are all
+    yielded. Reads the file twice, holding one line number per path.
+    """
+    latest: Dict[str, int] = {}
+    with open(path, 'r', encoding='utf-8') as file:
+        for number, line in enumerate(file):
+            if line.strip():
+                record_path = json.loads(line).get('path')
+                if record_path is not None:
+                    latest[record_path] = number
+    with open(path, 'r', encoding='utf-8') as file:
+        for number, line in enumerate(file):
+            if line.strip():
+                record = json.loads(line)
+                if record.get('path') is None or latest[record['path']] == number:
+                    yield record
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: python -m src.service.backlog [data/raw/]"""
+    parser = argparse.ArgumentParser(description="Process a directory of reports, resuming interrupted runs")
+    parser.add_argument('input_dir', nargs='?', default=None, help="Directory to scan for *.pdf "
+                        "(default: backlog.input_dir)")
+    parser.add_argument('--output', '-o', default=None, help="JSONL output file (default: backlog.output)")
+    parser.add_argument('--manifest', default=None, help="Checkpoint file (default: backlog.manifest)")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes")
+    parser.add_argument('--max-in-flight', type=int, default=None, help="Maximum pending files")
+    parser.add_argument('--no-cache', action='store_true', help="Do not use the result cache")
+    parser.add_argument('--retry-failed', action='store_true', help="Retry files that failed before")
+    parser.add_argument('--no-dedup', action='store_true', help="Do not flag repeated reports")
+    parser.add_argument('--status', action='store_true', help="Show checkpoint progress and exit")
+    parser.add_argument('--restart', action='store_true',
+                        help="Forget the checkpoint and process every file again")
+    args = parser.parse_args(argv)
+
+    runner = BacklogRunner(args.input_dir, args.output, args.manifest, args.workers,
+                           args.max_in_flight, use_cache=False if args.no_cache else None,
+                           retry_failed=args.retry_failed, dedup=False if args.no_dedup else None)
+    if args.status:
+        print(json.dumps(runner.status(), indent=2))
+        return 0
+    if args.restart:
+        runner.checkpoint.path.unlink(missing_ok=True)
+        runner.output.unlink(missing_ok=True)
+
+    try:
+        stats = runner.run()
+    except KeyboardInterrupt:
+        return 130
+    print(json.dumps(stats))
+    return 1 if stats['failed'] else 0
+
+
+if __name__ == "__main__":
+    from ..utils.logging_config import setup_logging
+
+    setup_logging()
+    sys.exit(main())
@@ -0,0 +1,452 @@
+"""
+Ingestion Service Module
+Asyncio pipeline that takes reports over HTTP or from a watched directory
+and streams extraction results as JSONL
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple, Union
+
+from ..analysis.anomaly_detector import flag_results
+from ..extraction.entity_extractor import MedicalEntityExtractor
+from ..preprocessing.dedup import MinHasher, NearDuplicateDetector, fingerprint
+from ..preprocessing.pdf_extractor import PDFExtractor
+from ..utils.cache import hash_bytes, hash_file
+from ..utils.config import get_setting, resolve_path
+from ..utils.logging_config import correlation
+from ..utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Largest request body accepted by the HTTP endpoint
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# Per-process extractor instances, created on first use in each worker
+_pdf_extractor = None
+_entity_extractor = None
+_hasher = None
+
+
+def json_safe(value):
+    """
+    Copy of a record with non-finite floats replaced by None
+
+    "greater than" ranges parse to an infinite upper bound, which json.dumps
+    would write as the non-standard `Infinity`; None means "no bound".
+    """
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    return value
+
+
+def _extract_pdf(source: Union[bytes, str], filename: str, job_name: str) -> Tuple[Dict, Optional[Dict]]:
+    """Worker: parse one PDF; returns the result (with its 'content_hash') and the worker's metrics"""
+    global _pdf_extractor
+    if _pdf_extractor is None:
+        _pdf_extractor = PDFExtractor()
+    with correlation(job_name):
+        result = _pdf_extractor.extract_with_metadata(source, filename=filename)
+        if result is None:
+            result = {'error': "Failed to extract text from PDF"}
+        try:
+            result['content_hash'] = hash_bytes(source) if isinstance(source, bytes) else hash_file(source)
+        except OSError as e:
+            logger.warning("Cannot hash %s: %s", filename, e)
+    return result, metrics.drain()
+
+
+def _extract_entities(text: str, job_name: str,
+                      dedup: bool = False) -> Tuple[Dict, Optional[Tuple], Optional[Dict]]:
+    """
+    Worker: extract and flag patient info and test results
+
+    Returns:
+        tuple: (entities, the text's `fingerprint` if `dedup`, else None, the worker's metrics)
+    """
+    global _entity_extractor, _hasher
+    if _entity_extractor is None:
+        _entity_extractor = MedicalEntityExtractor()
+    if dedup and _hasher is None:
+        _hasher = MinHasher.from_config()
+    with correlation(job_name):
+        entities = flag_results(_entity_extractor.extract_all(text))
+        report_fingerprint = fingerprint(text, _hasher) if dedup else None
+    return entities, report_fingerprint, metrics.drain()
+
+
+@dataclass
+class Job:
+    """One report moving through the pipeline"""
+
+    job_id: int
+    source: str
+    filename: str
+    payload: Union[bytes, str]
+    queued_at: float = field(default_factory=time.perf_counter)
+    timings: Dict[str, float] = field(default_factory=dict)
+    document: Optional[Dict] = None
+    record: Optional[Dict] = None
+
+    @property
+    def name(self) -> str:
+        """Correlation ID of the job in logs"""
+        return f"job-{self.job_id}"
+
+
+class IngestionService:
+    """
+    Bounded, staged report ingestion on asyncio
+
+    Reports enter through an HTTP endpoint (POST /reports with the PDF as
+    the body) and/or by appearing in a watched directory. They then pass
+    through three stages connected by bounded queues:
+
+        intake -> PDF extraction (process pool) -> entity extraction
+        (process pool) -> JSONL writer
+
+    Each stage runs a fixed number of consumer tasks, which caps its
+    concurrency. When a downstream queue is full the upstream stage waits,
+    so bursts back up into the intake queue. A full intake queue makes the
+    directory watcher wait and the HTTP endpoint answer 503 with Retry-After.
+
+    With `dedup` (`dedup.enabled` in config.yaml), a report whose text
+    repeats, exactly or nearly, one received earlier since the service
+    started is still written, with 'dedup': its 'status' ("duplicate" or
+    "near_duplicate"), the 'job_id' it repeats as 'duplicate_of', and the
+    estimated 'similarity'. Only fingerprints are kept, a few hundred
+    bytes per report.
+
+    GET /health returns the counters and queue depths; GET /metrics returns
+    the per-stage metrics (see `src.utils.metrics`) in Prometheus text
+    format, or as JSON with ?format=json.
+    """
+
+    def __init__(self, output: Optional[str] = None, watch_dir: Optional[str] = None,
+                 host: Optional[str] = None, port: Optional[int] = None,
+                 extract_workers: Optional[int] = None, entity_workers: Optional[int] = None,
+                 queue_size: Optional[int] = None, poll_interval: Optional[float] = None,
+                 dedup: Optional[bool] = None):
+        self.output = output or str(resolve_path(get_setting('service', 'output',
+                                                             'data/processed/results.jsonl')))
+        self.watch_dir = Path(watch_dir) if watch_dir else None
+        self.host = host or get_setting('service', 'host', '127.0.0.1')
+        self.port = port if port is not None else get_setting('service', 'port', 8765)
+        self.extract_workers = (extract_workers or get_setting('service', 'extract_workers')
+                                or os.cpu_count() or 1)
+        self.entity_workers = entity_workers or get_setting('service', 'entity_workers', 2)
+        self.queue_size = queue_size or get_setting('service', 'queue_size', 32)
+        self.poll_interval = poll_interval or get_setting('service', 'poll_interval', 2.0)
+
+        self.detector = (NearDuplicateDetector() if (get_setting('dedup', 'enabled', True) if dedup is None
+                                                     else dedup) else None)
+
+        self.stats = {'accepted': 0, 'rejected': 0, 'completed': 0, 'failed': 0, 'write_errors': 0,
+                      'duplicates': 0}
+        self._ids = itertools.count(1)
+        # Watched files already enqueued, and files seen changing on the last poll,
+        # as path -> (mtime_ns, size)
+        self._seen: Dict[str, Tuple[int, int]] = {}
+        self._changing: Dict[str, Tuple[int, int]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def submit(self, job: Job, timeout: Optional[float] = None) -> bool:
+        """Put a job on the intake queue, waiting up to `timeout` seconds for room"""
+        try:
+            await asyncio.wait_for(self.intake.put(job), timeout)
+        except asyncio.TimeoutError:
+            self.stats['rejected'] += 1
+            return False
+        self.stats['accepted'] += 1
+        return True
+
+    async def _extract_stage(self, pool: ProcessPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.intake.get()
+            started = time.perf_counter()
+            job.timings['queued'] = started - job.queued_at
+            try:
+                job.document, worker_metrics = await loop.run_in_executor(
+                    pool, _extract_pdf, job.payload, job.filename, job.name)
+                metrics.merge(worker_metrics)
+            except Exception as e:
+                job.document = {'error': f"{type(e).__name__}: {e}"}
+            job.payload = None
+            job.timings['extract'] = time.perf_counter() - started
+            await self.entities.put(job)
+            self.intake.task_done()
+
+    async def _entity_stage(self, pool: ProcessPoolExecutor) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.entities.get()
+            document = job.document
+            record = {
+                'job_id': job.job_id,
+                'source': job.source,
+                'filename': job.filename,
+                'content_hash': document.get('content_hash'),
+                'status': 'ok',
+                'error': document.get('error'),
+            }
+            if record['error'] is None:
+                started = time.perf_counter()
+                try:
+                    entities, report_fingerprint, worker_metrics = await loop.run_in_executor(
+                        pool, _extract_entities, document['text'], job.name, self.detector is not None)
+                    metrics.merge(worker_metrics)
+                    record.update(num_pages=document['num_pages'], **entities)
+                    if self.detector is not None:
+                        self._check_duplicate(job, record, report_fingerprint)
+                except Exception as e:
+                    record['error'] = f"{type(e).__name__}: {e}"
+                job.timings['entities'] = time.perf_counter() - started
+            if record['error'] is not None:
+                record['status'] = 'error'
+            job.timings['total'] = time.perf_counter() - job.queued_at
+            record['timings'] = job.timings
+            job.record, job.document = record, None
+            await self.results.put(job)
+            self.entities.task_done()
+
+    def _check_duplicate(self, job: Job, record: Dict, report_fingerprint: Optional[Tuple]) -> None:
+        """Compare a report with the ones received before and note a repeat"""
+        outcome = self.detector.check(job.job_id, report_fingerprint)
+        metrics.inc('service_dedup_total', status=outcome['status'])
+        if outcome['status'] != 'new':
+            record['dedup'] = outcome
+            self.stats['duplicates'] += 1
+            logger.info("%s (%s) repeats job-%s (%s, similarity %.2f)", job.name, job.filename,
+                        outcome['duplicate_of'], outcome['status'], outcome['similarity'])
+
+    async def _writer_stage(self) -> None:
+        Path(self.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(self.output, 'a', encoding='utf-8') as out:
+            while True:
+                job = await self.results.get()
+                try:
+                    out.write(json.dumps(json_safe(job.record), allow_nan=False) + "\n")
+                    out.flush()
+                except Exception as e:
+                    # Lose this record, not the stage: the queues must keep draining
+                    self.stats['write_errors'] += 1
+                    metrics.inc('service_write_errors_total', reason=type(e).__name__)
+                    logger.error("Could not write the result of %s (%s): %s", job.name, job.filename, e)
+                else:
+                    self.stats['completed' if job.record['status'] == 'ok' else 'failed'] += 1
+                    metrics.inc('service_jobs_total', status=job.record['status'])
+                    for stage, seconds in job.timings.items():
+                        metrics.observe('service_stage_seconds', seconds, stage=stage)
+                finally:
+                    self.results.task_done()
+
+    async def _watch_directory(self) -> None:
+        """
+        Poll the watch directory and enqueue new or changed PDFs
+
+        A file is only enqueued once its size and mtime are the same on two
+        polls in a row, so files still being copied in are not picked up
+        half-written. Entries of deleted files are forgotten.
+        """
+        logger.info(f"Watching {self.watch_dir} every {self.poll_interval}s")
+        while True:
+            present = set()
+            for path in sorted(self.watch_dir.rglob('*.pdf')):
+                key = str(path)
+                present.add(key)
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                stamp = (stat.st_mtime_ns, stat.st_size)
+                if self._seen.get(key) == stamp:
+                    continue
+                if self._changing.get(key) != stamp:
+                    self._changing[key] = stamp
+                    continue
+                del self._changing[key]
+                self._seen[key] = stamp
+                # Waits while the intake queue is full
+                await self.submit(Job(next(self._ids), 'watch', path.name, key))
+            for table in (self._seen, self._changing):
+                for key in table.keys() - present:
+                    del table[key]
+            await asyncio.sleep(self.poll_interval)
+
+    async def _handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            if len(request_line) < 2:
+                return await self._respond(writer, 400, {'error': 'Bad request'})
+            method, target = request_line[0], request_line[1]
+
+            if method == 'GET' and target == '/health':
+                return await self._respond(writer, 200, self.snapshot())
+            if method == 'GET' and target.split('?')[0] == '/metrics':
+                if target.endswith('format=json'):
+                    return await self._respond(writer, 200, metrics.snapshot())
+                return await self._respond(writer, 200, metrics.to_prometheus(),
+                                           content_type='text/plain; version=0.0.4')
+            if method != 'POST' or target.split('?')[0] != '/reports':
+                return await self._respond(writer, 404, {'error': 'Not found'})
+
+            length = int(headers.get('content-length', 0))
+            if not 0 < length <= MAX_UPLOAD_BYTES:
+                return await self._respond(writer, 413 if length else 411, {'error': 'Invalid body size'})
+
+            body = await reader.readexactly(length)
+            job = Job(next(self._ids), 'http', headers.get('x-filename', 'upload.pdf'), body)
+            if not await self.submit(job, timeout=1.0):
+                return await self._respond(writer, 503, {'error': 'Busy, retry later'},
+                                           extra_headers={'Retry-After': '1'})
+            await self._respond(writer, 202, {'job_id': job.job_id})
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as e:
+            logger.warning("Dropped HTTP request: %s", e)
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, payload: Union[Dict, str],
+                       extra_headers: Optional[Dict[str, str]] = None,
+                       content_type: str = 'application/json') -> None:
+        reasons = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found',
+                   411: 'Length Required', 413: 'Payload Too Large', 503: 'Service Unavailable'}
+        body = (payload if isinstance(payload, str) else json.dumps(payload)).encode()
+        headers = {'Content-Type': content_type, 'Content-Length': str(len(body)),
+                   'Connection': 'close', **(extra_headers or {})}
+        head = f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode('latin-1') + b"\r\n" + body)
+        await writer.drain()
+
+    def snapshot(self) -> Dict:
+        """Counters and current queue depths"""
+        return {
+            **self.stats,
+            'queued': {
+                'intake': self.intake.qsize(),
+                'entities': self.entities.qsize(),
+                'results': self.results.qsize(),
+            },
+        }
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        return task
+
+    async def run(self, serve_http: bool = True) -> None:
+        """Run until stop() is called or the process receives SIGINT/SIGTERM"""
+        self.intake: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self.entities: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self.results: asyncio.Queue = asyncio.Queue(self.queue_size)
+        self._stopping = asyncio.Event()
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        with ProcessPoolExecutor(self.extract_workers) as extract_pool, \
+                ProcessPoolExecutor(self.entity_workers) as entity_pool:
+            for _ in range(self.extract_workers):
+                self._spawn(self._extract_stage(extract_pool))
+            for _ in range(self.entity_workers):
+                self._spawn(self._entity_stage(entity_pool))
+            self._spawn(self._writer_stage())
+
+            sources = []
+            if self.watch_dir is not None:
+                sources.append(self._spawn(self._watch_directory()))
+            server = None
+            if serve_http:
+                server = await asyncio.start_server(self._handle_http, self.host, self.port)
+                logger.info(f"Accepting reports on http://{self.host}:{self.port}/reports")
+
+            logger.info(f"Writing results to {self.output}")
+            await self._stopping.wait()
+
+            # Stop taking new work, then drain what is already queued
+            if server is not None:
+                server.close()
+                await server.wait_closed()
+            for task in sources:
+                task.cancel()
+            for queue in (self.intake, self.entities, self.results):
+                await queue.join()
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+        logger.info(f"Stopped: {self.stats}")
+
+    def stop(self) -> None:
+        """Ask a running service to drain its queues and exit"""
+        if self._stopping is not None:
+            self._stopping.set()
+
+
+def main(argv=None) -> int:
+    """Command line entry point: python -m src.service.ingest_service --watch data/raw/"""
+    parser = argparse.ArgumentParser(description="Run the report ingestion service")
+    parser.add_argument('--watch', nargs='?', const=get_setting('service', 'watch_dir', 'data/raw/'),
+                        default=None, help="Directory to watch for PDFs (default: service.watch_dir)")
+    parser.add_argument('--no-http', action='store_true', help="Do not start the HTTP endpoint")
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--output', '-o', default=None, help="JSONL output file")
+    parser.add_argument('--extract-workers', type=int, default=None)
+    parser.add_argument('--entity-workers', type=int, default=None)
+    parser.add_argument('--queue-size', type=int, default=None)
+    parser.add_argument('--no-dedup', action='store_true', help="Do not flag repeated reports")
+    args = parser.parse_args(argv)
+
+    if args.no_http and not args.watch:
+        parser.error("Nothing to do: pass --watch or leave the HTTP endpoint enabled")
+
+    service = IngestionService(
+        output=args.output,
+        watch_dir=str(resolve_path(args.watch)) if args.watch else None,
+        host=args.host,
+        port=args.port,
+        extract_workers=args.extract_workers,
+        entity_workers=args.entity_workers,
+        queue_size=args.queue_size,
+        dedup=False if args.no_dedup else None,
+    )
+    asyncio.run(service.run(serve_http=not args.no_http))
+    return 0
+
+
+if __name__ == "__main__":
+    from ..utils.logging_config import setup_logging
+
+    setup_logging()
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Utility helpers shared across modules"""
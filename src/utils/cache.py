@@ -0,0 +1,231 @@
+"""
+Result Cache Module
+Content-addressed on-disk cache of extraction results
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from .config import get_setting, resolve_path
+
+logger = logging.getLogger(__name__)
+
+
+def hash_bytes(data: bytes) -> str:
+    """SHA-256 hex digest of a byte string"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def settings_digest(settings) -> str:
+    """Short digest of JSON-serializable settings, for keying cached results on them"""
+    encoded = json.dumps(settings, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 hex digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Persistent cache of extraction results keyed by PDF content
+
+    Entries are JSON files named after the SHA-256 of the PDF bytes, the kind
+    of result, and the version and result-affecting settings (OCR, page
+    guards, analyte dictionary) of the extractor that produced it, so neither
+    a new extractor version nor a config change serves stale output. Writes
+    go to a temporary file that is atomically renamed into place, which lets
+    several worker processes share one cache directory. Reads refresh the
+    entry's mtime, and when the directory grows past `max_bytes` the least
+    recently used entries are removed.
+
+    Each process tracks the size of its own writes and re-reads the total
+    from disk every `RESCAN_WRITES` writes and on every eviction, so with
+    several processes sharing the directory it can overshoot `max_bytes`
+    by at most that many entries per process before being trimmed.
+    """
+
+    RESCAN_WRITES = 64
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        if cache_dir is None:
+            cache_dir = resolve_path(get_setting('paths', 'processed_data', 'data/processed/')) / 'cache'
+        if max_bytes is None:
+            max_bytes = int(get_setting('cache', 'max_size_mb', 512)) * 1024 * 1024
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._size = None
+        self._writes_since_scan = 0
+
+    def _entry_path(self, digest: str, kind: str, version: str) -> Path:
+        return self.cache_dir / digest[:2] / f"{digest}.{kind}.v{version}.json"
+
+    def get(self, digest: str, kind: str, version: str) -> Optional[Dict]:
+        """Return a cached result, or None on a miss"""
+        path = self._entry_path(digest, kind, version)
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                value = json.load(file)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.stats['misses'] += 1
+            return None
+
+        self.stats['hits'] += 1
+        return value
+
+    def put(self, digest: str, kind: str, version: str, value: Dict) -> None:
+        """Store a result atomically and evict old entries if over the size cap"""
+        path = self._entry_path(digest, kind, version)
+        path.parent.mkdir(exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump(value, file)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self.stats['writes'] += 1
+        self._writes_since_scan += 1
+        if self._writes_since_scan >= self.RESCAN_WRITES:
+            # Pick up what other processes wrote or evicted meanwhile
+            self._size = None
+        elif self._size is not None:
+            self._size += path.stat().st_size
+        if self.max_bytes and self.size() > self.max_bytes:
+            self._evict()
+
+    def get_or_compute(self, digest: str, kind: str, version: str,
+                       compute: Callable[[], Optional[Dict]]) -> Optional[Dict]:
+        """Return the cached result or compute, store and return it"""
+        value = self.get(digest, kind, version)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(digest, kind, version, value)
+        return value
+
+    def size(self) -> int:
+        """Total bytes used by cache entries (scanned from disk, then tracked between rescans)"""
+        if self._size is None:
+            self._size = sum(self._stat_size(path) for path in self._entries())
+            self._writes_since_scan = 0
+        return self._size
+
+    @staticmethod
+    def _stat_size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except OSError:
+            # Evicted by another process since it was listed
+            return 0
+
+    def _entries(self):
+        return (path for path in self.cache_dir.glob('*/*.json') if not path.name.startswith('.tmp-'))
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until under the size cap"""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        entries.sort()
+        size = sum(entry[1] for entry in entries)
+        target = int(self.max_bytes * 0.9)
+
+        for _, entry_size, path in entries:
+            if size <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                # Already removed by another worker
+                pass
+            size -= entry_size
+            self.stats['evictions'] += 1
+
+        self._size = size
+        self._writes_since_scan = 0
+
+    def clear(self) -> None:
+        """Delete every cache entry"""
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+        self._size = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def extract_with_metadata(self, pdf_path: str, extractor=None) -> Optional[Dict]:
+        """
+        Cached `PDFExtractor.extract_with_metadata`
+
+        Args:
+            pdf_path (str): Path to the PDF file
+            extractor: PDFExtractor instance to use on a miss
+
+        Returns:
+            dict: Same as `PDFExtractor.extract_with_metadata`, with the content hash
+            added under 'content_hash'
+        """
+        from ..preprocessing.pdf_extractor import EXTRACTOR_VERSION, PDFExtractor
+
+        extractor = extractor or PDFExtractor()
+        try:
+            digest = hash_file(pdf_path)
+        except OSError as e:
+            logger.error("Cannot hash %s: %s", pdf_path, e)
+            return None
+
+        result = self.get_or_compute(digest, 'pdf', f"{EXTRACTOR_VERSION}-{extractor.settings_key()}",
+                                     lambda: extractor.extract_with_metadata(pdf_path))
+        if result is not None:
+            result['content_hash'] = digest
+        return result
+
+    def extract_all(self, digest: str, text: str, entity_extractor=None, pdf_extractor=None) -> Dict:
+        """
+        Cached `MedicalEntityExtractor.extract_all` for the report with this content hash
+
+        Args:
+            digest (str): SHA-256 of the source PDF bytes
+            text (str): Report text, only used on a miss
+            entity_extractor: MedicalEntityExtractor instance to use on a miss
+            pdf_extractor: PDFExtractor that produced `text` (default: one
+                built from config.yaml); its settings are part of the key
+
+        Returns:
+            dict: Same as `MedicalEntityExtractor.extract_all`
+        """
+        from ..extraction.entity_extractor import EXTRACTOR_VERSION, MedicalEntityExtractor
+        from ..preprocessing.pdf_extractor import EXTRACTOR_VERSION as PDF_VERSION, PDFExtractor
+
+        entity_extractor = entity_extractor or MedicalEntityExtractor()
+        pdf_extractor = pdf_extractor or PDFExtractor()
+        version = (f"{PDF_VERSION}-{pdf_extractor.settings_key()}-"
+                   f"{EXTRACTOR_VERSION}-{entity_extractor.settings_key()}")
+        return self.get_or_compute(digest, 'entities', version,
+                                   lambda: entity_extractor.extract_all(text))
@@ -0,0 +1,107 @@
+"""
+Configuration Module
+Loads application settings from config.yaml
+"""
+
+import logging
+import os
+import threading
+import time
+import yaml
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+CONFIG_PATH = PROJECT_ROOT / 'config.yaml'
+
+# Seconds between checks of the config file's modification time
+RELOAD_CHECK_INTERVAL = 1.0
+
+_lock = threading.Lock()
+# path -> {'config', 'stamp', 'checked', 'generation'}
+_loaded: Dict[str, Dict] = {}
+
+
+def _file_stamp(config_path: str):
+    stat = os.stat(config_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _load_config_file(config_path: str) -> Dict:
+    """Return the parsed file, re-parsing only when it has changed on disk"""
+    now = time.monotonic()
+    entry = _loaded.get(config_path)
+    if entry is not None and now - entry['checked'] < RELOAD_CHECK_INTERVAL:
+        return entry['config']
+
+    with _lock:
+        entry = _loaded.get(config_path)
+        stamp = _file_stamp(config_path)
+        if entry is not None and entry['stamp'] == stamp:
+            entry['checked'] = now
+            return entry['config']
+
+        with open(config_path, 'r', encoding='utf-8') as file:
+            config = yaml.safe_load(file) or {}
+
+        generation = entry['generation'] + 1 if entry else 0
+        if entry is not None:
+            logger.info(f"Reloaded configuration from {config_path}")
+        _loaded[config_path] = {'config': config, 'stamp': stamp, 'checked': now, 'generation': generation}
+        return config
+
+
+def _config_key(config_path: Optional[str]) -> Optional[str]:
+    config_path = Path(config_path) if config_path else CONFIG_PATH
+    if not config_path.exists():
+        return None
+    return str(config_path.resolve())
+
+
+def load_config(config_path: Optional[str] = None) -> Dict:
+    """
+    Load the application configuration
+
+    The file is parsed once and the parsed result is reused. Its modification
+    time is checked at most once per RELOAD_CHECK_INTERVAL, and the file is
+    parsed again only when it has changed, so edits are picked up without a
+    restart and without parsing YAML on every call.
+
+    Args:
+        config_path (str): Path to a YAML config file (default: config.yaml)
+
+    Returns:
+        dict: Parsed configuration, or an empty dict if the file is missing
+    """
+    key = _config_key(config_path)
+    if key is None:
+        return {}
+    return _load_config_file(key)
+
+
+def config_generation(config_path: Optional[str] = None) -> int:
+    """
+    Number of times the configuration has been reloaded
+
+    Modules that compile derived structures from the config compare this
+    against the value they compiled at to know when to rebuild.
+    """
+    key = _config_key(config_path)
+    if key is None:
+        return -1
+    _load_config_file(key)
+    return _loaded[key]['generation']
+
+
+def get_setting(section: str, key: str, default=None, config_path: Optional[str] = None):
+    """Read `section.key` from the configuration, falling back to a default"""
+    value = (load_config(config_path).get(section) or {}).get(key)
+    return default if value is None else value
+
+
+def resolve_path(path: str) -> Path:
+    """Resolve a path from config.yaml relative to the project root"""
+    path = Path(path)
+    return path if path.is_absolute() else PROJECT_ROOT / path
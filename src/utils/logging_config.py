@@ -0,0 +1,278 @@
+"""
+Logging Configuration Module
+Queue-based, structured logging set up from the `logging` section of config.yaml
+"""
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import multiprocessing.util
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional, Tuple
+
+from .config import load_config, resolve_path
+
+# Correlation ID of the report being processed in the current thread or task
+correlation_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('correlation_id', default=None)
+
+# Attributes every LogRecord has; anything else was passed with `extra=`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'correlation_id', 'suppressed'}
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+# Settings of the current setup, to rebuild the handler in forked children
+_settings: Dict = {}
+
+
+@contextmanager
+def correlation(value: Optional[str] = None) -> Iterator[str]:
+    """
+    Tag every record logged inside the block with a correlation ID
+
+    Args:
+        value (str): ID to use, e.g. a job id or content hash (default: a new random id)
+
+    Yields:
+        str: The correlation ID
+    """
+    value = value or uuid.uuid4().hex[:12]
+    token = correlation_id.set(value)
+    try:
+        yield value
+    finally:
+        correlation_id.reset(token)
+
+
+class CorrelationFilter(logging.Filter):
+    """Stamp records with the current correlation ID (must run in the thread that logs)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.correlation_id = correlation_id.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through at most `burst` records per message template every `interval` seconds
+
+    Records are grouped by logger and unformatted message, so a per-page
+    message logged with %-style arguments ("OCR failed for page %d") is
+    one template however many pages hit it. The first record let through
+    after a quiet spell carries the number it replaced as `suppressed`.
+    Records above `max_level` (by default: errors) are never dropped.
+    """
+
+    def __init__(self, interval: float = 10.0, burst: int = 20, max_level: int = logging.WARNING):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.max_level = max_level
+        # (logger, template) -> [window start, records in window, suppressed]
+        self._windows: Dict[Tuple[str, str], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                if len(self._windows) > 10000:
+                    self._windows.clear()
+                self._windows[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, correlation ID and extras"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+        }
+        for key in ('correlation_id', 'suppressed'):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller and keeps records structured"""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # A full queue means the writer is behind; drop rather than stall extraction
+        try:
+            self.queue.put_nowait(record)
+        except (queue.Full, ValueError):
+            # ValueError: the queue was closed at shutdown
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Format the message and traceback here, in the calling thread, so
+        # unpicklable args and live tracebacks never cross the queue
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _build_handlers(settings: Dict) -> list:
+    level = settings.get('level', 'INFO')
+    as_json = settings.get('json', True)
+    text_format = settings.get('format', "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    handlers = []
+    log_file = settings.get('file')
+    if log_file:
+        path = resolve_path(log_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=int(settings.get('max_bytes', 10 * 1024 * 1024)),
+            backupCount=int(settings.get('backup_count', 5)), encoding='utf-8', delay=True)
+        file_handler.setFormatter(JsonFormatter() if as_json else logging.Formatter(text_format))
+        handlers.append(file_handler)
+
+    if settings.get('console', True):
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(text_format))
+        handlers.append(console)
+
+    for handler in handlers:
+        handler.setLevel(level)
+    return handlers
+
+
+def _build_queue_handler(log_queue, settings: Dict) -> logging.Handler:
+    handler = _QueueHandler(log_queue)
+    handler.addFilter(CorrelationFilter())
+    limit = settings.get('rate_limit') or {}
+    if limit.get('enabled', True):
+        handler.addFilter(RateLimitFilter(float(limit.get('interval', 10.0)),
+                                          int(limit.get('burst', 20))))
+    return handler
+
+
+def _start_listener(handlers: list, log_queue) -> None:
+    global _listener
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def setup_logging(level: Optional[str] = None, force: bool = False) -> None:
+    """
+    Route all logging through a queue to a background writer thread
+
+    Records are formatted and written (to logs/app.log, rotated by size, and
+    to stderr) by a listener thread, so the code that logs only pays for
+    putting the record on a queue. The queue is a multiprocessing queue:
+    processes multiprocessing forks after setup (pool workers) put their records on it
+    too, so one writer in the parent owns the log file and its rotation.
+    Stop such workers by shutting their pool down, not with terminate():
+    a worker killed mid-write keeps the queue's write lock forever.
+    Settings come from the `logging` section of config.yaml. Safe to call
+    more than once; later calls do nothing unless `force` is set.
+
+    Args:
+        level (str): Override for logging.level
+        force (bool): Replace an earlier setup
+    """
+    global _queue_handler, _settings
+    with _lock:
+        if _queue_handler is not None and not force:
+            return
+        _shutdown()
+
+        settings = dict(load_config().get('logging') or {})
+        if level:
+            settings['level'] = level
+
+        log_queue = multiprocessing.Queue(int(settings.get('queue_size', 10000)))
+        handlers = _build_handlers(settings)
+        _settings = settings
+        _queue_handler = _build_queue_handler(log_queue, settings)
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_queue_handler)
+        root.setLevel(settings.get('level', 'INFO'))
+        _start_listener(handlers, log_queue)
+
+
+def _shutdown() -> None:
+    """Stop the writer thread after it has written everything queued"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def shutdown_logging() -> None:
+    with _lock:
+        _shutdown()
+
+
+def _after_fork_in_child() -> None:
+    # The child logs onto the inherited queue and the parent's writer thread
+    # writes its records; the listener object belongs to the parent, so
+    # forget it here (stopping it from the child would stop the parent's).
+    # Another parent thread may have held our lock or a filter's lock at
+    # the fork, so the child gets fresh ones and a fresh handler. The queue
+    # itself is reset by multiprocessing in the processes it starts.
+    global _listener, _lock, _queue_handler
+    _listener = None
+    _lock = threading.Lock()
+    if _queue_handler is not None:
+        root = logging.getLogger()
+        root.removeHandler(_queue_handler)
+        _queue_handler = _build_queue_handler(_queue_handler.queue, _settings)
+        root.addHandler(_queue_handler)
+
+
+# atexit runs hooks last-registered-first. multiprocessing.util (imported
+# above) registers the hook that closes multiprocessing queues, so this
+# one, registered after it, stops the writer while its queue still works
+atexit.register(shutdown_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,204 @@
+"""
+Metrics Module
+Per-stage latency histograms and counters, exported as Prometheus text or JSON
+"""
+
+import bisect
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .config import get_setting
+
+# Upper bounds in seconds: sub-millisecond line parsing up to minute-long OCR
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (metric name, sorted label items)
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class _NullTimer:
+    """Shared do-nothing timer handed out while metrics are disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('_metrics', '_key', '_started')
+
+    def __init__(self, metrics: 'Metrics', key: MetricKey):
+        self._metrics = metrics
+        self._key = key
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._metrics._observe(self._key, time.perf_counter() - self._started)
+        return False
+
+
+def _key(name: str, labels: Dict) -> MetricKey:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+class Metrics:
+    """
+    In-process counters and latency histograms
+
+    Disabled by default (`metrics.enabled` in config.yaml). While disabled,
+    `inc` and `observe` return after one attribute check and `timer` hands
+    out a shared no-op context manager, so instrumented code pays almost
+    nothing. Metrics are per process: pool workers send theirs back with
+    `drain` and the parent folds them in with `merge`.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None, buckets: Optional[Sequence[float]] = None):
+        self.enabled = bool(get_setting('metrics', 'enabled', False) if enabled is None else enabled)
+        self.buckets = tuple(sorted(buckets or get_setting('metrics', 'buckets') or DEFAULT_BUCKETS))
+        self._counters: Dict[MetricKey, float] = {}
+        # key -> [count per bucket (+Inf last), sum, count]
+        self._histograms: Dict[MetricKey, List] = {}
+        self._lock = threading.Lock()
+
+    def enable(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Add to a counter, e.g. inc('pdf_failures_total', reason='not_found')"""
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        """Record one latency in a histogram"""
+        if self.enabled:
+            self._observe(_key(name, labels), seconds)
+
+    def _observe(self, key: MetricKey, seconds: float) -> None:
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def timer(self, name: str, **labels):
+        """Context manager recording the duration of its block in a histogram"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, _key(name, labels))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict:
+        """
+        All metrics as plain data
+
+        Returns:
+            dict: 'buckets', 'counters' and 'histograms', each metric a list of
+            {'labels', 'value'} or {'labels', 'buckets', 'sum', 'count'} entries
+        """
+        with self._lock:
+            counters, histograms = dict(self._counters), {
+                key: [list(value[0]), value[1], value[2]] for key, value in self._histograms.items()}
+
+        snapshot = {'buckets': list(self.buckets), 'counters': {}, 'histograms': {}}
+        for (name, labels), value in sorted(counters.items()):
+            snapshot['counters'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        for (name, labels), (counts, total, count) in sorted(histograms.items()):
+            snapshot['histograms'].setdefault(name, []).append(
+                {'labels': dict(labels), 'buckets': counts, 'sum': total, 'count': count})
+        return snapshot
+
+    def drain(self) -> Optional[Dict]:
+        """Snapshot and reset, for a worker to hand its metrics to the parent (None if disabled)"""
+        if not self.enabled:
+            return None
+        snapshot = self.snapshot()
+        self.reset()
+        return snapshot
+
+    def merge(self, snapshot: Optional[Dict]) -> None:
+        """Add the metrics of a snapshot, e.g. one drained in a worker process"""
+        if not snapshot:
+            return
+        if list(self.buckets) != list(snapshot['buckets']):
+            raise ValueError("Cannot merge histograms with different buckets")
+        with self._lock:
+            for name, entries in snapshot['counters'].items():
+                for entry in entries:
+                    key = _key(name, entry['labels'])
+                    self._counters[key] = self._counters.get(key, 0) + entry['value']
+            for name, entries in snapshot['histograms'].items():
+                for entry in entries:
+                    key = _key(name, entry['labels'])
+                    histogram = self._histograms.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+                    histogram[0] = [a + b for a, b in zip(histogram[0], entry['buckets'])]
+                    histogram[1] += entry['sum']
+                    histogram[2] += entry['count']
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def write_json(self, path) -> Path:
+        """Write a JSON snapshot to a file, e.g. at the end of a batch run"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.to_json(), encoding='utf-8')
+        return path
+
+    def to_prometheus(self, prefix: Optional[str] = None) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        prefix = get_setting('metrics', 'prefix', 'mra_') if prefix is None else prefix
+        snapshot = self.snapshot()
+
+        def label_text(labels: Dict, **extra) -> str:
+            items = {**labels, **extra}
+            if not items:
+                return ''
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                       for value in items.values())
+            return '{' + ','.join(f'{name}="{value}"' for name, value in zip(items, escaped)) + '}'
+
+        lines = []
+        for name, entries in snapshot['counters'].items():
+            lines.append(f"# TYPE {prefix}{name} counter")
+            for entry in entries:
+                lines.append(f"{prefix}{name}{label_text(entry['labels'])} {entry['value']}")
+
+        bounds = [repr(float(bound)) for bound in snapshot['buckets']] + ['+Inf']
+        for name, entries in snapshot['histograms'].items():
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            for entry in entries:
+                cumulative = 0
+                for bound, count in zip(bounds, entry['buckets']):
+                    cumulative += count
+                    lines.append(f"{prefix}{name}_bucket{label_text(entry['labels'], le=bound)} {cumulative}")
+                lines.append(f"{prefix}{name}_sum{label_text(entry['labels'])} {entry['sum']}")
+                lines.append(f"{prefix}{name}_count{label_text(entry['labels'])} {entry['count']}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide metrics used by the extraction pipeline
+metrics = Metrics()
@@ -0,0 +1,227 @@
+"""
+Model Store Module
+Exports transformer models to models/saved_models/ and loads them offline
+"""
+
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .cache import hash_file
+from .config import get_setting, resolve_path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+# Bump when the on-disk layout changes
+STORE_FORMAT = 1
+
+# Task -> transformers auto class used to export and load the model
+TASKS = {
+    'base': 'AutoModel',
+    'token-classification': 'AutoModelForTokenClassification',
+    'sequence-classification': 'AutoModelForSequenceClassification',
+}
+
+
+def memory_usage() -> Dict[str, float]:
+    """
+    Resident memory of this process in MB
+
+    'pss' splits pages shared with other processes (such as memory-mapped
+    model weights) between them, so summing it across workers gives their
+    real footprint; 'shared' is the part of 'rss' shared with others.
+    Linux only; other platforms get an empty dict.
+    """
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as file:
+            for line in file:
+                key, _, value = line.partition(':')
+                if key in ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty'):
+                    usage[key] = int(value.split()[0]) / 1024
+    except OSError:
+        return {}
+    return {
+        'rss': usage.get('Rss', 0.0),
+        'pss': usage.get('Pss', 0.0),
+        'shared': usage.get('Shared_Clean', 0.0) + usage.get('Shared_Dirty', 0.0),
+    }
+
+
+class ModelStore:
+    """
+    Local store of exported models, one directory per model
+
+    A model is exported once with its weights as safetensors and its
+    tokenizer, plus a manifest holding the SHA-256 and size of every file.
+    Loading reads only the local directory, never the network or the
+    Hugging Face cache, and safetensors weights are memory-mapped, so
+    worker processes on one machine share the same page-cache pages
+    instead of each holding a private copy of the weights.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = resolve_path(root or get_setting('paths', 'models_dir', 'models/saved_models/'))
+
+    @staticmethod
+    def dir_name(model_name: str) -> str:
+        """Directory name for a model id, e.g. "dmis-lab--biobert-base-cased-v1.1\""""
+        return model_name.strip('/').replace('/', '--')
+
+    def path(self, model_name: str) -> Path:
+        return self.root / self.dir_name(model_name)
+
+    def manifest(self, model_name: str) -> Optional[Dict]:
+        """The model's manifest, or None if it has not been exported"""
+        try:
+            with open(self.path(model_name) / MANIFEST_NAME, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def __contains__(self, model_name: str) -> bool:
+        return self.manifest(model_name) is not None
+
+    def list(self) -> List[Dict]:
+        """Manifests of every exported model"""
+        manifests = []
+        for manifest_path in sorted(self.root.glob(f'*/{MANIFEST_NAME}')):
+            with open(manifest_path, 'r', encoding='utf-8') as file:
+                manifests.append(json.load(file))
+        return manifests
+
+    def export(self, model_name: str, task: str = 'base', source: Optional[str] = None,
+               force: bool = False) -> Path:
+        """
+        Save a model and its tokenizer into the store
+
+        Args:
+            model_name (str): Name to store the model under, normally its hub id
+            task (str): One of TASKS; selects the model head to export
+            source (str): Hub id or local directory to load from (default: model_name)
+            force (bool): Re-export even if the model is already in the store
+
+        Returns:
+            Path: The model's directory in the store
+        """
+        if task not in TASKS:
+            raise ValueError(f"Unknown task '{task}', expected one of {list(TASKS)}")
+        target = self.path(model_name)
+        if not force and model_name in self:
+            logger.info(f"{model_name} already exported to {target}")
+            return target
+
+        import transformers
+
+        source = source or model_name
+        started = time.perf_counter()
+        tokenizer = transformers.AutoTokenizer.from_pretrained(source)
+        model = getattr(transformers, TASKS[task]).from_pretrained(source)
+
+        # Build the export next to the target and swap it in, so a failed or
+        # concurrent export never leaves a half-written model behind
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".{target.name}.{os.getpid()}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        model.save_pretrained(staging, safe_serialization=True)
+        tokenizer.save_pretrained(staging)
+
+        weights = sorted(path.name for path in staging.glob('*.safetensors'))
+        if not weights:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise RuntimeError(f"{model_name} was not saved as safetensors")
+
+        manifest = {
+            'format': STORE_FORMAT,
+            'model_name': model_name,
+            'source': str(source),
+            'task': task,
+            'weights': weights,
+            'transformers_version': transformers.__version__,
+            'exported_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'files': {
+                path.name: {'sha256': hash_file(path), 'size': path.stat().st_size}
+                for path in sorted(staging.iterdir()) if path.is_file()
+            },
+        }
+        with open(staging / MANIFEST_NAME, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2)
+
+        previous = target.with_name(f".{target.name}.{os.getpid()}.old")
+        if target.exists():
+            target.rename(previous)
+        staging.rename(target)
+        shutil.rmtree(previous, ignore_errors=True)
+
+        size = sum(entry['size'] for entry in manifest['files'].values())
+        logger.info(f"Exported {model_name} ({task}, {size / 1e6:.1f} MB) to {target} "
+                    f"in {time.perf_counter() - started:.1f}s")
+        return target
+
+    def verify(self, model_name: str) -> List[str]:
+        """
+        Check an exported model against its manifest
+
+        Returns:
+            list: Problems found (missing, resized or modified files); empty if intact
+        """
+        manifest = self.manifest(model_name)
+        if manifest is None:
+            return [f"{model_name} is not in the store"]
+
+        problems = []
+        directory = self.path(model_name)
+        for name, expected in manifest['files'].items():
+            path = directory / name
+            if not path.is_file():
+                problems.append(f"missing {name}")
+            elif path.stat().st_size != expected['size']:
+                problems.append(f"size mismatch for {name}")
+            elif hash_file(path) != expected['sha256']:
+                problems.append(f"checksum mismatch for {name}")
+        return problems
+
+    def load(self, model_name: str, task: Optional[str] = None, verify: bool = False) -> Tuple:
+        """
+        Load an exported model and tokenizer without touching the network
+
+        Args:
+            model_name (str): Name the model was exported under
+            task (str): Model head to load (default: the exported task)
+            verify (bool): Check file checksums first (reads every byte of the weights)
+
+        Returns:
+            tuple: (tokenizer, model) with the model in eval mode
+
+        Raises:
+            FileNotFoundError: If the model has not been exported
+            ValueError: If verification fails
+        """
+        manifest = self.manifest(model_name)
+        if manifest is None:
+            raise FileNotFoundError(f"{model_name} is not in the model store at {self.root}; "
+                                    f"run scripts/download_models.py")
+        if verify:
+            problems = self.verify(model_name)
+            if problems:
+                raise ValueError(f"{model_name} failed verification: {', '.join(problems)}")
+
+        import transformers
+
+        directory = self.path(model_name)
+        task = task or manifest['task']
+        started = time.perf_counter()
+        tokenizer = transformers.AutoTokenizer.from_pretrained(directory, local_files_only=True)
+        model = getattr(transformers, TASKS[task]).from_pretrained(directory, local_files_only=True)
+        model.eval()
+
+        usage = memory_usage()
+        logger.info(f"Loaded {model_name} from the model store in {time.perf_counter() - started:.2f}s"
+                    + (f" (RSS {usage['rss']:.0f} MB, PSS {usage['pss']:.0f} MB)" if usage else ""))
+        return tokenizer, model
@@ -0,0 +1,102 @@
+"""
+Backend Registry Module
+Loads heavy optional backends (OCR readers, NLP models) on first use
+"""
+
+import importlib
+import importlib.util
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class BackendRegistry:
+    """
+    Named factories for expensive backends, imported and built lazily
+
+    A backend is registered by the dotted path of its factory
+    ("package.module:function") and the packages it needs, so registering
+    costs nothing: neither the factory's module nor torch, easyocr and the
+    like are imported until `get` is first called. Each distinct set of
+    options is built once per process and reused.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Tuple[Union[str, Callable], Tuple[str, ...]]] = {}
+        self._instances: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, factory: Union[str, Callable], requires: Iterable[str] = ()) -> None:
+        """
+        Register a backend
+
+        Args:
+            name (str): Backend name, e.g. "ocr.easyocr"
+            factory: Callable, or "module:attribute" path to one, that builds the backend
+            requires: Top-level packages the backend imports
+        """
+        self._factories[name] = (factory, tuple(requires))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+
+    def names(self) -> List[str]:
+        return sorted(self._factories)
+
+    def missing(self, name: str) -> List[str]:
+        """Required packages of a backend that are not installed (checked without importing)"""
+        _, requires = self._factories[name]
+        return [package for package in requires if importlib.util.find_spec(package) is None]
+
+    def available(self, name: str) -> bool:
+        return name in self._factories and not self.missing(name)
+
+    @staticmethod
+    def _resolve(factory: Union[str, Callable]) -> Callable:
+        if callable(factory):
+            return factory
+        module_name, _, attribute = factory.partition(':')
+        return getattr(importlib.import_module(module_name), attribute)
+
+    def get(self, name: str, **options):
+        """
+        Return the backend built with `options`, building it on first use
+
+        Raises:
+            KeyError: If no backend of that name is registered
+            ImportError: If a required package is missing
+        """
+        key = (name, tuple(sorted(options.items())))
+        instance = self._instances.get(key)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(key)
+            if instance is None:
+                factory, _ = self._factories[name]
+                missing = self.missing(name)
+                if missing:
+                    raise ImportError(f"Backend '{name}' requires: {', '.join(missing)}")
+
+                started = time.perf_counter()
+                instance = self._resolve(factory)(**options)
+                logger.info(f"Loaded backend {name} in {time.perf_counter() - started:.2f}s")
+                self._instances[key] = instance
+            return instance
+
+    def loaded(self) -> List[str]:
+        """Names of the backends built in this process so far"""
+        return sorted({name for name, _ in self._instances})
+
+    def clear(self) -> None:
+        """Drop built backends so their memory can be released"""
+        with self._lock:
+            self._instances.clear()
+
+
+# Process-wide registry used by the rest of the package
+backends = BackendRegistry()
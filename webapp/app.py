@@ -4,15 +4,23 @@ Main application file
 """
 
 import streamlit as st
+import multiprocessing
 import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 
 # Add src to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from src.preprocessing.pdf_extractor import PDFExtractor
-import tempfile
-import os
+# Extractors, OCR and analysis modules are imported where they are first
+# used, so a rerun only pays for what the current page needs
+from src.utils.cache import hash_bytes
+from src.utils.config import get_setting
+from src.utils.logging_config import setup_logging
 
 # Page Configuration
 st.set_page_config(
@@ -58,6 +66,158 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+# Result cache limits, so memory per server stays bounded
+CACHE_TTL = get_setting('streamlit', 'cache_ttl_seconds', 3600)
+CACHE_MAX_ENTRIES = get_setting('streamlit', 'cache_max_entries', 64)
+
+# Worker processes analysing uploads, and how often the page refreshes progress
+UPLOAD_WORKERS = get_setting('streamlit', 'upload_workers')
+UPLOAD_POLL_SECONDS = get_setting('streamlit', 'upload_poll_seconds', 0.25)
+
+
+class ResultStore:
+    """
+    Finished analyses by content hash, shared by all sessions
+    
+    Bounded by `CACHE_TTL` and `CACHE_MAX_ENTRIES` like the `st.cache_data`
+    caches, so reruns and repeat uploads of the same file skip the workers.
+    """
+    
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, content_hash):
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[content_hash]
+                return None
+            self._entries.move_to_end(content_hash)
+            return entry[1]
+    
+    def put(self, content_hash, result):
+        with self._lock:
+            self._entries[content_hash] = (time.monotonic(), result)
+            self._entries.move_to_end(content_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@st.cache_resource
+def get_result_store():
+    return ResultStore(CACHE_TTL, CACHE_MAX_ENTRIES)
+
+
+def upload_context():
+    """
+    Start method for upload workers and the channel manager
+    
+    Streamlit serves sessions from threads, and forking a threaded
+    process can copy a lock some other thread holds. Workers are forked
+    from a single-threaded forkserver instead (spawn where that is not
+    available), which also preloads the worker module and our sys.path.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload(['src.preprocessing.uploads'])
+    return context
+
+
+@st.cache_resource
+def get_upload_pool():
+    """Process pool analysing uploads, shared by all sessions"""
+    return ProcessPoolExecutor(max_workers=UPLOAD_WORKERS, mp_context=upload_context())
+
+
+@st.cache_resource
+def get_upload_channels():
+    """
+    Shared (progress, cancelled) dicts keyed by job id
+    
+    Workers write pages done / total to `progress` and stop at the next
+    page once their id is set in `cancelled`.
+    """
+    manager = upload_context().Manager()
+    return manager, manager.dict(), manager.dict()
+
+
+def start_jobs(uploaded_files):
+    """Submit every upload to the pool, replacing the previous batch"""
+    from src.preprocessing.uploads import analyze_upload
+    
+    for job in st.session_state.get('upload_jobs', {}).values():
+        if job['status'] == 'running':
+            cancel_job(job)
+    
+    pool = get_upload_pool()
+    store = get_result_store()
+    _, progress, cancelled = get_upload_channels()
+    
+    jobs = {}
+    for uploaded_file in uploaded_files:
+        data = uploaded_file.getvalue()
+        content_hash = hash_bytes(data)
+        job_id = f"{content_hash[:12]}-{uuid.uuid4().hex[:6]}"
+        job = {'id': job_id, 'name': uploaded_file.name, 'hash': content_hash,
+               'future': None, 'result': store.get(content_hash), 'status': 'done', 'error': None}
+        if job['result'] is None:
+            job['future'] = pool.submit(analyze_upload, data, uploaded_file.name, job_id, progress, cancelled)
+            job['status'] = 'running'
+        jobs[job_id] = job
+    st.session_state['upload_jobs'] = jobs
+
+
+def cancel_job(job):
+    """Drop a job that is done or not started; ask a running one to stop at its next page"""
+    future = job['future']
+    if future.done() or future.cancel():
+        finish_job(job)
+        return
+    _, _, cancelled = get_upload_channels()
+    cancelled[job['id']] = True
+    job['cancelling'] = True
+    # The job may be dropped from the session before it is polled again
+    future.add_done_callback(lambda _: forget_job(job['id']))
+
+
+def forget_job(job_id):
+    """Remove a job's entries from the shared channels"""
+    _, progress, cancelled = get_upload_channels()
+    progress.pop(job_id, None)
+    cancelled.pop(job_id, None)
+
+
+def finish_job(job):
+    """Record the outcome of a job whose future is done"""
+    from src.preprocessing.uploads import UploadCancelled
+    
+    future, job['future'] = job['future'], None
+    forget_job(job['id'])
+    
+    if future.cancelled():
+        job['status'] = 'cancelled'
+        return
+    try:
+        result = future.result()
+    except UploadCancelled:
+        job['status'] = 'cancelled'
+        return
+    except Exception as e:
+        job['status'], job['error'] = 'failed', str(e)
+        return
+    
+    job['result'] = result
+    job['status'] = 'done' if result else 'failed'
+    if result:
+        get_result_store().put(job['hash'], result)
+
+
 def main():
     """Main application function"""
     
@@ -93,15 +253,16 @@ def main():
 def upload_page():
     """Upload and analyze medical reports"""
     
-    st.markdown('<h2 class="sub-header">Upload Your Medical Report</h2>', unsafe_allow_html=True)
+    st.markdown('<h2 class="sub-header">Upload Your Medical Reports</h2>', unsafe_allow_html=True)
     
     col1, col2 = st. columns([2, 1])
     
     with col1:
-        uploaded_file = st.file_uploader(
-            "Choose a medical report (PDF or Image)",
+        uploaded_files = st.file_uploader(
+            "Choose medical reports (PDF or Image)",
             type=['pdf', 'jpg', 'jpeg', 'png'],
-            help="Upload your medical report in PDF or image format"
+            accept_multiple_files=True,
+            help="Upload one or more medical reports in PDF or image format"
         )
     
     with col2:
@@ -112,87 +273,149 @@ def upload_page():
         st.markdown("- PNG images")
         st.markdown('</div>', unsafe_allow_html=True)
     
-    if uploaded_file is not None:
+    if uploaded_files:
         # Display file info
-        st.success(f"✅ File uploaded:  {uploaded_file.name}")
-        
-        file_details = {
-            "Filename": uploaded_file.name,
-            "File Size": f"{uploaded_file.size / 1024:.2f} KB",
-            "File Type":  uploaded_file.type
-        }
+        st.success(f"✅ {len(uploaded_files)} file(s) uploaded")
         
         with st.expander("📄 File Details"):
-            for key, value in file_details. items():
-                st.write(f"**{key}:** {value}")
+            for uploaded_file in uploaded_files:
+                st.write(f"**{uploaded_file.name}:** {uploaded_file.size / 1024:.2f} KB, {uploaded_file.type}")
         
-        # Process button
-        if st.button("🔍 Analyze Report", type="primary"):
-            with st.spinner("Processing your report..."):
-                
-                # Save uploaded file temporarily
-                with tempfile.NamedTemporaryFile(delete=False, suffix=Path(uploaded_file.name).suffix) as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    tmp_path = tmp_file.name
-                
-                try:
-                    # Extract text based on file type
-                    if uploaded_file.type == "application/pdf":
-                        extractor = PDFExtractor()
-                        result = extractor.extract_with_metadata(tmp_path)
-                        
-                        if result: 
-                            st.markdown("---")
-                            st.markdown('<h3 class="sub-header">📊 Extraction Results</h3>', unsafe_allow_html=True)
-                            
-                            # Display metrics
-                            col1, col2, col3, col4 = st.columns(4)
-                            with col1:
-                                st. metric("Pages", result['num_pages'])
-                            with col2:
-                                st.metric("Words", result['word_count'])
-                            with col3:
-                                st.metric("Characters", result['char_count'])
-                            with col4:
-                                st.metric("Status", "✅ Success")
-                            
-                            # Display extracted text
-                            st. markdown("---")
-                            st.markdown("### 📝 Extracted Text")
-                            st.text_area(
-                                "Full Text",
-                                result['text'],
-                                height=300,
-                                help="Complete extracted text from the report"
-                            )
-                            
-                            # Download option
-                            st.download_button(
-                                label="⬇️ Download Extracted Text",
-                                data=result['text'],
-                                file_name=f"{Path(uploaded_file.name).stem}_extracted. txt",
-                                mime="text/plain"
-                            )
-                            
-                            # Next steps
-                            st.markdown("---")
-                            st.markdown('<div class="warning-box">', unsafe_allow_html=True)
-                            st.markdown("### 🚧 Coming Soon:")
-                            st.markdown("- 🧠 Entity Extraction (Patient details, test names, values)")
-                            st.markdown("- ⚠️ Anomaly Detection (Abnormal values highlighting)")
-                            st.markdown("- 💡 Explainable AI (Why values were flagged)")
-                            st.markdown("- 📈 Trend Analysis (Compare with previous reports)")
-                            st.markdown('</div>', unsafe_allow_html=True)
-                        else:
-                            st.error("❌ Failed to extract text from PDF")
-                    
-                    else:
-                        st.info("🔄 Image OCR processing coming soon!")
-                        st.markdown("Currently only PDF processing is implemented.")
-                
-                finally:
-                    # Clean up temp file
-                    os.unlink(tmp_path)
+        # Process button; files are analysed concurrently in worker processes,
+        # straight from the upload bytes, no temp files
+        if st.button("🔍 Analyze Reports", type="primary"):
+            start_jobs(uploaded_files)
+    
+    jobs = st.session_state.get('upload_jobs')
+    if jobs:
+        render_jobs(jobs)
+
+
+def render_jobs(jobs):
+    """
+    Show every job of the batch, filling in results as they finish
+    
+    Runs until no job is left running. Results are kept in session state,
+    so a rerun (e.g. a Cancel click, which interrupts this loop) redraws
+    the finished ones at once and keeps polling the rest.
+    """
+    st.markdown("---")
+    st.markdown('<h3 class="sub-header">📊 Extraction Results</h3>', unsafe_allow_html=True)
+    
+    overall = st.empty()
+    if any(job['status'] == 'running' for job in jobs.values()):
+        if st.button("⏹️ Cancel All"):
+            for job in jobs.values():
+                if job['status'] == 'running':
+                    cancel_job(job)
+    
+    slots = {}
+    for job in jobs.values():
+        st.markdown("---")
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(f"#### 📄 {job['name']}")
+        with col2:
+            if job['status'] == 'running' and not job.get('cancelling'):
+                if st.button("✖️ Cancel", key=f"cancel-{job['id']}"):
+                    cancel_job(job)
+        slots[job['id']] = st.empty()
+    
+    _, progress, _ = get_upload_channels()
+    rendered = set()
+    while True:
+        for job in jobs.values():
+            if job['status'] == 'running' and job['future'].done():
+                finish_job(job)
+            
+            slot = slots[job['id']]
+            if job['status'] == 'running':
+                done, total = progress.get(job['id'], (0, 0))
+                if job.get('cancelling'):
+                    slot.info("⏳ Cancelling...")
+                elif total:
+                    slot.progress(done / total, text=f"Page {done} of {total}")
+                else:
+                    slot.progress(0.0, text="Processing...")
+            elif job['id'] not in rendered:
+                rendered.add(job['id'])
+                with slot.container():
+                    render_job(job)
+        
+        running = [job['future'] for job in jobs.values() if job['status'] == 'running']
+        finished = len(jobs) - len(running)
+        overall.progress(finished / len(jobs), text=f"{finished} of {len(jobs)} report(s) processed")
+        if not running:
+            break
+        wait(running, timeout=UPLOAD_POLL_SECONDS, return_when=FIRST_COMPLETED)
+    
+    # Next steps
+    st.markdown("---")
+    st.markdown('<div class="warning-box">', unsafe_allow_html=True)
+    st.markdown("### 🚧 Coming Soon:")
+    st.markdown("- 🧠 Entity Extraction (Patient details, test names, values)")
+    st.markdown("- ⚠️ Anomaly Detection (Abnormal values highlighting)")
+    st.markdown("- 💡 Explainable AI (Why values were flagged)")
+    st.markdown("- 📈 Trend Analysis (Compare with previous reports)")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+def render_job(job):
+    """Metrics, extracted text and download for one finished job"""
+    if job['status'] == 'cancelled':
+        st.warning("⏹️ Analysis cancelled")
+        return
+    result = job['result']
+    if not result:
+        st.error(f"❌ Failed to extract text from the report{': ' + job['error'] if job['error'] else ''}")
+        return
+    
+    # Display metrics
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st. metric("Pages", result['num_pages'])
+    with col2:
+        st.metric("Words", result['word_count'])
+    with col3:
+        st.metric("Characters", result['char_count'])
+    with col4:
+        st.metric("Status", "✅ Success")
+    
+    ocr_pages = [page['page_num'] + 1 for page in result.get('pages', [])
+                 if page['source'] == 'ocr']
+    if ocr_pages:
+        st.caption(f"🔎 Text recovered with OCR on page(s): {', '.join(map(str, ocr_pages))}")
+
+    # Display test results, flagged against the printed or configured ranges
+    test_results = (result.get('entities') or {}).get('test_results')
+    if test_results:
+        st.markdown("### 🧪 Test Results")
+        st.table([{
+            'Test': test['test_name'],
+            'Value': test['value'],
+            'Unit': test.get('unit', ''),
+            'Normal Range': test.get('normal_range', ''),
+            'Status': test.get('flag', 'unknown'),
+        } for test in test_results])
+
+    # Display extracted text
+    st.markdown("### 📝 Extracted Text")
+    st.text_area(
+        "Full Text",
+        result['text'],
+        height=300,
+        key=f"text-{job['id']}",
+        help="Complete extracted text from the report"
+    )
+    
+    # Download option
+    st.download_button(
+        label="⬇️ Download Extracted Text",
+        data=result['text'],
+        file_name=f"{Path(job['name']).stem}_extracted.txt",
+        mime="text/plain",
+        key=f"download-{job['id']}"
+    )
 
 
 def about_page():
@@ -244,18 +467,12 @@ def about_page():
     """)
 
 
-def demo_page():
-    """Demo page with sample analysis"""
-    
-    st.markdown('<h2 class="sub-header">📊 Demo Analysis</h2>', unsafe_allow_html=True)
-    
-    st.info("This page will show a demo analysis of a sample medical report once the full pipeline is ready!")
-    
-    # Sample visualization
-    st.markdown("### Sample Blood Test Results")
-    
+@st.cache_resource
+def build_demo_chart():
+    """Build the demo DataFrame and chart once per server instead of on every rerun"""
     import pandas as pd
     import plotly.graph_objects as go
+    from src.analysis.anomaly_detector import AnomalyDetector
     
     # Sample data
     data = {
@@ -268,20 +485,20 @@ def demo_page():
     
     df = pd.DataFrame(data)
     
-    # Create visualization
-    fig = go.Figure()
+    # Flag abnormal values in one vectorized pass
+    detector = AnomalyDetector()
+    codes = detector.classify(df['Your Value'], df['Normal Min'], df['Normal Max'])
+    df['Status'] = detector.labels(codes)
+    colors = ['red' if abnormal else 'green' for abnormal in detector.is_abnormal(codes)]
     
-    for idx, row in df.iterrows():
-        color = 'green' if row['Normal Min'] <= row['Your Value'] <= row['Normal Max'] else 'red'
-        
-        fig.add_trace(go.Bar(
-            name=row['Test Name'],
-            x=[row['Test Name']],
-            y=[row['Your Value']],
-            marker_color=color,
-            text=f"{row['Your Value']} {row['Unit']}",
-            textposition='outside'
-        ))
+    # Create visualization
+    fig = go.Figure(go.Bar(
+        x=df['Test Name'],
+        y=df['Your Value'],
+        marker_color=colors,
+        text=df['Your Value'].astype(str) + " " + df['Unit'],
+        textposition='outside'
+    ))
     
     fig.update_layout(
         title="Sample Blood Test Analysis",
@@ -291,6 +508,21 @@ def demo_page():
         height=400
     )
     
+    return df, fig
+
+
+def demo_page():
+    """Demo page with sample analysis"""
+    
+    st.markdown('<h2 class="sub-header">📊 Demo Analysis</h2>', unsafe_allow_html=True)
+    
+    st.info("This page will show a demo analysis of a sample medical report once the full pipeline is ready!")
+    
+    # Sample visualization
+    st.markdown("### Sample Blood Test Results")
+    
+    df, fig = build_demo_chart()
+    
     st.plotly_chart(fig, use_container_width=True)
     
     # Display table
@@ -299,4 +531,5 @@ def demo_page():
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
\ No newline at end of file